@@ -1,21 +1,86 @@
 import os
+import random
+import time
+import importlib
+import threading
 from flask import Flask
 from config import Config
-from routes.main_routes import main_bp
-from routes.api_routes import api_bp
-from routes.test_routes import test_bp
-from routes.consistency_routes import consistency_bp
-from routes.admin_routes import admin_bp
-from routes.group_routes import group_bp
-from utils.count_audio_files import update_audio_count_in_system
+from utils.db_pool import reset_pools
+from utils.logger import emotion_logger
+from utils.session_store import create_session_interface
+from utils.compression import ResponseCompressor
+from utils.assets import AssetManifest
+
+# 蓝图定义：(模块路径, 蓝图变量名, url_prefix)
+# 蓝图模块在 create_app 中才导入，导入 app 模块本身不会加载任何路由及其依赖
+BLUEPRINTS = [
+    ('routes.main_routes', 'main_bp', None),
+    ('routes.api_routes', 'api_bp', '/api'),
+    ('routes.test_routes', 'test_bp', None),  # test_routes.py中已经包含了完整路径
+    ('routes.consistency_routes', 'consistency_bp', None),  # 一致性测试路由
+    ('routes.admin_routes', 'admin_bp', '/admin'),
+    ('routes.group_routes', 'group_bp', None),  # 分组管理路由
+]
+
+_process_initialized = False
+_process_init_lock = threading.Lock()
+
+def _timed(timings, name, func, *args, **kwargs):
+    """执行函数并把耗时（毫秒）记录到 timings 中"""
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    timings.append((name, round((time.perf_counter() - start) * 1000, 2)))
+    return result
+
+def init_process(timings=None):
+    """
+    进程启动钩子：初始化数据库
+    
+    每个进程只执行一次，模块导入阶段不再访问数据库
+    
+    Args:
+        timings (list): 可选，用于收集各步骤耗时的列表
+    """
+    global _process_initialized
+    if timings is None:
+        timings = []
+    
+    with _process_init_lock:
+        if _process_initialized:
+            return
+        
+        from models.user_model import get_user_model
+        from models.admin_model import get_admin_model
+        from services.database_service import DatabaseService
+        from group_assignment_manager import get_group_assignment_manager
+        from services.play_count_buffer import recover_spill_files
+        from services.label_agreement_service import init_agreement_tables
+        from services.consistency_catalog import get_consistency_catalog
+        from services.test_result_service import TestResultService
+        from services.test_question_bank import get_test_question_bank
+        
+        _timed(timings, 'db:users', lambda: get_user_model().init_database())
+        _timed(timings, 'db:admins', lambda: get_admin_model().init_database())
+        _timed(timings, 'db:emotion_labels', DatabaseService.init_database)
+        _timed(timings, 'db:group_assignments', lambda: get_group_assignment_manager().init_progress_tracking())
+        _timed(timings, 'db:label_agreement', init_agreement_tables)
+        _timed(timings, 'db:test_results', TestResultService.init_database)
+        _timed(timings, 'catalog:consistency_test', lambda: get_consistency_catalog().load())
+        _timed(timings, 'catalog:test_questions', lambda: get_test_question_bank().load())
+        _timed(timings, 'recover:play_counts', recover_spill_files)
+        
+        _process_initialized = True
 
 def create_app():
     """应用工厂函数"""
+    startup_begin = time.perf_counter()
+    timings = []
+    
     app = Flask(__name__)
     
     # 配置安全的session
     app.secret_key = os.getenv('SECRET_KEY', 'emotion_labeling_secret_key_2024')  # 生产环境中应使用环境变量
-    app.config['SESSION_TYPE'] = 'filesystem'
+    app.config['SESSION_TYPE'] = Config.SESSION_TYPE
     app.config['SESSION_COOKIE_HTTPONLY'] = True  # 防止XSS攻击
     app.config['SESSION_COOKIE_SECURE'] = False  # 开发环境设为False，生产环境应设为True
     app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'  # 防止CSRF攻击
@@ -24,18 +89,86 @@ def create_app():
     # 初始化配置
     Config.init_directories()
     
-    # 注册蓝图
-    app.register_blueprint(main_bp)
-    app.register_blueprint(api_bp, url_prefix='/api')
-    app.register_blueprint(test_bp)  # 移除url_prefix，因为test_routes.py中已经包含了完整路径
-    app.register_blueprint(consistency_bp)  # 注册一致性测试路由
-    app.register_blueprint(admin_bp, url_prefix='/admin')
-    app.register_blueprint(group_bp)  # 注册分组管理路由
+    # 服务端会话存储（Cookie中只保存会话ID）
+    session_interface = create_session_interface(Config)
+    if session_interface is not None:
+        if hasattr(session_interface.backend, 'init_database'):
+            _timed(timings, 'db:sessions', session_interface.backend.init_database)
+        app.session_interface = session_interface
+    
+    # 响应压缩（gzip / brotli）
+    if Config.COMPRESSION_ENABLED:
+        ResponseCompressor(Config).init_app(app)
+    
+    # 带哈希的静态资源（utils/build_assets.py 构建）
+    AssetManifest().init_app(app)
+    
+    # 导入并注册蓝图
+    for module_path, attr, url_prefix in BLUEPRINTS:
+        module = _timed(timings, f'import:{module_path}', importlib.import_module, module_path)
+        blueprint = getattr(module, attr)
+        if url_prefix:
+            app.register_blueprint(blueprint, url_prefix=url_prefix)
+        else:
+            app.register_blueprint(blueprint)
+    
+    # 初始化数据库（每个进程一次）
+    init_process(timings)
+    
+    total_ms = round((time.perf_counter() - startup_begin) * 1000, 2)
+    app.config['STARTUP_TIMINGS'] = timings
+    app.config['STARTUP_TOTAL_MS'] = total_ms
+    emotion_logger.log_system_event("应用启动耗时", {
+        "total_ms": total_ms,
+        "steps": dict(timings)
+    })
     
     return app
 
-# 为了兼容现有的启动脚本
-app = create_app()
+def format_startup_report(app):
+    """
+    生成启动耗时明细报告
+    
+    Args:
+        app: create_app 创建的应用
+        
+    Returns:
+        str: 按耗时降序排列的报告文本
+    """
+    timings = app.config.get('STARTUP_TIMINGS', [])
+    total_ms = app.config.get('STARTUP_TOTAL_MS', 0)
+    
+    lines = [f"启动总耗时: {total_ms:.2f} ms"]
+    for name, elapsed in sorted(timings, key=lambda item: item[1], reverse=True):
+        lines.append(f"  {name:<40} {elapsed:>10.2f} ms")
+    return "\n".join(lines)
+
+def init_worker():
+    """
+    工作进程初始化钩子
+    
+    多进程部署时（预加载应用后fork），每个工作进程启动后调用一次，
+    重置从主进程继承而来、不能在进程间共享的状态
+    """
+    # fork后的子进程会继承相同的随机数状态，重新播种避免各进程生成相同的随机序列
+    random.seed()
+    
+    # 清空从主进程继承的连接池登记（utils.db_pool），工作进程按需新建连接池
+    reset_pools()
+    
+    emotion_logger.log_system_event("工作进程初始化完成", {"pid": os.getpid()})
+
+# 为了兼容现有的启动脚本（如 gunicorn app:app），模块级 app 在首次访问时才创建，
+# 只导入 create_app 的调用方不会重复创建应用
+_app = None
+
+def __getattr__(name):
+    global _app
+    if name == 'app':
+        if _app is None:
+            _app = create_app()
+        return _app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 if __name__ == "__main__":
-    app.run(debug=Config.DEBUG, host=Config.HOST, port=Config.PORT)
\ No newline at end of file
+    create_app().run(debug=Config.DEBUG, host=Config.HOST, port=Config.PORT)
\ No newline at end of file
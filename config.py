@@ -14,11 +14,26 @@ class Config:
         "TEST_AUDIO_FOLDER",
         "/mnt/shareEEx/liuyang/code/emotion_labeling_refactoring/data/test_examples"
     )
+    CONSISTENCY_TEST_FOLDER = os.getenv(
+        "CONSISTENCY_TEST_FOLDER",
+        "/mnt/shareEEx/liuyang/code/emotion_labeling_refactoring/data/consistency_test"
+    )
     
     # Flask配置
-    DEBUG = True
-    HOST = "0.0.0.0"
-    PORT = 5000
+    DEBUG = os.getenv("DEBUG", "true").lower() == "true"
+    HOST = os.getenv("HOST", "0.0.0.0")
+    PORT = int(os.getenv("PORT", 5000))
+    
+    # 生产部署配置（start_server.py --production）
+    # 工作进程数。管理后台的增量推送（services/change_bus.py）只在单个进程内有效，
+    # 多进程时大部分标注写入来自其他进程，只能以 resync（重新加载）的形式送达仪表盘
+    WORKERS = int(os.getenv("WORKERS", (os.cpu_count() or 1) * 2 + 1))
+    THREADS = int(os.getenv("THREADS", 4))  # 每个工作进程的线程数
+    WORKER_TIMEOUT = int(os.getenv("WORKER_TIMEOUT", 120))  # 请求超时（秒），超时的工作进程会被重启
+    GRACEFUL_TIMEOUT = int(os.getenv("GRACEFUL_TIMEOUT", 30))  # 平滑重启时等待处理中请求的时间（秒）
+    KEEPALIVE = int(os.getenv("KEEPALIVE", 5))
+    MAX_REQUESTS = int(os.getenv("MAX_REQUESTS", 2000))  # 工作进程处理多少请求后自动回收，0表示不回收
+    PRELOAD_APP = os.getenv("PRELOAD_APP", "true").lower() == "true"  # 在主进程中预加载应用后再fork
     
     # 安全配置
     SECRET_KEY = os.getenv('SECRET_KEY', 'emotion_labeling_secret_key_2024')
@@ -26,7 +41,41 @@ class Config:
     SESSION_COOKIE_SECURE = False  # 开发环境设为False，生产环境应设为True
     SESSION_COOKIE_SAMESITE = 'Lax'
     PERMANENT_SESSION_LIFETIME = 3600 * 24  # 24小时
+    
+    # 会话存储配置
+    SESSION_TYPE = os.getenv("SESSION_TYPE", "sqlite")  # sqlite / filesystem / memory / cookie
+    SESSION_MEMORY_CACHE_SIZE = int(os.getenv("SESSION_MEMORY_CACHE_SIZE", 10000))  # 进程内会话缓存条数
+    SESSION_MEMORY_MAX_AGE = int(os.getenv("SESSION_MEMORY_MAX_AGE", 30))  # 进程内缓存条目有效期（秒），超时后重新从存储读取
 
+    # 缓存配置
+    USER_SETTINGS_CACHE_TTL = int(os.getenv("USER_SETTINGS_CACHE_TTL", 30))  # 用户测试设置缓存时间（秒），每个工作进程各自缓存，修改后其他进程最多延迟这么久生效
+    
+    # 播放次数缓冲配置
+    PLAY_COUNT_FLUSH_INTERVAL = float(os.getenv("PLAY_COUNT_FLUSH_INTERVAL", 5))  # 批量写入间隔（秒）
+    PLAY_COUNT_SPOOL_FOLDER = os.getenv(
+        "PLAY_COUNT_SPOOL_FOLDER",
+        os.path.join(DATABASE_FOLDER, "play_count_spool")
+    )  # 未写入事件的溢出文件目录
+    
+    # 响应压缩配置
+    COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "true").lower() == "true"
+    COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", 1024))  # 小于该字节数的响应不压缩
+    COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", 6))
+    COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", 4))  # 动态响应使用较低质量，预压缩文件使用最高质量
+    
+    # 标注页面启动数据（/api/bootstrap）中音频列表第一页的条数
+    BOOTSTRAP_AUDIO_PAGE_SIZE = int(os.getenv("BOOTSTRAP_AUDIO_PAGE_SIZE", 50))
+    
+    # 批量保存标注（/api/save_labels）每次请求的最大条数
+    LABEL_BATCH_MAX_SIZE = int(os.getenv("LABEL_BATCH_MAX_SIZE", 100))
+    
+    # 波形峰值缓存（utils/waveform_peaks.py，/api/waveform）
+    WAVEFORM_CACHE_FOLDER = os.getenv(
+        "WAVEFORM_CACHE_FOLDER",
+        os.path.join(DATABASE_FOLDER, "waveform_cache")
+    )
+    WAVEFORM_PIXELS = int(os.getenv("WAVEFORM_PIXELS", 1000))  # 每个音频的峰值区间数（修改后需重新生成缓存）
+    
     # 测试配置
     TEST_QUESTION_LIMIT = 1  # 测试题目数量限制
     
@@ -34,4 +83,5 @@ class Config:
     @classmethod
     def init_directories(cls):
         os.makedirs(cls.DATABASE_FOLDER, exist_ok=True)
+        os.makedirs(cls.PLAY_COUNT_SPOOL_FOLDER, exist_ok=True)
         # os.makedirs(cls.ORDER_LIST_FOLDER, exist_ok=True)  # 已迁移到数据库
\ No newline at end of file
@@ -7,8 +7,44 @@
 
 import sqlite3
 import os
+import threading
 from datetime import datetime
 from config import Config
+from services.data_version import bump_version
+
+_manager_instance = None
+_manager_lock = threading.Lock()
+
+# 保存标注时附加到 emotion_labels.db 连接上的 schema 名
+PROGRESS_SCHEMA = 'ga'
+
+# group_assignments.db 的 user_version：1 表示进度已改为服务端维护并完成过一次全量重算
+PROGRESS_TRACKING_VERSION = 1
+
+# 根据新的完成数计算分配状态（:progress 为更新后的完成数）
+_PROGRESS_STATUS_SQL = '''
+    status = CASE
+        WHEN total_segments > 0 AND :progress >= total_segments THEN 'completed'
+        WHEN :progress > 0 THEN 'in_progress'
+        ELSE 'assigned'
+    END,
+    completed_at = CASE
+        WHEN total_segments > 0 AND :progress >= total_segments THEN COALESCE(completed_at, CURRENT_TIMESTAMP)
+        ELSE NULL
+    END
+'''
+
+def get_group_assignment_manager():
+    """
+    获取进程内共享的分组分配管理器实例
+    首次调用时才创建，避免在模块导入阶段访问数据库
+    """
+    global _manager_instance
+    if _manager_instance is None:
+        with _manager_lock:
+            if _manager_instance is None:
+                _manager_instance = GroupAssignmentManager()
+    return _manager_instance
 
 class GroupAssignmentManager:
     def __init__(self):
@@ -117,6 +153,7 @@ class GroupAssignmentManager:
             ''', (group_id,))
             
             conn.commit()
+            bump_version('groups', username)
             return True, "分组分配成功"
             
         except Exception as e:
@@ -125,11 +162,15 @@ class GroupAssignmentManager:
         finally:
             conn.close()
     
-    def get_group_info(self, group_id):
+    def get_group_info(self, group_id, conn=None):
         """
         获取分组详细信息
+        
+        conn 为可选的共享连接（分组数据库已通过 attach 附加），不提供时新建连接
         """
-        conn = sqlite3.connect(self.db_path)
+        own_connection = conn is None
+        if own_connection:
+            conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
         try:
@@ -168,13 +209,18 @@ class GroupAssignmentManager:
             }
             
         finally:
-            conn.close()
+            if own_connection:
+                conn.close()
     
-    def get_user_assignment_info(self, username):
+    def get_user_assignment_info(self, username, conn=None):
         """
         获取用户的分组分配信息
+        
+        conn 为可选的共享连接（分组数据库已通过 attach 附加），不提供时新建连接
         """
-        conn = sqlite3.connect(self.db_path)
+        own_connection = conn is None
+        if own_connection:
+            conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
         try:
@@ -192,7 +238,7 @@ class GroupAssignmentManager:
             group_id, status, progress_count, total_segments, assigned_at, completed_at = assignment
             
             # 获取分组详细信息
-            group_info = self.get_group_info(group_id)
+            group_info = self.get_group_info(group_id, conn)
             
             return {
                 'group_id': group_id,
@@ -205,44 +251,226 @@ class GroupAssignmentManager:
             }
             
         finally:
-            conn.close()
+            if own_connection:
+                conn.close()
     
-    def update_user_progress(self, username, group_id, progress_count):
+    def get_user_group_id(self, username):
         """
-        更新用户标注进度
+        获取用户所在分组的ID（不加载分组详情）
+        返回: group_id 或 None
         """
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
         try:
             cursor.execute('''
-                UPDATE group_assignments 
-                SET progress_count = ?,
-                    status = CASE 
-                        WHEN progress_count >= total_segments THEN 'completed'
-                        ELSE 'in_progress'
-                    END,
-                    completed_at = CASE 
-                        WHEN progress_count >= total_segments THEN CURRENT_TIMESTAMP
-                        ELSE completed_at
-                    END
-                WHERE username = ? AND group_id = ?
-            ''', (progress_count, username, group_id))
+                SELECT group_id FROM group_assignments 
+                WHERE username = ?
+                ORDER BY assigned_at DESC
+                LIMIT 1
+            ''', (username,))
+            
+            result = cursor.fetchone()
+            return result[0] if result else None
             
+        finally:
+            conn.close()
+    
+    def init_progress_tracking(self):
+        """
+        启用服务端进度维护（应用启动时执行一次）
+        
+        - 在 group_assignments 上建立触发器，分配状态变化时自动汇总 group_status.completed_count
+        - 首次启用时根据已有标注全量重算一次各用户的 progress_count
+        """
+        if not self.ensure_database_exists():
+            return
+        
+        conn = sqlite3.connect(self.db_path)
+        try:
+            cursor = conn.cursor()
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_speaker_groups_speaker
+                ON speaker_groups(speaker_id, group_id)
+            ''')
+            cursor.execute('''
+                CREATE TRIGGER IF NOT EXISTS group_assignments_completed_rollup
+                AFTER UPDATE OF status ON group_assignments
+                FOR EACH ROW
+                WHEN (OLD.status = 'completed') != (NEW.status = 'completed')
+                BEGIN
+                    UPDATE group_status
+                    SET completed_count = (
+                            SELECT COUNT(*) FROM group_assignments
+                            WHERE group_id = NEW.group_id AND status = 'completed'
+                        ),
+                        updated_at = CURRENT_TIMESTAMP
+                    WHERE group_id = NEW.group_id;
+                END
+            ''')
             conn.commit()
-            return True
+            version = cursor.execute('PRAGMA user_version').fetchone()[0]
+        finally:
+            conn.close()
+        
+        if version < PROGRESS_TRACKING_VERSION:
+            self.recalculate_progress()
+            conn = sqlite3.connect(self.db_path)
+            try:
+                conn.execute(f'PRAGMA user_version = {PROGRESS_TRACKING_VERSION}')
+            finally:
+                conn.close()
+    
+    def attach(self, conn):
+        """
+        将分组数据库附加到 emotion_labels.db 的连接上（schema 名为 PROGRESS_SCHEMA），
+        使标注写入与进度更新在同一个事务中完成；必须在事务开始前调用
+        
+        Returns:
+            bool: 分组数据库不存在时返回False
+        """
+        if not os.path.exists(self.db_path):
+            return False
+        conn.execute(f'ATTACH DATABASE ? AS {PROGRESS_SCHEMA}', (self.db_path,))
+        return True
+    
+    @staticmethod
+    def apply_progress_delta(cursor, username, speaker_group, delta):
+        """
+        标注完成状态变化时调整用户在该说话人所属分组中的完成数
+        
+        在已附加分组数据库（attach）的连接上执行，不提交事务；
+        分配状态随之更新，group_status.completed_count 由触发器汇总
+        
+        Args:
+            cursor: emotion_labels.db 连接的游标
+            username (str): 用户名
+            speaker_group (str): 说话人分组（emotion_labels.speaker_group，对应 speaker_groups.speaker_id）
+            delta (int): +1 变为完成，-1 变为未完成
+        
+        Returns:
+            bool: 是否有分组进度被更新（说话人不在用户的分组中时为False）
+        """
+        if not delta:
+            return False
+        cursor.execute(f'''
+            UPDATE {PROGRESS_SCHEMA}.group_assignments
+            SET {_PROGRESS_STATUS_SQL.replace(':progress', 'MAX(progress_count + :delta, 0)')},
+                progress_count = MAX(progress_count + :delta, 0)
+            WHERE username = :username
+              AND group_id IN (
+                  SELECT group_id FROM {PROGRESS_SCHEMA}.speaker_groups WHERE speaker_id = :speaker_group
+              )
+        ''', {'delta': delta, 'username': username, 'speaker_group': speaker_group})
+        return cursor.rowcount > 0
+    
+    def recalculate_progress(self, username=None):
+        """
+        根据 emotion_labels 重新计算完成数（首次启用或数据修复时使用）
+        
+        Args:
+            username (str): 只重算该用户，默认全部用户
+        
+        Returns:
+            int: 更新的分配记录数
+        """
+        from services.database_service import DatabaseService
+        
+        conn = sqlite3.connect(self.db_path)
+        try:
+            conn.execute('ATTACH DATABASE ? AS labels', (DatabaseService.get_db_path(),))
+            cursor = conn.cursor()
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute('''
+                UPDATE group_assignments
+                SET progress_count = (
+                    SELECT COUNT(*) FROM labels.emotion_labels l
+                    WHERE l.username = group_assignments.username
+                      AND l.va_complete = 1 AND l.discrete_complete = 1
+                      AND l.speaker_group IN (
+                          SELECT speaker_id FROM speaker_groups sg
+                          WHERE sg.group_id = group_assignments.group_id
+                      )
+                )
+                WHERE :username IS NULL OR username = :username
+            ''', {'username': username})
+            updated = cursor.rowcount
+            cursor.execute(f'''
+                UPDATE group_assignments
+                SET {_PROGRESS_STATUS_SQL.replace(':progress', 'progress_count')}
+                WHERE :username IS NULL OR username = :username
+            ''', {'username': username})
+            conn.commit()
+            bump_version('groups', username)
+            return updated
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+    
+    def update_user_progress(self, username, group_id):
+        """
+        重新计算并返回用户在分组中的完成数
+        
+        完成数由保存标注时在服务端维护，不再接受客户端上报的数值
+        
+        Returns:
+            int: 完成数，用户未分配该分组时返回None
+        """
+        try:
+            self.recalculate_progress(username)
+            conn = sqlite3.connect(self.db_path)
+            try:
+                row = conn.execute('''
+                    SELECT progress_count FROM group_assignments
+                    WHERE username = ? AND group_id = ?
+                ''', (username, group_id)).fetchone()
+            finally:
+                conn.close()
+            return row[0] if row else None
             
         except Exception as e:
             print(f"更新进度失败: {e}")
-            return False
+            return None
+    
+    def get_all_user_assignments(self):
+        """
+        一次查询获取所有用户的分组分配和进度
+        
+        Returns:
+            dict: username -> {'group_id', 'status', 'progress_count', 'total_segments'}
+        """
+        conn = sqlite3.connect(self.db_path)
+        try:
+            rows = conn.execute('''
+                SELECT ga.username, ga.group_id, ga.status, ga.progress_count,
+                       COALESCE(gs.total_segments, ga.total_segments)
+                FROM group_assignments ga
+                LEFT JOIN group_status gs ON gs.group_id = ga.group_id
+                ORDER BY ga.assigned_at
+            ''').fetchall()
         finally:
             conn.close()
+        
+        return {
+            username: {
+                'group_id': group_id,
+                'status': status,
+                'progress_count': progress_count,
+                'total_segments': total_segments
+            } for username, group_id, status, progress_count, total_segments in rows
+        }
     
-    def get_group_speakers(self, group_id):
+    def get_group_speakers(self, group_id, conn=None):
         """
         获取分组中的所有说话人ID列表
+        
+        conn 为可选的共享连接（分组数据库已通过 attach 附加），不提供时新建连接
         """
-        conn = sqlite3.connect(self.db_path)
+        own_connection = conn is None
+        if own_connection:
+            conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
         try:
@@ -256,7 +484,8 @@ class GroupAssignmentManager:
             return [speaker[0] for speaker in speakers]
             
         finally:
-            conn.close()
+            if own_connection:
+                conn.close()
     
     def get_all_groups_status(self):
         """
@@ -1,7 +1,32 @@
 # models/emotion_model.py
 # models/emotion_model.py
+import re
 from datetime import datetime
 
+# 分组说话人形如 spkN，其下的具体说话人形如 spkN-x-y
+_GROUP_SPEAKER_PATTERN = re.compile(r'spk\d+$')
+_SUB_SPEAKER_PATTERN = re.compile(r'(spk\d+)-')
+
+# 标注内容字段：保存时可只提交其中一部分（如只提交VA或只提交离散情感），未提交的字段保持原值
+VA_FIELDS = ('v_value', 'a_value')
+DISCRETE_FIELDS = ('emotion_type', 'discrete_emotion', 'patient_status')
+LABEL_VALUE_FIELDS = VA_FIELDS + DISCRETE_FIELDS
+
+def is_group_speaker(speaker):
+    """判断是否为分组说话人（spkN）"""
+    return bool(_GROUP_SPEAKER_PATTERN.match(speaker))
+
+def get_speaker_group(speaker):
+    """
+    获取说话人所属的分组，写入 emotion_labels.speaker_group 列
+    
+    spkN-x-y 属于分组 spkN；其他说话人自成一组
+    """
+    if speaker is None:
+        return None
+    match = _SUB_SPEAKER_PATTERN.match(speaker)
+    return match.group(1) if match else speaker
+
 class EmotionLabel:
     """情感标注数据模型"""
     
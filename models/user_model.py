@@ -1,65 +1,87 @@
 import os
 import sqlite3
+import threading
+import time
 from config import Config
+from utils.db_pool import get_pool
+
+_user_model_instance = None
+_user_model_lock = threading.Lock()
+
+def get_user_model():
+    """
+    获取进程内共享的用户模型实例
+    首次调用时才创建，避免在模块导入阶段访问数据库；表结构由启动钩子调用 init_database 创建
+    """
+    global _user_model_instance
+    if _user_model_instance is None:
+        with _user_model_lock:
+            if _user_model_instance is None:
+                _user_model_instance = UserModel()
+    return _user_model_instance
 
 class UserModel:
     """用户数据模型类"""
     
     def __init__(self):
-        """初始化数据库连接"""
+        """初始化数据库路径和测试设置缓存（不访问数据库）"""
         self.db_path = os.path.join(Config.DATABASE_FOLDER, 'users.db')
-        self.init_database()
+        # 测试设置缓存: wechat_name -> (过期时间, 设置字典或None)
+        self._settings_cache = {}
+        self._settings_cache_lock = threading.Lock()
+    
+    @property
+    def pool(self):
+        """当前进程的连接池"""
+        return get_pool(self.db_path)
     
     def init_database(self):
-        """初始化数据库表"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # 创建用户表
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                wechat_name TEXT NOT NULL UNIQUE,
-                phone_number TEXT NOT NULL,
-                skip_test BOOLEAN DEFAULT FALSE,
-                skip_consistency_test BOOLEAN DEFAULT FALSE,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        conn.commit()
-        conn.close()
+        """初始化数据库表（应用启动时执行一次）"""
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            
+            # 创建用户表
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS users (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    wechat_name TEXT NOT NULL UNIQUE,
+                    phone_number TEXT NOT NULL,
+                    skip_test BOOLEAN DEFAULT FALSE,
+                    skip_consistency_test BOOLEAN DEFAULT FALSE,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            conn.commit()
     
     def add_user(self, wechat_name, phone_number):
         """添加新用户"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        try:
-            cursor.execute(
-                'INSERT INTO users (wechat_name, phone_number) VALUES (?, ?)',
-                (wechat_name, phone_number)
-            )
-            conn.commit()
-            return True
-        except sqlite3.IntegrityError:
-            # 用户已存在
-            return False
-        finally:
-            conn.close()
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            
+            try:
+                cursor.execute(
+                    'INSERT INTO users (wechat_name, phone_number) VALUES (?, ?)',
+                    (wechat_name, phone_number)
+                )
+                conn.commit()
+                self.invalidate_test_settings(wechat_name)
+                return True
+            except sqlite3.IntegrityError:
+                # 用户已存在
+                return False
     
     def get_user(self, wechat_name):
         """根据微信昵称获取用户信息"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            'SELECT * FROM users WHERE wechat_name = ?',
-            (wechat_name,)
-        )
-        
-        user = cursor.fetchone()
-        conn.close()
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute(
+                'SELECT id, wechat_name, phone_number, created_at FROM users WHERE wechat_name = ?',
+                (wechat_name,)
+            )
+            
+            user = cursor.fetchone()
         
         if user:
             return {
@@ -72,27 +94,25 @@ class UserModel:
     
     def verify_user(self, wechat_name, phone_number):
         """验证用户登录信息"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            'SELECT * FROM users WHERE wechat_name = ? AND phone_number = ?',
-            (wechat_name, phone_number)
-        )
-        
-        user = cursor.fetchone()
-        conn.close()
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute(
+                'SELECT 1 FROM users WHERE wechat_name = ? AND phone_number = ?',
+                (wechat_name, phone_number)
+            )
+            
+            user = cursor.fetchone()
         
         return user is not None
     
     def get_all_users(self):
         """获取所有用户列表"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT wechat_name, phone_number, skip_test, skip_consistency_test, created_at FROM users ORDER BY created_at DESC')
-        users = cursor.fetchall()
-        conn.close()
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('SELECT wechat_name, phone_number, skip_test, skip_consistency_test, created_at FROM users ORDER BY created_at DESC')
+            users = cursor.fetchall()
         
         return [{
             'wechat_name': user[0],
@@ -110,68 +130,92 @@ class UserModel:
             wechat_name (str): 用户微信昵称
             skip_test (bool, optional): 是否跳过能力测试
             skip_consistency_test (bool, optional): 是否跳过一致性测试
-            
+        
         Returns:
             bool: 更新是否成功
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        # 构建更新语句
+        update_fields = []
+        params = []
+        
+        if skip_test is not None:
+            update_fields.append('skip_test = ?')
+            params.append(skip_test)
+        
+        if skip_consistency_test is not None:
+            update_fields.append('skip_consistency_test = ?')
+            params.append(skip_consistency_test)
+        
+        if not update_fields:
+            return False
+        
+        params.append(wechat_name)
         
         try:
-            # 构建更新语句
-            update_fields = []
-            params = []
-            
-            if skip_test is not None:
-                update_fields.append('skip_test = ?')
-                params.append(skip_test)
+            with self.pool.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    f'UPDATE users SET {", ".join(update_fields)} WHERE wechat_name = ?',
+                    params
+                )
+                conn.commit()
+                updated = cursor.rowcount > 0
             
-            if skip_consistency_test is not None:
-                update_fields.append('skip_consistency_test = ?')
-                params.append(skip_consistency_test)
-            
-            if not update_fields:
-                return False
-            
-            params.append(wechat_name)
-            
-            cursor.execute(
-                f'UPDATE users SET {", ".join(update_fields)} WHERE wechat_name = ?',
-                params
-            )
-            
-            conn.commit()
-            return cursor.rowcount > 0
+            self.invalidate_test_settings(wechat_name)
+            return updated
         except Exception as e:
             print(f"更新用户测试设置失败: {e}")
             return False
-        finally:
-            conn.close()
     
     def get_user_test_settings(self, wechat_name):
         """
         获取用户的测试跳过设置
         
+        结果在进程内缓存 Config.USER_SETTINGS_CACHE_TTL 秒（默认30秒），只有本进程内更新设置时立即失效；
+        多进程部署时管理员修改设置后，其他工作进程最多在缓存到期前仍返回旧值
+        
         Args:
             wechat_name (str): 用户微信昵称
-            
+        
         Returns:
             dict: 包含测试设置的字典，如果用户不存在返回None
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            'SELECT skip_test, skip_consistency_test FROM users WHERE wechat_name = ?',
-            (wechat_name,)
-        )
+        now = time.monotonic()
+        cached = self._settings_cache.get(wechat_name)
+        if cached and cached[0] > now:
+            return dict(cached[1]) if cached[1] is not None else None
         
-        result = cursor.fetchone()
-        conn.close()
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute(
+                'SELECT skip_test, skip_consistency_test FROM users WHERE wechat_name = ?',
+                (wechat_name,)
+            )
+            
+            result = cursor.fetchone()
         
+        settings = None
         if result:
-            return {
+            settings = {
                 'skip_test': bool(result[0]),
                 'skip_consistency_test': bool(result[1])
             }
-        return None
\ No newline at end of file
+        
+        with self._settings_cache_lock:
+            self._settings_cache[wechat_name] = (now + Config.USER_SETTINGS_CACHE_TTL, settings)
+        
+        return dict(settings) if settings is not None else None
+    
+    def invalidate_test_settings(self, wechat_name=None):
+        """
+        使测试设置缓存失效
+        
+        Args:
+            wechat_name (str, optional): 用户微信昵称，为空时清空全部缓存
+        """
+        with self._settings_cache_lock:
+            if wechat_name is None:
+                self._settings_cache.clear()
+            else:
+                self._settings_cache.pop(wechat_name, None)
\ No newline at end of file
@@ -5,11 +5,18 @@
 """
 
 import os
-from flask import Blueprint, jsonify, request, render_template, session, send_file
+import json
+import time
+from datetime import datetime, timezone
+from flask import Blueprint, jsonify, request, render_template, session, send_file, Response, stream_with_context
 from services.admin_service import AdminService
+from services.change_bus import get_change_bus
+from services.data_version import versioned, get_data_versions
 from services.user_service import UserService
-from models.admin_model import AdminModel
+from models.admin_model import AdminModel, get_admin_model
 from utils.logger import emotion_logger, get_client_ip
+from utils.session_store import regenerate_session
+from utils.audio_inventory import tree_mtime
 from config import Config
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
@@ -21,7 +28,7 @@ def admin_required(f):
     
     Args:
         f: 被装饰的函数
-        
+    
     Returns:
         装饰后的函数
     """
@@ -39,7 +46,7 @@ def super_admin_required(f):
     
     Args:
         f: 被装饰的函数
-        
+    
     Returns:
         装饰后的函数
     """
@@ -51,7 +58,7 @@ def super_admin_required(f):
         if not admin_username:
             return jsonify({"error": "管理员身份验证失败"}), 403
         
-        admin_model = AdminModel()
+        admin_model = get_admin_model()
         if not admin_model.is_super_admin(admin_username):
             return jsonify({"error": "需要超级管理员权限"}), 403
         
@@ -92,10 +99,12 @@ def admin_login():
             )
             return jsonify({"success": False, "message": "用户名和密码不能为空"}), 400
         
-        admin_model = AdminModel()
+        admin_model = get_admin_model()
         admin_info = admin_model.verify_admin(username, password)
         
         if admin_info:
+            # 更换会话ID，防止会话固定攻击
+            regenerate_session()
             session['is_admin'] = True
             session['admin_username'] = username
             session['admin_role'] = admin_info['role']
@@ -128,7 +137,7 @@ def admin_login():
                 ip_address=ip_address
             )
             return jsonify({"success": False, "message": "用户名或密码错误"}), 401
-            
+    
     except Exception as e:
         emotion_logger.log_error(e, "管理员登录异常", username)
         return jsonify({"error": str(e)}), 500
@@ -162,7 +171,7 @@ def get_consistency_stats():
             'users_count': users_count,
             'samples_count': samples_count
         })
-        
+    
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -176,16 +185,16 @@ def get_users_test_settings():
         JSON响应，包含所有用户的测试设置信息
     """
     try:
-        from models.user_model import UserModel
+        from models.user_model import get_user_model
         
-        user_model = UserModel()
+        user_model = get_user_model()
         users = user_model.get_all_users()
         
         return jsonify({
             'success': True,
             'users': users
         })
-        
+    
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -199,7 +208,7 @@ def update_user_test_settings():
         JSON响应，包含更新结果
     """
     try:
-        from models.user_model import UserModel
+        from models.user_model import get_user_model
         
         data = request.get_json()
         username = data.get('username')
@@ -209,7 +218,7 @@ def update_user_test_settings():
         if not username:
             return jsonify({"error": "用户名不能为空"}), 400
         
-        user_model = UserModel()
+        user_model = get_user_model()
         success = user_model.update_user_test_settings(
             username, 
             skip_test=skip_test, 
@@ -217,6 +226,10 @@ def update_user_test_settings():
         )
         
         if success:
+            # 同步更新该用户已登录会话中缓存的测试设置
+            from utils.session_store import update_user_sessions
+            update_user_sessions(username, test_settings=user_model.get_user_test_settings(username))
+            
             return jsonify({
                 'success': True,
                 'message': '用户测试设置更新成功'
@@ -226,7 +239,7 @@ def update_user_test_settings():
                 'success': False,
                 'message': '用户不存在或更新失败'
             }), 404
-        
+    
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -253,7 +266,7 @@ def get_consistency_users():
             'success': True,
             'users': users
         })
-        
+    
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -264,131 +277,45 @@ def calculate_user_consistency(username):
     
     Args:
         username (str): 用户名
-        
+    
     Returns:
         JSON响应，包含用户一致性分析结果
     """
     try:
-        import json
-        import os
-        from services.database_service import DatabaseService
-        
-        # 获取用户的一致性测试结果
-        conn = DatabaseService.get_connection()
-        cursor = conn.cursor()
+        from services.agreement_service import get_agreement_engine
         
-        cursor.execute('''
-            SELECT audio_file, v_value, a_value, emotion_type, discrete_emotion, patient_status
-            FROM consistency_test_results 
-            WHERE username = ?
-        ''', (username,))
-        
-        user_results = cursor.fetchall()
-        conn.close()
+        report = get_agreement_engine().get_user_report(username)
         
-        if not user_results:
+        if not report:
             return jsonify({
                 'success': False,
                 'error': '该用户没有一致性测试数据'
             }), 404
         
-        # 读取标准答案
-        consistency_dir = '/mnt/shareEEx/liuyang/code/emotion_labeling_refactoring/data/consistency_test'
-        standard_answers = {}
-        
-        for filename in os.listdir(consistency_dir):
-            if filename.endswith('.json'):
-                json_path = os.path.join(consistency_dir, filename)
-                with open(json_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    audio_file = data.get('audio_file')
-                    if audio_file:
-                        standard_answers[audio_file] = data
-        
-        # 计算一致性
-        total_samples = len(user_results)
-        consistency_scores = {
-            'v_value': 0,
-            'a_value': 0,
-            'emotion_type': 0,
-            'discrete_emotion': 0,
-            'patient_status': 0
-        }
-        
-        detailed_results = []
-        
-        for result in user_results:
-            audio_file = result[0]
-            user_v = result[1]
-            user_a = result[2]
-            user_emotion_type = result[3]
-            user_discrete = result[4]
-            user_patient = result[5]
-            
-            if audio_file in standard_answers:
-                standard = standard_answers[audio_file]
-                
-                # V值一致性（允许±0.5误差）
-                v_consistent = abs(float(user_v or 0) - float(standard.get('v_value', 0))) <= 0.5
-                if v_consistent:
-                    consistency_scores['v_value'] += 1
-                
-                # A值一致性（允许±0.5误差）
-                a_consistent = abs(float(user_a or 0) - float(standard.get('a_value', 0))) <= 0.5
-                if a_consistent:
-                    consistency_scores['a_value'] += 1
-                
-                # 情感类型一致性
-                emotion_type_consistent = user_emotion_type == standard.get('emotion_type')
-                if emotion_type_consistent:
-                    consistency_scores['emotion_type'] += 1
-                
-                # 离散情感一致性
-                discrete_consistent = user_discrete == standard.get('discrete_emotion')
-                if discrete_consistent:
-                    consistency_scores['discrete_emotion'] += 1
-                
-                # 患者状态一致性
-                patient_consistent = user_patient == standard.get('patient_status')
-                if patient_consistent:
-                    consistency_scores['patient_status'] += 1
-                
-                detailed_results.append({
-                    'audio_file': audio_file,
-                    'v_consistent': v_consistent,
-                    'a_consistent': a_consistent,
-                    'emotion_type_consistent': emotion_type_consistent,
-                    'discrete_consistent': discrete_consistent,
-                    'patient_consistent': patient_consistent,
-                    'user_values': {
-                        'v_value': user_v,
-                        'a_value': user_a,
-                        'emotion_type': user_emotion_type,
-                        'discrete_emotion': user_discrete,
-                        'patient_status': user_patient
-                    },
-                    'standard_values': standard
-                })
-        
-        # 计算百分比
-        consistency_percentages = {}
-        for key, score in consistency_scores.items():
-            consistency_percentages[key] = (score / total_samples * 100) if total_samples > 0 else 0
-        
-        # 计算总体一致性
-        overall_consistency = sum(consistency_percentages.values()) / len(consistency_percentages)
+        return jsonify({'success': True, **report})
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@admin_bp.route('/api/consistency/report')
+@admin_required
+def get_consistency_report():
+    """
+    获取全部用户的一致性分析结果（一次请求返回所有用户）
+    
+    Returns:
+        JSON响应，包含全体一致性指标（Fleiss kappa、Krippendorff alpha、离散情感混淆矩阵）
+        和每个用户与标准答案的一致性
+    """
+    try:
+        from services.agreement_service import get_agreement_engine
         
-        return jsonify({
-            'success': True,
-            'username': username,
-            'total_samples': total_samples,
-            'consistency_scores': consistency_scores,
-            'consistency_percentages': consistency_percentages,
-            'overall_consistency': overall_consistency,
-            'detailed_results': detailed_results
-        })
+        report = get_agreement_engine().get_all_users_report()
         
+        return jsonify({'success': True, **report})
+    
     except Exception as e:
+        emotion_logger.log_error(e, "获取一致性分析报告失败", session.get('admin_username'))
         return jsonify({"error": str(e)}), 500
 
 # 管理员管理相关路由
@@ -402,7 +329,7 @@ def get_all_admins():
         JSON响应，包含管理员列表
     """
     try:
-        admin_model = AdminModel()
+        admin_model = get_admin_model()
         admins = admin_model.get_all_admins()
         
         # 获取当前管理员信息
@@ -421,7 +348,7 @@ def get_all_admins():
             "admins": admins,
             "current_admin": current_admin
         })
-        
+    
     except Exception as e:
         emotion_logger.log_error(e, "获取管理员列表异常", session.get('admin_username'))
         return jsonify({"error": str(e)}), 500
@@ -444,7 +371,7 @@ def create_admin():
         if not username or not password:
             return jsonify({"success": False, "message": "用户名和密码不能为空"}), 400
         
-        admin_model = AdminModel()
+        admin_model = get_admin_model()
         # 新创建的管理员默认为普通管理员角色
         role = AdminModel.ROLE_ADMIN
         created_by = session.get('admin_username')
@@ -463,7 +390,7 @@ def create_admin():
             return jsonify({"success": True, "message": "管理员创建成功"})
         else:
             return jsonify({"success": False, "message": "管理员用户名已存在"}), 409
-            
+    
     except Exception as e:
         emotion_logger.log_error(e, "创建管理员异常", session.get('admin_username'))
         return jsonify({"error": str(e)}), 500
@@ -476,7 +403,7 @@ def update_admin_status(admin_id):
     
     Args:
         admin_id: 管理员ID
-        
+    
     Returns:
         JSON响应，包含更新结果
     """
@@ -487,7 +414,7 @@ def update_admin_status(admin_id):
         if is_active is None:
             return jsonify({"success": False, "message": "缺少is_active参数"}), 400
         
-        admin_model = AdminModel()
+        admin_model = get_admin_model()
         success = admin_model.update_admin_status(admin_id, is_active)
         
         if success:
@@ -503,7 +430,7 @@ def update_admin_status(admin_id):
             return jsonify({"success": True, "message": "管理员状态更新成功"})
         else:
             return jsonify({"success": False, "message": "管理员不存在或更新失败"}), 404
-            
+    
     except Exception as e:
         emotion_logger.log_error(e, "更新管理员状态异常", session.get('admin_username'))
         return jsonify({"error": str(e)}), 500
@@ -516,12 +443,12 @@ def delete_admin(admin_id):
     
     Args:
         admin_id: 管理员ID
-        
+    
     Returns:
         JSON响应，包含删除结果
     """
     try:
-        admin_model = AdminModel()
+        admin_model = get_admin_model()
         
         # 获取要删除的管理员信息
         admins = admin_model.get_all_admins()
@@ -549,7 +476,7 @@ def delete_admin(admin_id):
             return jsonify({"success": True, "message": "管理员删除成功"})
         else:
             return jsonify({"success": False, "message": "删除失败"}), 500
-            
+    
     except Exception as e:
         emotion_logger.log_error(e, "删除管理员异常", session.get('admin_username'))
         return jsonify({"error": str(e)}), 500
@@ -572,7 +499,7 @@ def change_admin_password():
             return jsonify({"success": False, "message": "旧密码和新密码不能为空"}), 400
         
         admin_username = session.get('admin_username')
-        admin_model = AdminModel()
+        admin_model = get_admin_model()
         
         # 验证旧密码
         if not admin_model.verify_admin(admin_username, old_password):
@@ -590,7 +517,7 @@ def change_admin_password():
             return jsonify({"success": True, "message": "密码修改成功"})
         else:
             return jsonify({"success": False, "message": "密码修改失败"}), 500
-            
+    
     except Exception as e:
         emotion_logger.log_error(e, "修改管理员密码异常", session.get('admin_username'))
         return jsonify({"error": str(e)}), 500
@@ -633,7 +560,7 @@ def admin_logout():
             "message": "登出成功",
             "redirect": "/admin/login"
         })
-        
+    
     except Exception as e:
         error_msg = str(e)
         emotion_logger.log_error(e, "管理员登出异常", session.get('admin_username'))
@@ -643,7 +570,7 @@ def admin_logout():
             session.clear()
         except:
             pass
-            
+        
         return jsonify({
             "error": error_msg,
             "message": "登出过程中出现错误，但会话已清除",
@@ -661,8 +588,89 @@ def dashboard():
     """
     return render_template('admin_dashboard.html')
 
+# SSE 心跳间隔（秒）
+EVENT_STREAM_HEARTBEAT = 15
+# 检查其他工作进程是否写入了标注的间隔（秒）；多进程部署时大部分写入来自其他进程，只能以 resync 送达
+EVENT_STREAM_EXTERNAL_CHECK = 2
+# 单个 SSE 连接的最长保持时间（秒），到期后由浏览器自动重连，避免长期占用同一工作线程
+EVENT_STREAM_MAX_AGE = 300
+
+def _sse_message(event_type, data, event_id=None):
+    """格式化一条 SSE 消息"""
+    lines = []
+    if event_id:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event_type}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False)}")
+    return "\n".join(lines) + "\n\n"
+
+@admin_bp.route('/api/events')
+@admin_required
+def admin_event_stream():
+    """
+    管理后台变更推送（Server-Sent Events）
+    
+    推送本进程标注写入路径发布的增量事件（label_saved / user_reset），客户端据此更新计数，
+    不再反复请求聚合接口。事件丢失（断线太久、重连到其他进程）或其他工作进程写入了标注时
+    推送 resync，客户端重新加载当前页面的数据
+    """
+    bus = get_change_bus()
+    cursor, cursor_valid = bus.resolve_cursor(request.headers.get('Last-Event-ID'))
+    
+    def stream():
+        nonlocal cursor
+        # 通过共享的 labels 数据版本感知其他工作进程的标注写入（只读内存映射，不访问数据库）；
+        # 本进程的写入先递增版本再发布事件，收到事件时同步版本，只有总线未见到的写入才触发 resync。
+        # 播放次数等其他数据的写入不改变 labels 版本
+        versions = get_data_versions()
+        labels_version = versions.get('labels')
+        yield "retry: 3000\n\n"
+        if not cursor_valid:
+            yield _sse_message('resync', {'reason': 'reconnected'}, bus.event_id(cursor))
+        
+        deadline = time.monotonic() + EVENT_STREAM_MAX_AGE
+        next_heartbeat = time.monotonic() + EVENT_STREAM_HEARTBEAT
+        while time.monotonic() < deadline:
+            events, cursor, missed = bus.wait(cursor, EVENT_STREAM_EXTERNAL_CHECK)
+            if missed:
+                labels_version = versions.get('labels')
+                next_heartbeat = time.monotonic() + EVENT_STREAM_HEARTBEAT
+                yield _sse_message('resync', {'reason': 'missed'}, bus.event_id(cursor))
+                continue
+            for seq, event_type, data in events:
+                yield _sse_message(event_type, data, bus.event_id(seq))
+            
+            current_version = versions.get('labels')
+            if events:
+                labels_version = current_version
+            elif current_version != labels_version:
+                labels_version = current_version
+                yield _sse_message('resync', {'reason': 'external'}, bus.event_id(cursor))
+            elif time.monotonic() < next_heartbeat:
+                continue
+            else:
+                yield ": keepalive\n\n"
+            next_heartbeat = time.monotonic() + EVENT_STREAM_HEARTBEAT
+    
+    return Response(stream_with_context(stream()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # 关闭 nginx 缓冲
+    })
+
+def _audio_tree_stamp():
+    """
+    音频目录树的最新修改时间
+    
+    总音频数递归统计各级子目录，只看根目录的修改时间会漏掉说话人目录内增删的音频
+    """
+    try:
+        return tree_mtime(Config.AUDIO_FOLDER)
+    except OSError:
+        return 0
+
 @admin_bp.route('/api/overview')
 @admin_required
+@versioned(lambda: ([('labels', None)], (datetime.now().date().isoformat(), _audio_tree_stamp())))
 def get_overview():
     """
     获取系统概览数据
@@ -678,6 +686,7 @@ def get_overview():
 
 @admin_bp.route('/api/users')
 @admin_required
+@versioned(lambda: ([('labels', None), ('play_counts', None), ('groups', None), ('group_layout', None)], ()))
 def get_users():
     """
     获取所有用户列表及其标注统计
@@ -693,13 +702,14 @@ def get_users():
 
 @admin_bp.route('/api/users/<username>/details')
 @admin_required
+@versioned(lambda username: ([('labels', username), ('play_counts', username)], (username,)))
 def get_user_details(username):
     """
     获取指定用户的详细标注信息
     
     Args:
         username (str): 用户名
-        
+    
     Returns:
         JSON响应，包含用户详细标注信息
     """
@@ -711,6 +721,7 @@ def get_user_details(username):
 
 @admin_bp.route('/api/speakers')
 @admin_required
+@versioned(lambda: ([('labels', None)], ()))
 def get_speakers_statistics():
     """
     获取所有说话人的标注统计
@@ -726,6 +737,8 @@ def get_speakers_statistics():
 
 @admin_bp.route('/api/progress')
 @admin_required
+# 按日期统计的范围由 SQLite 的 DATE('now')（UTC）决定
+@versioned(lambda: ([('labels', None)], (datetime.now(timezone.utc).date().isoformat(),)))
 def get_annotation_progress():
     """
     获取标注进度统计
@@ -741,6 +754,7 @@ def get_annotation_progress():
 
 @admin_bp.route('/api/quality')
 @admin_required
+@versioned(lambda: ([('labels', None), ('play_counts', None)], ()))
 def get_annotation_quality():
     """
     获取标注质量分析
@@ -754,6 +768,79 @@ def get_annotation_quality():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@admin_bp.route('/api/agreement')
+@admin_required
+@versioned(lambda: ([('agreement', None)], (request.args.get('limit'), request.args.get('offset'))))
+def get_label_agreement():
+    """
+    获取正式标注的标注者间一致性汇总（由一致性分析任务预先计算）
+    
+    Query Parameters:
+        limit (int): 返回分歧最大的文件数，默认50
+        offset (int): 分页偏移，默认0
+    
+    Returns:
+        JSON响应，包含每个用户的偏差与可靠性、分歧最大的文件
+    """
+    try:
+        from services.label_agreement_service import get_user_agreement, get_disagreement_files
+        
+        limit = request.args.get('limit', 50, type=int)
+        offset = request.args.get('offset', 0, type=int)
+        
+        return jsonify({
+            'success': True,
+            **get_user_agreement(),
+            **get_disagreement_files(limit=limit, offset=offset)
+        })
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@admin_bp.route('/api/agreement/refresh', methods=['POST'])
+@admin_required
+def refresh_label_agreement():
+    """
+    在后台增量更新标注者间一致性汇总（只处理上次运行后标注有变化的文件）
+    
+    分析在后台线程中分批提交，请求立即返回；完成情况通过 /api/agreement/status 查询
+    
+    Returns:
+        JSON响应，包含是否已启动和最近一次完成的分析结果
+    """
+    try:
+        from services.label_agreement_service import start_analysis, get_analysis_status
+        
+        full = bool((request.get_json(silent=True) or {}).get('full'))
+        started = start_analysis(full=full)
+        
+        emotion_logger.log_user_activity(
+            username=session.get('admin_username'),
+            action="更新标注一致性分析",
+            details={'full': full, 'started': started},
+            ip_address=get_client_ip()
+        )
+        
+        return jsonify({'success': True, 'started': started, **get_analysis_status()}), 202
+    except Exception as e:
+        emotion_logger.log_error(e, "更新标注一致性分析失败", session.get('admin_username'))
+        return jsonify({"error": str(e)}), 500
+
+@admin_bp.route('/api/agreement/status')
+@admin_required
+def get_label_agreement_status():
+    """
+    标注者间一致性分析的运行状态
+    
+    Returns:
+        JSON响应，包含本进程是否正在分析和最近一次完成的分析结果
+    """
+    try:
+        from services.label_agreement_service import get_analysis_status
+        
+        return jsonify({'success': True, **get_analysis_status()})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @admin_bp.route('/api/export')
 @admin_required
 def export_data():
@@ -817,7 +904,7 @@ def download_export_data():
             )
         else:
             return jsonify({"error": "导出失败"}), 500
-            
+    
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -829,7 +916,7 @@ def reset_user_progress(username):
     
     Args:
         username (str): 用户名
-        
+    
     Returns:
         JSON响应，包含重置结果
     """
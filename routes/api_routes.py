@@ -1,22 +1,76 @@
 import os
 import re
-from flask import Blueprint, jsonify, request, session, send_from_directory
+from flask import Blueprint, jsonify, request, session, send_from_directory, send_file
 from services.audio_service import AudioService
 from services.label_service import LabelService
 from services.user_service import UserService
-from models.user_model import UserModel
+from services.bootstrap_service import BootstrapService
+from services.database_service import LabelConflictError
+from services.data_version import versioned, path_stamp
+from models.user_model import get_user_model
+from models.emotion_model import LABEL_VALUE_FIELDS
+from routes.main_routes import get_session_context
+from config import Config
 from utils.logger import emotion_logger, log_api_call, get_client_ip
+from utils.waveform_peaks import ensure_peaks
 import traceback
 
 api_bp = Blueprint('api', __name__, url_prefix='/api')
 
+def _session_group_id(username):
+    """当前会话属于该用户时，返回会话中缓存的分组ID，否则返回None"""
+    context = get_session_context()
+    if context and context['username'] == username:
+        return context['group_id']
+    return None
+
+def _cached_test_settings(username):
+    """
+    获取用户测试设置：当前会话属于该用户时直接使用会话中缓存的设置，否则查询用户模型
+    """
+    context = get_session_context()
+    if context and context['username'] == username and context['test_settings'] is not None:
+        return context['test_settings']
+    return get_user_model().get_user_test_settings(username)
+
+def _valid_label_version(version):
+    """保存标注时提交的行版本：不提供，或非负整数"""
+    return version is None or (isinstance(version, int) and not isinstance(version, bool) and version >= 0)
+
+def _speakers_versions(username):
+    """说话人列表的 ETag：分组、用户的分组分配和排序、音频目录下的说话人目录"""
+    return ([('group_layout', None), ('groups', username), ('orders', username)],
+            (username, _session_group_id(username), path_stamp(Config.AUDIO_FOLDER)))
+
+def _audio_list_versions(username, speaker):
+    """
+    音频列表的 ETag：用户的标注和排序、说话人目录
+    
+    没有用户名时列表是随机打乱的，不使用 ETag
+    """
+    if not username:
+        return None, None
+    if re.match(r'spk\d+$', speaker):
+        try:
+            folders = sorted(
+                os.path.join(Config.AUDIO_FOLDER, d) for d in os.listdir(Config.AUDIO_FOLDER)
+                if d.startswith(speaker + '-')
+            )
+        except OSError:
+            folders = []
+    else:
+        folders = [os.path.join(Config.AUDIO_FOLDER, speaker)]
+    return ([('labels', username), ('orders', username)],
+            (username, speaker, path_stamp(Config.AUDIO_FOLDER, *folders)))
+
 @api_bp.route("/speakers")
 @log_api_call
+@versioned(lambda: _speakers_versions(request.args.get('username', 'default')))
 def get_speakers():
     """获取所有说话人列表（查询参数方式）"""
     try:
         username = request.args.get('username', 'default')
-        speakers = AudioService.get_speakers_list(username)
+        speakers = AudioService.get_speakers_list(username, _session_group_id(username))
         
         emotion_logger.log_user_activity(
             username=username,
@@ -31,32 +85,23 @@ def get_speakers():
         return jsonify({"error": str(e)}), 500
 
 @api_bp.route("/speakers/<username>")
+@versioned(_speakers_versions)
 def get_speakers_by_path(username):
     """获取所有说话人列表（路径参数方式）"""
     try:
-        speakers = AudioService.get_speakers_list(username)
+        speakers = AudioService.get_speakers_list(username, _session_group_id(username))
         return jsonify(speakers)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @api_bp.route("/audio_list/<speaker>")
 @log_api_call
+@versioned(lambda speaker: _audio_list_versions(request.args.get('username', ''), speaker))
 def get_audio_list(speaker):
     """获取指定说话人的音频文件列表（查询参数方式）"""
     try:
         username = request.args.get('username', '')
-        audio_files = AudioService.get_audio_files_list(speaker, username)
-        labeled_files, annotation_completeness = LabelService.get_labeled_files(username, speaker)
-        
-        result = []
-        for audio_file in audio_files:
-            file_name = os.path.basename(audio_file)
-            result.append({
-                "file_name": file_name,
-                "path": f"/api/audio/{speaker}/{file_name}",
-                "labeled": file_name in labeled_files,
-                "annotation_completeness": annotation_completeness.get(file_name, ['none']),
-            })
+        result = BootstrapService.get_audio_list(speaker, username)
         
         emotion_logger.log_user_activity(
             username=username,
@@ -71,22 +116,11 @@ def get_audio_list(speaker):
         return jsonify({"error": str(e)}), 500
 
 @api_bp.route("/audio_list/<username>/<speaker>")
+@versioned(_audio_list_versions)
 def get_audio_list_by_path(username, speaker):
     """获取指定说话人的音频文件列表（路径参数方式）"""
     try:
-        audio_files = AudioService.get_audio_files_list(speaker, username)
-        labeled_files, annotation_completeness = LabelService.get_labeled_files(username, speaker)
-        
-        result = []
-        for audio_file in audio_files:
-            file_name = os.path.basename(audio_file)
-            result.append({
-                "file_name": file_name,
-                "path": f"/api/audio/{speaker}/{file_name}",
-                "labeled": file_name in labeled_files,
-                "annotation_completeness": annotation_completeness.get(file_name, ['none']),
-            })
-        
+        result = BootstrapService.get_audio_list(speaker, username)
         return jsonify(result)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -116,10 +150,36 @@ def get_audio(speaker, filename):
         emotion_logger.log_error(e, f"获取音频文件失败 - speaker: {speaker}, file: {filename}", session.get('username'))
         return jsonify({"error": str(e)}), 500
 
+@api_bp.route("/waveform/<speaker>/<filename>")
+def get_waveform(speaker, filename):
+    """
+    音频的波形峰值数据（audiowaveform .dat 格式，8位 min/max），缓存不存在或已过期时生成
+    
+    缓存文件的修改时间和大小作为 ETag，音频不变时浏览器重新验证得到 304
+    """
+    try:
+        file_path, _ = AudioService.find_audio_file(speaker, filename)
+        if not file_path:
+            return jsonify({"error": f"找不到音频文件 {filename}"}), 404
+        
+        peaks_path = ensure_peaks(file_path)
+        response = send_file(peaks_path, mimetype='application/octet-stream', conditional=True)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    except Exception as e:
+        emotion_logger.log_error(e, f"获取波形数据失败 - speaker: {speaker}, file: {filename}", session.get('username'))
+        return jsonify({"error": str(e)}), 500
+
 @api_bp.route("/save_label", methods=["POST"])
 @log_api_call
 def save_label():
-    """保存情感标注结果"""
+    """
+    保存情感标注结果
+    
+    可只提交部分标注内容（如只提交 v_value / a_value），未提交的字段保持原值；
+    带 version（get_label 返回的行版本，新记录为0）时检查记录是否已被修改，
+    已被修改时返回 409 和当前记录
+    """
     try:
         data = request.json
         speaker = data.get("speaker")
@@ -129,6 +189,11 @@ def save_label():
         if not all([speaker, audio_file, username]):
             emotion_logger.log_error("缺少必要参数", "保存标注", username)
             return jsonify({"error": "缺少必要参数"}), 400
+        if not any(field in data for field in LABEL_VALUE_FIELDS):
+            emotion_logger.log_error("缺少标注内容", "保存标注", username)
+            return jsonify({"error": "缺少标注内容"}), 400
+        if not _valid_label_version(data.get("version")):
+            return jsonify({"error": "version 参数无效"}), 400
         
         # 查找音频文件
         file_path, actual_speaker = AudioService.find_audio_file(speaker, audio_file)
@@ -137,8 +202,11 @@ def save_label():
             return jsonify({"error": f"找不到音频文件 {audio_file}"}), 404
         
         # 保存标注
-        success = LabelService.save_label(data, actual_speaker, file_path)
-        if success:
+        try:
+            version = LabelService.save_label(data, actual_speaker, file_path)
+        except LabelConflictError as e:
+            return jsonify({"success": False, "conflict": True, "error": str(e), "current": e.current}), 409
+        if version:
             # 记录标注活动
             emotion_logger.log_annotation_activity(
                 username=username,
@@ -147,17 +215,95 @@ def save_label():
                 action="保存",
                 annotation_data=data
             )
-            return jsonify({"success": True})
+            return jsonify({"success": True, "version": version})
         else:
             emotion_logger.log_error("保存失败", "保存标注", username)
             return jsonify({"error": "保存失败"}), 500
-            
+    
     except Exception as e:
         emotion_logger.log_error(e, "保存标注失败", username, traceback.format_exc())
         return jsonify({"error": str(e)}), 500
 
+@api_bp.route("/save_labels", methods=["POST"])
+@log_api_call
+def save_labels():
+    """
+    批量保存情感标注结果（客户端写入队列批量提交）
+    
+    Request Body:
+        labels (list): 标注数据列表，每条与 /save_label 的请求体相同（可只含部分标注内容），可带 client_id
+    
+    Returns:
+        results: 与 labels 一一对应的 {client_id, success, version, error, retryable}；
+        retryable 为False的条目（参数错误、文件不存在、版本冲突）重试也不会成功，
+        数据库锁定等暂时性错误为True；
+        版本冲突的条目带 conflict 和 current（当前记录），客户端可据此决定是否基于新版本重新提交
+    """
+    username = None
+    try:
+        data = request.get_json(silent=True) or {}
+        labels = data.get("labels")
+        if not isinstance(labels, list) or not labels:
+            return jsonify({"error": "缺少标注数据"}), 400
+        if len(labels) > Config.LABEL_BATCH_MAX_SIZE:
+            return jsonify({"error": f"每次最多保存 {Config.LABEL_BATCH_MAX_SIZE} 条标注"}), 400
+        
+        results = []
+        entries = []
+        entry_indexes = []
+        for item in labels:
+            item = item if isinstance(item, dict) else {}
+            result = {"client_id": item.get("client_id"), "success": False}
+            results.append(result)
+            speaker = item.get("speaker")
+            audio_file = item.get("audio_file")
+            username = item.get("username") or username
+            
+            if not all([speaker, audio_file, item.get("username")]):
+                result.update(error="缺少必要参数", retryable=False)
+                continue
+            if not any(field in item for field in LABEL_VALUE_FIELDS):
+                result.update(error="缺少标注内容", retryable=False)
+                continue
+            if not _valid_label_version(item.get("version")):
+                result.update(error="version 参数无效", retryable=False)
+                continue
+            file_path, actual_speaker = AudioService.find_audio_file(speaker, audio_file)
+            if not file_path:
+                result.update(error=f"找不到音频文件 {audio_file}", retryable=False)
+                continue
+            entries.append((item, actual_speaker, file_path))
+            entry_indexes.append(len(results) - 1)
+        
+        if entries:
+            outcomes = LabelService.save_labels(entries)
+            for index, outcome, (item, _, _) in zip(entry_indexes, outcomes, entries):
+                if "error" in outcome:
+                    results[index].update(outcome)
+                    continue
+                results[index].update(success=True, version=outcome["version"])
+                emotion_logger.log_annotation_activity(
+                    username=item["username"],
+                    speaker=item["speaker"],
+                    audio_file=item["audio_file"],
+                    action="保存",
+                    annotation_data=item
+                )
+        
+        failed = [result for result in results if not result["success"]]
+        if failed:
+            emotion_logger.log_error(f"{len(failed)}/{len(results)} 条标注保存失败", "批量保存标注", username)
+        return jsonify({"success": not failed, "results": results})
+    
+    except Exception as e:
+        emotion_logger.log_error(e, "批量保存标注失败", username, traceback.format_exc())
+        return jsonify({"error": str(e)}), 500
+
 @api_bp.route("/get_label/<username>/<speaker>/<filename>")
 @log_api_call
+@versioned(lambda username, speaker, filename: (
+    [('labels', username), ('play_counts', username)], (username, speaker, filename)
+))
 def get_label(username, speaker, filename):
     """获取特定音频的标注数据"""
     try:
@@ -202,7 +348,7 @@ def update_username():
         )
         
         return jsonify({"success": True, "moved_files": moved_count})
-        
+    
     except Exception as e:
         emotion_logger.log_error(e, f"更新用户名失败 - {old_username} -> {new_username}", current_user)
         return jsonify({"error": str(e)}), 500
@@ -240,7 +386,7 @@ def save_play_count():
             "success": True,
             "play_count": play_count
         })
-        
+    
     except Exception as e:
         emotion_logger.log_error(e, "保存播放次数失败", username)
         return jsonify({"error": str(e)}), 500
@@ -256,8 +402,8 @@ def get_play_count(username, speaker, filename):
             "success": True,
             "play_count": play_count
         })
-        
-        
+    
+    
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -272,14 +418,14 @@ def get_user_test_settings():
             return jsonify({'success': False, 'message': '用户名不能为空'}), 400
         
         # 获取用户测试设置
-        settings = UserModel().get_user_test_settings(username)
+        settings = _cached_test_settings(username)
         
         return jsonify({
             'success': True,
             'skip_test': settings.get('skip_test', False),
             'skip_consistency_test': settings.get('skip_consistency_test', False)
         })
-        
+    
     except Exception as e:
         return jsonify({'success': False, 'message': f'获取用户设置失败: {str(e)}'}), 500
 
@@ -291,7 +437,7 @@ def get_user_test_settings_by_username(username):
             return jsonify({'success': False, 'message': '用户名不能为空'}), 400
         
         # 获取用户测试设置
-        settings = UserModel().get_user_test_settings(username)
+        settings = _cached_test_settings(username)
         
         if settings is None:
             return jsonify({'success': False, 'message': '用户不存在'}), 404
@@ -301,7 +447,7 @@ def get_user_test_settings_by_username(username):
             'skip_test': settings.get('skip_test', False),
             'skip_consistency_test': settings.get('skip_consistency_test', False)
         })
-        
+    
     except Exception as e:
         return jsonify({'success': False, 'message': f'获取用户设置失败: {str(e)}'}), 500
 
@@ -310,18 +456,66 @@ def get_session_status():
     """检查用户会话状态"""
     try:
         # 检查用户是否已登录
-        if 'username' in session and session.get('authenticated', False):
+        context = get_session_context()
+        if context:
             return jsonify({
                 'authenticated': True,
-                'username': session['username']
+                'username': context['username'],
+                'test_settings': context['test_settings'],
+                'group_id': context['group_id']
             })
         else:
             return jsonify({
                 'authenticated': False
             })
-            
+    
     except Exception as e:
         return jsonify({
             'authenticated': False,
             'error': str(e)
-        }), 500
\ No newline at end of file
+        }), 500
+
+@api_bp.route('/bootstrap', methods=['GET'])
+@log_api_call
+def get_bootstrap():
+    """
+    标注页面启动数据：一次返回会话身份、测试设置、分组进度、说话人排序和当前说话人音频列表的第一页
+    
+    Query Parameters:
+        speaker (str): 希望打开的说话人（如上次选择的说话人），默认第一个说话人
+    """
+    context = get_session_context()
+    if not context:
+        return jsonify({'authenticated': False}), 401
+    
+    username = context['username']
+    try:
+        settings = _cached_test_settings(username) or {}
+        data = BootstrapService.get_annotation_bootstrap(
+            username,
+            group_id=context['group_id'],
+            speaker=request.args.get('speaker') or None
+        )
+        
+        emotion_logger.log_user_activity(
+            username=username,
+            action="加载标注页面",
+            details={
+                "speaker_count": len(data['speakers']),
+                "active_speaker": data['active_speaker']
+            },
+            ip_address=get_client_ip()
+        )
+        
+        return jsonify({
+            'authenticated': True,
+            'username': username,
+            'test_settings': {
+                'skip_test': settings.get('skip_test', False),
+                'skip_consistency_test': settings.get('skip_consistency_test', False)
+            },
+            **data
+        })
+    except Exception as e:
+        emotion_logger.log_error(e, "加载标注页面数据失败", username)
+        return jsonify({'authenticated': True, 'error': str(e)}), 500
\ No newline at end of file
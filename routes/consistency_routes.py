@@ -1,9 +1,6 @@
-import os
-import json
-import glob
 from flask import Blueprint, jsonify, request, send_from_directory, render_template
-from config import Config
 from services.database_service import DatabaseService
+from services.consistency_catalog import get_consistency_catalog
 
 consistency_bp = Blueprint('consistency', __name__)
 
@@ -16,32 +13,16 @@ def consistency_test_page():
 def get_consistency_questions():
     """获取一致性测试题目"""
     try:
-        consistency_dir = '/mnt/shareEEx/liuyang/code/emotion_labeling_refactoring/data/consistency_test'
+        catalog = get_consistency_catalog()
         
-        if not os.path.exists(consistency_dir):
+        if not catalog.exists():
             return jsonify({
                 'success': False,
                 'error': '一致性测试数据目录不存在'
             }), 404
         
-        questions = []
-        
-        # 获取所有音频文件
-        audio_files = glob.glob(os.path.join(consistency_dir, '*.wav'))
-        
-        for audio_file in audio_files:
-            filename = os.path.basename(audio_file)
-            # 移除扩展名获取基础文件名
-            base_name = os.path.splitext(filename)[0]
-            
-            questions.append({
-                'filename': filename,
-                'base_name': base_name,
-                'type': 'consistency'
-            })
-        
-        # 按文件名排序
-        questions.sort(key=lambda x: x['filename'])
+        # 题目列表来自内存中的题库（已按文件名排序）
+        questions = catalog.get_questions()
         
         return jsonify({
             'success': True,
@@ -60,11 +41,10 @@ def get_consistency_questions():
 def get_consistency_audio(filename):
     """获取一致性测试音频文件"""
     try:
-        consistency_dir = '/mnt/shareEEx/liuyang/code/emotion_labeling_refactoring/data/consistency_test'
-        file_path = os.path.join(consistency_dir, filename)
+        catalog = get_consistency_catalog()
         
-        if os.path.exists(file_path):
-            return send_from_directory(consistency_dir, filename)
+        if catalog.has_audio(filename):
+            return send_from_directory(catalog.directory, filename)
         
         return jsonify({'error': '音频文件不存在'}), 404
         
@@ -126,6 +106,10 @@ def submit_consistency_result():
         conn.commit()
         conn.close()
         
+        # 新的测试结果会改变一致性分析，清除本进程的缓存（其他进程通过数据版本检测）
+        from services.agreement_service import get_agreement_engine
+        get_agreement_engine().invalidate()
+        
         return jsonify({
             'success': True,
             'message': f'成功保存 {len(results)} 条一致性测试结果'
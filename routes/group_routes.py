@@ -4,13 +4,12 @@
 分组管理相关路由
 """
 
-from flask import Blueprint, jsonify, request, session
-from group_assignment_manager import GroupAssignmentManager
+from flask import Blueprint, jsonify, session
+from group_assignment_manager import get_group_assignment_manager
 from utils.logger import emotion_logger, get_client_ip
 from routes.main_routes import login_required
 
 group_bp = Blueprint('group', __name__, url_prefix='/api/group')
-group_manager = GroupAssignmentManager()
 
 @group_bp.route('/user-assignment')
 @login_required
@@ -23,7 +22,7 @@ def get_user_assignment():
         if not username:
             return jsonify({'error': '用户未登录'}), 401
         
-        assignment_info = group_manager.get_user_assignment_info(username)
+        assignment_info = get_group_assignment_manager().get_user_assignment_info(username)
         
         if assignment_info:
             emotion_logger.log_user_activity(
@@ -57,7 +56,7 @@ def get_user_progress():
         if not username:
             return jsonify({'error': '用户未登录'}), 401
         
-        assignment_info = group_manager.get_user_assignment_info(username)
+        assignment_info = get_group_assignment_manager().get_user_assignment_info(username)
         
         if assignment_info:
             progress_percentage = 0
@@ -88,17 +87,17 @@ def get_user_progress():
 @login_required
 def update_progress():
     """
-    更新用户标注进度
+    刷新用户标注进度
+    
+    完成数在保存标注时由服务端维护，请求中的 progress_count 会被忽略；
+    此接口根据已保存的标注重新计算并返回当前进度
     """
     try:
         username = session.get('username')
         if not username:
             return jsonify({'error': '用户未登录'}), 401
         
-        data = request.get_json()
-        progress_count = data.get('progress_count', 0)
-        
-        assignment_info = group_manager.get_user_assignment_info(username)
+        assignment_info = get_group_assignment_manager().get_user_assignment_info(username)
         if not assignment_info:
             return jsonify({
                 'success': False,
@@ -106,12 +105,12 @@ def update_progress():
             }), 400
         
         group_id = assignment_info['group_id']
-        success = group_manager.update_user_progress(username, group_id, progress_count)
+        progress_count = get_group_assignment_manager().update_user_progress(username, group_id)
         
-        if success:
+        if progress_count is not None:
             emotion_logger.log_user_activity(
                 username=username,
-                action="更新标注进度",
+                action="刷新标注进度",
                 details={
                     "group_id": group_id,
                     "progress_count": progress_count,
@@ -121,7 +120,9 @@ def update_progress():
             )
             return jsonify({
                 'success': True,
-                'message': '进度更新成功'
+                'message': '进度更新成功',
+                'progress_count': progress_count,
+                'total_segments': assignment_info['total_segments']
             })
         else:
             return jsonify({
@@ -148,7 +149,7 @@ def get_all_groups_status():
         # if not is_admin(username):
         #     return jsonify({'error': '权限不足'}), 403
         
-        groups_status = group_manager.get_all_groups_status()
+        groups_status = get_group_assignment_manager().get_all_groups_status()
         
         emotion_logger.log_user_activity(
             username=username,
@@ -177,7 +178,7 @@ def get_group_info(group_id):
         if not username:
             return jsonify({'error': '用户未登录'}), 401
         
-        group_info = group_manager.get_group_info(group_id)
+        group_info = get_group_assignment_manager().get_group_info(group_id)
         
         if group_info:
             return jsonify({
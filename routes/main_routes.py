@@ -1,13 +1,12 @@
 from flask import Blueprint, render_template, request, redirect, url_for, session, jsonify, make_response
 from functools import wraps
 from datetime import timedelta
-from models.user_model import UserModel
+from models.user_model import get_user_model
 from utils.logger import emotion_logger, get_client_ip
-from group_assignment_manager import GroupAssignmentManager
+from utils.session_store import regenerate_session
+from group_assignment_manager import get_group_assignment_manager
 
 main_bp = Blueprint('main', __name__)
-user_model = UserModel()
-group_manager = GroupAssignmentManager()
 
 @main_bp.route("/login", methods=["GET", "POST"])
 def login():
@@ -20,6 +19,8 @@ def login():
     wechat_name = data.get('text1', '').strip()
     phone_number = data.get('password', '').strip()
     ip_address = get_client_ip()
+    user_model = get_user_model()
+    group_manager = get_group_assignment_manager()
     
     if not wechat_name or not phone_number:
         emotion_logger.log_user_activity(
@@ -34,7 +35,8 @@ def login():
     
     # 验证用户信息
     if user_model.verify_user(wechat_name, phone_number):
-        # 设置安全的会话
+        # 设置安全的会话（更换会话ID，防止会话固定攻击）
+        regenerate_session()
         session.permanent = True  # 设置为永久会话
         session['username'] = wechat_name
         session['authenticated'] = True
@@ -43,10 +45,12 @@ def login():
         test_settings = user_model.get_user_test_settings(wechat_name)
         
         # 为用户分配分组（如果还没有分配的话）
+        assigned_group_id = group_manager.get_user_group_id(wechat_name)
         group_id, group_info = group_manager.get_available_group_for_user(wechat_name)
-        if group_id and not group_manager.get_user_assignment_info(wechat_name):
+        if group_id and assigned_group_id is None:
             success, message = group_manager.assign_group_to_user(wechat_name, group_id)
             if success:
+                assigned_group_id = group_id
                 emotion_logger.log_user_activity(
                     username=wechat_name,
                     action="分组分配",
@@ -54,6 +58,8 @@ def login():
                     ip_address=ip_address
                 )
         
+        _cache_identity_context(test_settings, assigned_group_id)
+        
         emotion_logger.log_user_activity(
             username=wechat_name,
             action="登录成功",
@@ -89,7 +95,8 @@ def login():
     else:
         # 用户不存在，自动注册
         if user_model.add_user(wechat_name, phone_number):
-            # 设置安全的会话
+            # 设置安全的会话（更换会话ID，防止会话固定攻击）
+            regenerate_session()
             session.permanent = True  # 设置为永久会话
             session['username'] = wechat_name
             session['authenticated'] = True
@@ -98,10 +105,12 @@ def login():
             test_settings = user_model.get_user_test_settings(wechat_name)
             
             # 为新注册用户分配分组
+            assigned_group_id = None
             group_id, group_info = group_manager.get_available_group_for_user(wechat_name)
             if group_id:
                 success, message = group_manager.assign_group_to_user(wechat_name, group_id)
                 if success:
+                    assigned_group_id = group_id
                     emotion_logger.log_user_activity(
                         username=wechat_name,
                         action="新用户分组分配",
@@ -109,6 +118,8 @@ def login():
                         ip_address=ip_address
                     )
             
+            _cache_identity_context(test_settings, assigned_group_id)
+            
             if request.is_json:
                 response_data = {
                     'success': True, 
@@ -140,6 +151,32 @@ def login():
                 return jsonify({'success': False, 'message': '登录失败，请重试'}), 400
             return render_template("login.html", error="登录失败，请重试")
 
+def _cache_identity_context(test_settings, group_id):
+    """
+    把用户的测试设置和分组分配缓存到会话中
+    已登录的请求直接从会话读取身份上下文，无需再查询 users.db / group_assignments.db
+    """
+    session['test_settings'] = {
+        'skip_test': bool(test_settings and test_settings.get('skip_test', False)),
+        'skip_consistency_test': bool(test_settings and test_settings.get('skip_consistency_test', False))
+    }
+    session['group_id'] = group_id
+
+def get_session_context():
+    """
+    获取当前会话中缓存的身份上下文
+    
+    Returns:
+        dict: 包含 username / test_settings / group_id，未登录时返回None
+    """
+    if 'username' not in session or not session.get('authenticated', False):
+        return None
+    return {
+        'username': session['username'],
+        'test_settings': session.get('test_settings'),
+        'group_id': session.get('group_id')
+    }
+
 def login_required(f):
     """登录验证装饰器"""
     @wraps(f)
@@ -1,16 +1,7 @@
-import os
-import json
-import random
-import glob
 from flask import Blueprint, jsonify, request, send_from_directory
 from config import Config
-
-
-# 测试音频文件夹配置
-TEST_AUDIO_FOLDER = os.getenv(
-    "TEST_AUDIO_FOLDER",
-    "/mnt/shareEEx/liuyang/code/emotion_labeling_refactoring/data/test_examples"
-)
+from services.test_result_service import TestResultService
+from services.test_question_bank import get_test_question_bank
 
 test_bp = Blueprint('test', __name__)
 
@@ -22,68 +13,17 @@ def test_page():
 
 @test_bp.route('/api/test/questions')
 def get_test_questions():
-    """获取测试题目"""
+    """
+    获取测试题目
+    
+    Query Parameters:
+        stratified (bool): 是否按题目类型分层抽题，默认否
+    """
     try:
-        # 使用配置的测试音频文件夹
-        test_examples_dir = os.path.abspath(TEST_AUDIO_FOLDER)
-        
-        questions = []
-        
-        # 处理离散情感测试题目
-        discrete_dir = os.path.join(test_examples_dir, 'discrete_emotions')
-        if os.path.exists(discrete_dir):
-            for filename in os.listdir(discrete_dir):
-                if filename.endswith('.wav') or filename.endswith('.MP3'):
-                    # 从文件名提取正确答案 (例如: 愤怒-2.wav -> 愤怒)
-                    correct_answer = filename.split('-')[0]
-                    questions.append({
-                        'filename': filename,
-                        'type': 'discrete',
-                        'correct_answer': correct_answer,
-                        'folder': 'discrete_emotions'
-                    })
-        
-        # 处理效价测试题目（V值标注）
-        potency_dir = os.path.join(test_examples_dir, 'potency')
-        if os.path.exists(potency_dir):
-            for filename in os.listdir(potency_dir):
-                if filename.endswith('.wav'):
-                    # 从文件名提取正确答案 (例如: V0-2.wav -> V0, V负1-2.wav -> V负1)
-                    label_part = filename.split('-')[0]
-                    if label_part.startswith('V'):
-                        # 处理V负数格式
-                        if '负' in label_part:
-                            v_value = -float(label_part.replace('V负', ''))  # V负1 -> -1
-                        else:
-                            v_value = float(label_part[1:])  # V0 -> 0, V1 -> 1, etc.
-                        questions.append({
-                            'filename': filename,
-                            'type': 'potency',  # 专门的效价测试类型
-                            'correct_answer': v_value,  # 只需要V值
-                            'folder': 'potency'
-                        })
+        stratified = request.args.get('stratified', 'false').lower() == 'true'
         
-        # 处理唤醒测试题目（A值标注）
-        wake_up_dir = os.path.join(test_examples_dir, 'wake_up')
-        if os.path.exists(wake_up_dir):
-            for filename in os.listdir(wake_up_dir):
-                if filename.endswith('.wav'):
-                    # 从文件名提取正确答案 (例如: A2-1.wav -> A2)
-                    label_part = filename.split('-')[0]
-                    if label_part.startswith('A'):
-                        a_value = float(label_part[1:])  # A2 -> 2, A1 -> 1, etc.
-                        questions.append({
-                            'filename': filename,
-                            'type': 'arousal',  # 专门的唤醒测试类型
-                            'correct_answer': a_value,  # 只需要A值
-                            'folder': 'wake_up'
-                        })
-        
-        # 随机打乱题目顺序
-        random.shuffle(questions)
-        
-        # 限制题目数量
-        questions = questions[:Config.TEST_QUESTION_LIMIT]
+        # 从预先解析的题库中随机抽取 Config.TEST_QUESTION_LIMIT 道题
+        questions = get_test_question_bank().sample(Config.TEST_QUESTION_LIMIT, stratified=stratified)
         
         return jsonify({
             'success': True,
@@ -101,19 +41,11 @@ def get_test_questions():
 def get_test_audio(filename):
     """获取测试音频文件"""
     try:
-        test_examples_dir = os.path.abspath(TEST_AUDIO_FOLDER)
-        
-        # 在各个子目录中查找文件
-        for subfolder in ['discrete_emotions', 'potency', 'wake_up']:
-            file_path = os.path.join(test_examples_dir, subfolder, filename)
-            if os.path.exists(file_path):
-                return send_from_directory(os.path.dirname(file_path), filename)
-            # 也尝试查找.MP3文件
-            if filename.endswith('.wav'):
-                mp3_filename = filename.replace('.wav', '.MP3')
-                mp3_file_path = os.path.join(test_examples_dir, subfolder, mp3_filename)
-                if os.path.exists(mp3_file_path):
-                    return send_from_directory(os.path.dirname(mp3_file_path), mp3_filename)
+        # 通过题库索引直接定位文件所在目录（.wav 不存在时回退到同名 .MP3）
+        location = get_test_question_bank().resolve_audio(filename)
+        if location:
+            directory, actual_filename = location
+            return send_from_directory(directory, actual_filename)
         
         return jsonify({'error': '音频文件不存在'}), 404
         
@@ -133,61 +65,14 @@ def submit_test_result():
         if not username:
             return jsonify({'error': '缺少用户名'}), 400
         
-        # 计算测试分数
-        total_questions = len(test_results)
-        correct_count = 0
-        
-        for result in test_results:
-            user_answer = result.get('user_answer')
-            correct_answer = result.get('correct_answer')
-            question_type = result.get('type')
-            
-            if question_type == 'discrete':
-                # 离散情感完全匹配
-                if user_answer == correct_answer:
-                    correct_count += 1
-            elif question_type in ['potency', 'arousal']:
-                # 连续值允许一定误差（例如±0.5）
-                if abs(float(user_answer) - float(correct_answer)) <= 0.5:
-                    correct_count += 1
-        
-        score = (correct_count / total_questions * 100) if total_questions > 0 else 0
-        
-        # 保存测试结果
-        test_results_dir = os.path.join(Config.LABEL_FOLDER, 'test_results')
-        os.makedirs(test_results_dir, exist_ok=True)
-        
-        result_file = os.path.join(test_results_dir, f"{username}_test_results.json")
-        
-        # 读取现有结果
-        existing_results = []
-        if os.path.exists(result_file):
-            try:
-                with open(result_file, 'r', encoding='utf-8') as f:
-                    existing_results = json.load(f)
-            except json.JSONDecodeError:
-                existing_results = []
-        
-        # 添加新结果
-        from datetime import datetime
-        new_result = {
-            'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            'total_questions': total_questions,
-            'correct_count': correct_count,
-            'score': round(score, 2),
-            'details': test_results
-        }
-        existing_results.append(new_result)
-        
-        # 保存结果
-        with open(result_file, 'w', encoding='utf-8') as f:
-            json.dump(existing_results, f, ensure_ascii=False, indent=2)
+        # 评分并保存到数据库（逐题答案批量写入）
+        result = TestResultService.save_result(username, test_results)
         
         return jsonify({
             'success': True,
-            'score': round(score, 2),
-            'correct_count': correct_count,
-            'total_questions': total_questions
+            'score': result['score'],
+            'correct_count': result['correct_count'],
+            'total_questions': result['total_questions']
         })
         
     except Exception as e:
@@ -196,35 +81,28 @@ def submit_test_result():
 
 @test_bp.route('/api/test/history/<username>')
 def get_test_history(username):
-    """获取用户测试历史"""
+    """
+    获取用户测试历史（分页，最新的在前）
+    
+    Query Parameters:
+        limit (int): 每页条数，默认20，最大100
+        offset (int): 偏移量，默认0
+    """
     try:
-        test_results_dir = os.path.join(Config.LABEL_FOLDER, 'test_results')
-        result_file = os.path.join(test_results_dir, f"{username}_test_results.json")
-        
-        if not os.path.exists(result_file):
-            return jsonify({
-                'success': True,
-                'history': []
-            })
-        
-        with open(result_file, 'r', encoding='utf-8') as f:
-            history = json.load(f)
+        limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+        offset = max(request.args.get('offset', 0, type=int), 0)
         
         # 只返回摘要信息，不包含详细答案
-        summary_history = []
-        for result in history:
-            summary_history.append({
-                'timestamp': result.get('timestamp'),
-                'score': result.get('score'),
-                'correct_count': result.get('correct_count'),
-                'total_questions': result.get('total_questions')
-            })
+        history, total = TestResultService.get_history(username, limit=limit, offset=offset)
         
         return jsonify({
             'success': True,
-            'history': summary_history
+            'history': history,
+            'total': total,
+            'limit': limit,
+            'offset': offset
         })
         
     except Exception as e:
         print(f"获取测试历史失败: {e}")
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500
@@ -28,21 +28,30 @@ from datetime import datetime
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from config import Config
+from services.data_version import bump_version
+from group_assignment_manager import get_group_assignment_manager
 from models.user_model import UserModel
 
 
-def init_emotion_labels_database():
+def connect_database(db_name):
+    """打开 Config.DATABASE_FOLDER 下的数据库（目录不存在时创建）"""
+    os.makedirs(Config.DATABASE_FOLDER, exist_ok=True)
+    return sqlite3.connect(os.path.join(Config.DATABASE_FOLDER, db_name))
+
+
+def init_emotion_labels_database(conn=None):
     """
     初始化情感标注数据库，创建核心表结构
+    
+    Args:
+        conn: emotion_labels.db 的连接，默认新建
     """
     print("正在初始化情感标注数据库...")
     
     db_path = os.path.join(Config.DATABASE_FOLDER, 'emotion_labels.db')
-    
-    # 确保目录存在
-    os.makedirs(os.path.dirname(db_path), exist_ok=True)
-    
-    conn = sqlite3.connect(db_path)
+    own_connection = conn is None
+    if own_connection:
+        conn = connect_database('emotion_labels.db')
     cursor = conn.cursor()
     
     # 创建标注数据表
@@ -51,6 +60,7 @@ def init_emotion_labels_database():
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             audio_file TEXT NOT NULL,
             speaker TEXT NOT NULL,
+            speaker_group TEXT,  -- 说话人分组（spkN-x-y 属于 spkN），用于分组说话人的精确查询
             username TEXT NOT NULL,
             v_value REAL,
             a_value REAL,
@@ -63,16 +73,12 @@ def init_emotion_labels_database():
             discrete_complete BOOLEAN DEFAULT FALSE,
             timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
             updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            version INTEGER NOT NULL DEFAULT 1,  -- 行版本，每次保存加1，用于检测并发修改
             UNIQUE(audio_file, speaker, username)
         )
     ''')
     
-    # 创建索引以提高查询性能
-    cursor.execute('''
-        CREATE INDEX IF NOT EXISTS idx_audio_speaker_user 
-        ON emotion_labels(audio_file, speaker, username)
-    ''')
-    
+    # 创建索引以提高查询性能（(audio_file, speaker, username) 已由唯一约束建立索引）
     cursor.execute('''
         CREATE INDEX IF NOT EXISTS idx_username_speaker 
         ON emotion_labels(username, speaker)
@@ -83,31 +89,31 @@ def init_emotion_labels_database():
         ON emotion_labels(timestamp)
     ''')
     
-    # 创建触发器，自动更新 updated_at 字段
-    cursor.execute('''
-        CREATE TRIGGER IF NOT EXISTS update_emotion_labels_timestamp 
-        AFTER UPDATE ON emotion_labels
-        FOR EACH ROW
-        BEGIN
-            UPDATE emotion_labels SET updated_at = CURRENT_TIMESTAMP 
-            WHERE id = NEW.id;
-        END
-    ''')
+    # updated_at 由写入语句设置（见 DatabaseService._write_label），不使用触发器
     
     conn.commit()
-    conn.close()
+    if own_connection:
+        conn.close()
+    
+    # 结构迁移（为旧库补充 speaker_group 列并回填、建立分组索引）
+    from services.database_service import DatabaseService
+    DatabaseService.init_database()
     
     print(f"✓ 情感标注数据库初始化完成: {db_path}")
 
 
-def init_user_order_tables():
+def init_user_order_tables(conn=None):
     """
     创建用户排序相关的数据库表
+    
+    Args:
+        conn: emotion_labels.db 的连接，默认新建
     """
     print("正在创建用户排序相关表...")
     
-    db_path = os.path.join(Config.DATABASE_FOLDER, 'emotion_labels.db')
-    conn = sqlite3.connect(db_path)
+    own_connection = conn is None
+    if own_connection:
+        conn = connect_database('emotion_labels.db')
     cursor = conn.cursor()
     
     # 创建用户说话人排序表
@@ -166,23 +172,25 @@ def init_user_order_tables():
     ''')
     
     conn.commit()
-    conn.close()
+    if own_connection:
+        conn.close()
     
     print("✓ 用户排序表创建完成")
 
 
-def init_group_assignment_database():
+def init_group_assignment_database(conn=None):
     """
     创建分组分配数据库和相关表
+    
+    Args:
+        conn: group_assignments.db 的连接，默认新建
     """
     print("正在创建分组分配数据库...")
     
     db_path = os.path.join(Config.DATABASE_FOLDER, 'group_assignments.db')
-    
-    # 确保目录存在
-    os.makedirs(os.path.dirname(db_path), exist_ok=True)
-    
-    conn = sqlite3.connect(db_path)
+    own_connection = conn is None
+    if own_connection:
+        conn = connect_database('group_assignments.db')
     cursor = conn.cursor()
     
     # 创建分组信息表
@@ -245,51 +253,37 @@ def init_group_assignment_database():
     ''')
     
     conn.commit()
-    conn.close()
+    if own_connection:
+        conn.close()
     
     print(f"✓ 分组分配数据库创建完成: {db_path}")
     return db_path
 
 
-def import_group_data():
+def parse_group_file(group_file_path):
     """
-    解析分组文件并导入数据到数据库
-    """
-    print("正在导入分组数据...")
-    
-    group_file_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', '分组.txt')
-    
-    if not os.path.exists(group_file_path):
-        print(f"⚠ 分组文件不存在: {group_file_path}，跳过分组数据导入")
-        return
+    一次性解析整个分组文件
     
-    db_path = os.path.join(Config.DATABASE_FOLDER, 'group_assignments.db')
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
+    文件格式：
+        === 第N组 ===
+        spkX: 总时长 Y秒 段数 Z
     
+    Returns:
+        tuple: (speakers, errors)
+            speakers: {(group_id, speaker_id): (duration, segment_count)}
+            errors: 无法解析的行
+    """
+    speakers = {}
+    errors = []
     current_group = 0
-    group_total_duration = 0
-    group_total_segments = 0
     
     with open(group_file_path, 'r', encoding='utf-8') as f:
-        for line in f:
+        for line_number, line in enumerate(f, start=1):
             line = line.strip()
             
             if line.startswith('=== 第'):
-                # 如果之前有分组数据，先保存到group_status表
-                if current_group > 0:
-                    cursor.execute('''
-                        INSERT OR REPLACE INTO group_status 
-                        (group_id, total_duration, total_segments, status)
-                        VALUES (?, ?, ?, 'available')
-                    ''', (current_group, group_total_duration, group_total_segments))
-                
-                # 解析新分组
                 group_num = line.split('第')[1].split('组')[0].strip()
                 current_group = int(group_num)
-                group_total_duration = 0
-                group_total_segments = 0
-                print(f"  处理第 {current_group} 组")
                 
             elif ':' in line and '总时长' in line and '段数' in line:
                 # 解析说话人数据
@@ -302,34 +296,187 @@ def import_group_data():
                 segments_str = info_part.split('段数')[1].strip()
                 
                 try:
-                    duration = float(duration_str)
-                    segments = int(segments_str)
-                    
-                    # 插入说话人数据
-                    cursor.execute('''
-                        INSERT OR REPLACE INTO speaker_groups 
-                        (group_id, speaker_id, duration, segment_count)
-                        VALUES (?, ?, ?, ?)
-                    ''', (current_group, speaker_id, duration, segments))
-                    
-                    group_total_duration += duration
-                    group_total_segments += segments
-                    
+                    if current_group <= 0:
+                        raise ValueError("说话人出现在任何分组标题之前")
+                    speakers[(current_group, speaker_id)] = (float(duration_str), int(segments_str))
                 except ValueError as e:
-                    print(f"  解析错误: {line}, 错误: {e}")
+                    errors.append(f"第{line_number}行: {line}, 错误: {e}")
     
-    # 保存最后一个分组的状态
-    if current_group > 0:
-        cursor.execute('''
-            INSERT OR REPLACE INTO group_status 
-            (group_id, total_duration, total_segments, status)
-            VALUES (?, ?, ?, 'available')
-        ''', (current_group, group_total_duration, group_total_segments))
+    return speakers, errors
+
+
+def summarize_groups(speakers):
+    """按分组汇总总时长和段数：{group_id: (total_duration, total_segments)}"""
+    groups = {}
+    for (group_id, _), (duration, segments) in speakers.items():
+        total_duration, total_segments = groups.get(group_id, (0.0, 0))
+        groups[group_id] = (total_duration + duration, total_segments + segments)
+    return {group_id: (round(duration, 2), segments) for group_id, (duration, segments) in groups.items()}
+
+
+def upsert_group_status(conn, groups):
+    """
+    写入分组的总时长和段数，保留已有分组的分配人数、完成人数和状态
     
-    conn.commit()
-    conn.close()
+    Args:
+        conn: group_assignments.db 的连接（由调用方提交事务）
+        groups: [(group_id, total_duration, total_segments), ...]
+    """
+    conn.executemany('''
+        INSERT INTO group_status (group_id, total_duration, total_segments, status)
+        VALUES (?, ?, ?, 'available')
+        ON CONFLICT(group_id) DO UPDATE SET
+            total_duration = excluded.total_duration,
+            total_segments = excluded.total_segments,
+            updated_at = CURRENT_TIMESTAMP
+    ''', groups)
+
+
+def diff_group_data(conn, speakers):
+    """
+    对比解析结果与数据库中的现有分组
+    
+    Returns:
+        dict: speakers_added / speakers_removed / speakers_changed / groups_added / groups_removed / groups_changed
+    """
+    current_speakers = {
+        (group_id, speaker_id): (duration, segment_count)
+        for group_id, speaker_id, duration, segment_count in conn.execute(
+            'SELECT group_id, speaker_id, duration, segment_count FROM speaker_groups'
+        )
+    }
+    current_groups = {
+        group_id: (round(total_duration, 2), total_segments)
+        for group_id, total_duration, total_segments in conn.execute(
+            'SELECT group_id, total_duration, total_segments FROM group_status'
+        )
+    }
+    new_groups = summarize_groups(speakers)
+    
+    return {
+        'speakers_added': sorted(key for key in speakers if key not in current_speakers),
+        'speakers_removed': sorted(key for key in current_speakers if key not in speakers),
+        'speakers_changed': sorted(
+            key for key, value in speakers.items()
+            if key in current_speakers and current_speakers[key] != value
+        ),
+        'groups_added': sorted(group_id for group_id in new_groups if group_id not in current_groups),
+        'groups_removed': sorted(group_id for group_id in current_groups if group_id not in new_groups),
+        'groups_changed': sorted(
+            group_id for group_id, value in new_groups.items()
+            if group_id in current_groups and current_groups[group_id] != value
+        )
+    }
+
+
+def import_group_data(conn=None, group_file_path=None, dry_run=False):
+    """
+    解析分组文件并导入数据到数据库
+    
+    先完整解析分组文件并与数据库对比，只写入新增、删除和变化的记录，全部在一个事务中完成。
+    group_status 只更新总时长和段数，保留分配人数、完成人数和状态；
+    group_assignments 中的用户分配保持不变（仅同步分组段数），仍有用户分配的分组不会被删除。
+    分组文件有解析错误时不写入（解析失败的说话人会被当作已删除），试运行仍显示差异
+    
+    Args:
+        conn: group_assignments.db 的连接，默认新建
+        group_file_path (str): 分组文件路径，默认 data/分组.txt
+        dry_run (bool): 只显示差异，不写入
+    
+    Returns:
+        dict: diff_group_data() 的结果，分组文件不存在时返回None
+    
+    Raises:
+        ValueError: 分组文件有解析错误（非试运行时）
+    """
+    print("正在导入分组数据...")
+    
+    if group_file_path is None:
+        group_file_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', '分组.txt')
     
-    print(f"✓ 分组数据导入完成，共处理 {current_group} 个分组")
+    if not os.path.exists(group_file_path):
+        print(f"⚠ 分组文件不存在: {group_file_path}，跳过分组数据导入")
+        return None
+    
+    speakers, errors = parse_group_file(group_file_path)
+    for error in errors:
+        print(f"  解析错误: {error}")
+    
+    own_connection = conn is None
+    if own_connection:
+        conn = connect_database('group_assignments.db')
+    
+    try:
+        diff = diff_group_data(conn, speakers)
+        groups = summarize_groups(speakers)
+        
+        print(f"  分组文件: {len(groups)} 个分组, {len(speakers)} 个说话人")
+        print(f"  说话人: 新增 {len(diff['speakers_added'])}, 删除 {len(diff['speakers_removed'])}, "
+              f"变化 {len(diff['speakers_changed'])}")
+        print(f"  分组: 新增 {len(diff['groups_added'])}, 删除 {len(diff['groups_removed'])}, "
+              f"变化 {len(diff['groups_changed'])}")
+        for group_id, speaker_id in diff['speakers_added']:
+            print(f"    + 第{group_id}组 {speaker_id}")
+        for group_id, speaker_id in diff['speakers_removed']:
+            print(f"    - 第{group_id}组 {speaker_id}")
+        for group_id, speaker_id in diff['speakers_changed']:
+            print(f"    * 第{group_id}组 {speaker_id}")
+        
+        if dry_run:
+            print("✓ 试运行，未写入数据库")
+            return diff
+        
+        if errors:
+            raise ValueError(f"分组文件有 {len(errors)} 处解析错误，未写入数据库，请修正后重新导入")
+        
+        if not any(diff.values()):
+            print("✓ 分组数据无变化")
+            return diff
+        
+        # 仍有用户分配的分组不删除，只清空其说话人
+        assigned_groups = {row[0] for row in conn.execute('SELECT DISTINCT group_id FROM group_assignments')}
+        removable_groups = [group_id for group_id in diff['groups_removed'] if group_id not in assigned_groups]
+        kept_groups = [group_id for group_id in diff['groups_removed'] if group_id in assigned_groups]
+        for group_id in kept_groups:
+            print(f"  ⚠ 第{group_id}组已有用户分配，保留其分组状态")
+        
+        upserts = diff['speakers_added'] + diff['speakers_changed']
+        with conn:
+            conn.executemany(
+                'DELETE FROM speaker_groups WHERE group_id = ? AND speaker_id = ?',
+                diff['speakers_removed']
+            )
+            conn.executemany('''
+                INSERT INTO speaker_groups (group_id, speaker_id, duration, segment_count)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(group_id, speaker_id) DO UPDATE SET
+                    duration = excluded.duration,
+                    segment_count = excluded.segment_count
+            ''', [(group_id, speaker_id) + speakers[(group_id, speaker_id)] for group_id, speaker_id in upserts])
+            
+            changed_groups = diff['groups_added'] + diff['groups_changed'] + kept_groups
+            upsert_group_status(conn, [(group_id,) + groups.get(group_id, (0.0, 0)) for group_id in changed_groups])
+            conn.executemany('DELETE FROM group_status WHERE group_id = ?', [(group_id,) for group_id in removable_groups])
+            
+            # 已分配用户的分组段数与新的分组保持一致
+            conn.executemany('''
+                UPDATE group_assignments
+                SET total_segments = (SELECT total_segments FROM group_status WHERE group_id = ?)
+                WHERE group_id = ?
+            ''', [(group_id, group_id) for group_id in changed_groups])
+        bump_version('group_layout')
+        
+        # 分组的说话人或段数变化后，按新的分组重新计算已分配用户的完成数和状态
+        # （保存标注时的增量更新不会修正已有的偏差）
+        if assigned_groups:
+            updated = get_group_assignment_manager().recalculate_progress()
+            print(f"  重新计算 {updated} 条分配记录的完成进度")
+    finally:
+        if own_connection:
+            conn.close()
+    
+    print(f"✓ 分组数据导入完成，共 {len(groups)} 个分组")
+    return diff
 
 
 def init_user_database():
@@ -338,7 +485,7 @@ def init_user_database():
     """
     print("正在初始化用户数据库...")
     try:
-        user_model = UserModel()
+        UserModel().init_database()
         print("✓ 用户数据库初始化完成")
     except Exception as e:
         print(f"⚠ 用户数据库初始化失败: {e}")
@@ -348,22 +495,47 @@ def main():
     """
     主函数：执行完整的数据库初始化流程
     """
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='初始化情感标注系统数据库')
+    parser.add_argument('--group-file', help='分组文件路径 (默认: data/分组.txt)')
+    parser.add_argument('--groups-only', action='store_true', help='只重新导入分组数据')
+    parser.add_argument('--dry-run', action='store_true', help='只显示分组数据与数据库的差异，不写入任何数据')
+    args = parser.parse_args()
+    
+    if args.groups_only or args.dry_run:
+        conn = connect_database('group_assignments.db')
+        try:
+            if not args.dry_run:
+                init_group_assignment_database(conn)
+            import_group_data(conn, args.group_file, dry_run=args.dry_run)
+        except Exception as e:
+            print(f"\n❌ 分组数据导入失败: {e}")
+            sys.exit(1)
+        finally:
+            conn.close()
+        return
+    
     print("="*60)
     print("开始初始化情感标注系统数据库")
     print("="*60)
     
     try:
-        # 1. 初始化情感标注数据库
-        init_emotion_labels_database()
-        
-        # 2. 创建用户排序表
-        init_user_order_tables()
-        
-        # 3. 创建分组分配数据库
-        init_group_assignment_database()
+        # 1-2. 初始化情感标注数据库并创建用户排序表（共用一个连接）
+        conn = connect_database('emotion_labels.db')
+        try:
+            init_emotion_labels_database(conn)
+            init_user_order_tables(conn)
+        finally:
+            conn.close()
         
-        # 4. 导入分组数据
-        import_group_data()
+        # 3-4. 创建分组分配数据库并导入分组数据（共用一个连接）
+        conn = connect_database('group_assignments.db')
+        try:
+            init_group_assignment_database(conn)
+            import_group_data(conn, args.group_file)
+        finally:
+            conn.close()
         
         # 5. 初始化用户数据库
         init_user_database()
@@ -134,6 +134,26 @@ def show_user_stats():
     finally:
         conn.close()
 
+def run_label_agreement(full=False):
+    """运行标注者间一致性分析（默认增量）"""
+    from services.label_agreement_service import LabelAgreementAnalyzer
+    
+    result = LabelAgreementAnalyzer().run(full=full)
+    mode = "全量" if result['full'] else "增量"
+    print(f"\n=== 标注一致性分析（{mode}）===")
+    print(f"处理文件数: {result['files_processed']}")
+    print(f"更新用户数: {result['users_updated']}")
+
+def import_test_results(directory):
+    """一次性导入旧版按用户保存的测试结果 JSON 文件"""
+    from services.test_result_service import TestResultService
+    
+    summary = TestResultService.import_legacy_json(directory)
+    print(f"\n=== 导入测试结果: {directory} ===")
+    print(f"导入文件数: {summary['files']}")
+    print(f"导入测试次数: {summary['attempts']}")
+    print(f"跳过文件数: {summary['skipped']}")
+
 def main():
     """主函数"""
     if len(sys.argv) < 2:
@@ -141,6 +161,8 @@ def main():
         print("  python3 manage_db.py info     - 显示表结构信息")
         print("  python3 manage_db.py recent   - 显示最近的标注记录")
         print("  python3 manage_db.py stats    - 显示用户统计信息")
+        print("  python3 manage_db.py agreement [full] - 更新标注者间一致性分析（默认增量）")
+        print("  python3 manage_db.py import-test-results <目录> - 导入旧版测试结果JSON文件")
         return
     
     command = sys.argv[1]
@@ -150,6 +172,13 @@ def main():
     elif command == "recent":
         limit = int(sys.argv[2]) if len(sys.argv) > 2 else 10
         show_recent_labels(limit)
+    elif command == "agreement":
+        run_label_agreement(full=len(sys.argv) > 2 and sys.argv[2] == "full")
+    elif command == "import-test-results":
+        if len(sys.argv) < 3:
+            print("请指定旧版测试结果目录")
+            return
+        import_test_results(sys.argv[2])
     elif command == "stats":
         show_user_stats()
     else:
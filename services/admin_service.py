@@ -16,7 +16,9 @@ from typing import Dict, List, Any
 from config import Config
 from services.database_service import DatabaseService
 from services.audio_service import AudioService
-from group_assignment_manager import GroupAssignmentManager
+from group_assignment_manager import get_group_assignment_manager
+from services.change_bus import get_change_bus
+from services.data_version import bump_version
 
 class AdminService:
     """管理员服务类"""
@@ -120,27 +122,26 @@ class AdminService:
             """)
             
             users_data = []
-            group_manager = GroupAssignmentManager()
+            # 一次查询取出所有用户的分组分配和进度（完成数由保存标注时在服务端维护）
+            try:
+                assignments = get_group_assignment_manager().get_all_user_assignments()
+            except Exception:
+                assignments = {}
             
             for row in cursor.fetchall():
                 username = row[0]
                 user_annotations = row[1]
                 completed_annotations = row[2]
                 
-                # 获取用户的组分配信息
-                try:
-                    assignment_info = group_manager.get_user_assignment_info(username)
-                    if assignment_info and assignment_info.get('group_info'):
-                        # 使用组的总样本数作为"总标注数"
-                        total_annotations = assignment_info['group_info'].get('total_segments', user_annotations)
-                        # 重新计算完成率：用户完成数 / 组总样本数
-                        completion_rate = (completed_annotations / total_annotations * 100) if total_annotations > 0 else 0
-                    else:
-                        # 如果用户没有分配组，使用用户实际标注数
-                        total_annotations = user_annotations
-                        completion_rate = (completed_annotations / total_annotations * 100) if total_annotations > 0 else 0
-                except Exception:
-                    # 如果获取组信息失败，使用用户实际标注数
+                assignment = assignments.get(username)
+                grouped = bool(assignment and assignment['total_segments'])
+                if grouped:
+                    # 使用组的总样本数作为"总标注数"，完成率 = 组内完成数 / 组总样本数
+                    total_annotations = assignment['total_segments']
+                    completed_annotations = assignment['progress_count']
+                    completion_rate = completed_annotations / total_annotations * 100
+                else:
+                    # 如果用户没有分配组，使用用户实际标注数
                     total_annotations = user_annotations
                     completion_rate = (completed_annotations / total_annotations * 100) if total_annotations > 0 else 0
                 
@@ -149,6 +150,7 @@ class AdminService:
                     "total_annotations": total_annotations,
                     "completed_annotations": completed_annotations,
                     "completion_rate": round(completion_rate, 2),
+                    "group_id": assignment['group_id'] if grouped else None,
                     "speakers_count": row[3],
                     "avg_play_count": round(row[4], 2) if row[4] else 0,
                     "first_annotation": row[5],
@@ -604,6 +606,14 @@ class AdminService:
             
             conn.commit()
             conn.close()
+            bump_version('labels', username)
+            bump_version('play_counts', username)
+            
+            # 分组完成数随标注一起清零，并通知管理后台重新加载
+            group_manager = get_group_assignment_manager()
+            if group_manager.ensure_database_exists():
+                group_manager.recalculate_progress(username)
+            get_change_bus().publish('user_reset', {"username": username, "deleted_records": record_count})
             
             return {
                 "success": True,
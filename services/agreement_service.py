@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+一致性测试标注一致性分析服务
+一次性把 consistency_test_results 全部载入 NumPy 数组，向量化计算
+每个用户与标准答案（来自一致性测试题库）的一致性以及全部用户之间的一致性。
+结果缓存在进程内，有新的测试提交或标准答案变化时重新计算
+"""
+
+import sqlite3
+import threading
+import numpy as np
+from services.database_service import DatabaseService
+from services.consistency_catalog import get_consistency_catalog
+from utils.logger import emotion_logger
+
+CONTINUOUS_FIELDS = ('v_value', 'a_value')
+CATEGORICAL_FIELDS = ('emotion_type', 'discrete_emotion', 'patient_status')
+ALL_FIELDS = CONTINUOUS_FIELDS + CATEGORICAL_FIELDS
+VA_TOLERANCE = 0.5  # V/A 值允许的误差
+
+_engine_instance = None
+_engine_lock = threading.Lock()
+
+def get_agreement_engine():
+    """获取进程内共享的一致性分析引擎"""
+    global _engine_instance
+    if _engine_instance is None:
+        with _engine_lock:
+            if _engine_instance is None:
+                _engine_instance = AgreementEngine(get_consistency_catalog())
+    return _engine_instance
+
+def _to_float(value):
+    """把 NumPy 数值转换为可序列化的 float，未定义（NaN）时返回 None"""
+    if value is None:
+        return None
+    value = float(value)
+    return None if np.isnan(value) else round(value, 4)
+
+def cohen_kappa(confusion):
+    """
+    按混淆矩阵批量计算 Cohen's kappa
+    
+    Args:
+        confusion: 形状为 (..., K, K) 的混淆矩阵，行为标注者，列为标准答案
+    
+    Returns:
+        ndarray: 形状为 (...) 的 kappa，样本为空或期望一致率为1时为 NaN
+    """
+    confusion = np.asarray(confusion, dtype=float)
+    total = confusion.sum(axis=(-2, -1))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        observed = np.trace(confusion, axis1=-2, axis2=-1) / total
+        expected = (confusion.sum(axis=-1) * confusion.sum(axis=-2)).sum(axis=-1) / total ** 2
+        return (observed - expected) / (1 - expected)
+
+def fleiss_kappa(codes, n_categories):
+    """
+    Fleiss' kappa（允许各题评分人数不同）
+    
+    Args:
+        codes: 形状为 (评分人, 题目) 的类别编码，-1 表示缺失
+        n_categories (int): 类别数
+    
+    Returns:
+        float: kappa，可用题目不足时为 NaN
+    """
+    codes = np.asarray(codes)
+    if n_categories == 0 or codes.size == 0:
+        return np.nan
+    valid = codes >= 0
+    item_index = np.broadcast_to(np.arange(codes.shape[1]), codes.shape)[valid]
+    counts = np.zeros((codes.shape[1], n_categories))
+    np.add.at(counts, (item_index, codes[valid]), 1)
+    
+    raters = counts.sum(axis=1)
+    keep = raters >= 2
+    if not keep.any():
+        return np.nan
+    counts, raters = counts[keep], raters[keep]
+    
+    item_agreement = ((counts ** 2).sum(axis=1) - raters) / (raters * (raters - 1))
+    category_share = counts.sum(axis=0) / raters.sum()
+    expected = (category_share ** 2).sum()
+    if expected >= 1:
+        return np.nan
+    return (item_agreement.mean() - expected) / (1 - expected)
+
+def krippendorff_alpha_interval(values):
+    """
+    区间尺度的 Krippendorff's alpha
+    
+    Args:
+        values: 形状为 (标注者, 题目) 的数值，NaN 表示缺失
+    
+    Returns:
+        float: alpha，可配对的值不足时为 NaN
+    """
+    values = np.asarray(values, dtype=float)
+    pairable = (~np.isnan(values)).sum(axis=0) >= 2
+    values = values[:, pairable]
+    counts = (~np.isnan(values)).sum(axis=0)
+    n = counts.sum()
+    if n < 2:
+        return np.nan
+    
+    # 每题内所有有序值对的平方差之和 = 2 * (m * Σx² - (Σx)²)
+    sums = np.nansum(values, axis=0)
+    squares = np.nansum(values ** 2, axis=0)
+    observed = (2 * (counts * squares - sums ** 2) / (counts - 1)).sum() / n
+    expected = 2 * (n * squares.sum() - sums.sum() ** 2) / (n * (n - 1))
+    if expected == 0:
+        return np.nan
+    return 1 - observed / expected
+
+class AgreementEngine:
+    """一致性分析引擎，结果按数据版本缓存"""
+    
+    def __init__(self, catalog):
+        """
+        Args:
+            catalog (ConsistencyCatalog): 一致性测试题库（提供标准答案）
+        """
+        self.catalog = catalog
+        self._lock = threading.Lock()
+        self._version = None
+        self._data = None
+        self._report = None
+    
+    def invalidate(self):
+        """使缓存失效（提交新的一致性测试结果后调用）"""
+        with self._lock:
+            self._version = None
+    
+    def _results_version(self):
+        """测试结果的数据版本：行数与最大ID（INSERT OR REPLACE 会生成新ID）"""
+        conn = DatabaseService.get_connection()
+        try:
+            row = conn.execute('SELECT COUNT(*), MAX(id) FROM consistency_test_results').fetchone()
+            return (row[0], row[1])
+        except sqlite3.OperationalError:
+            # 还没有人提交过一致性测试，表尚未创建
+            return (0, None)
+        finally:
+            conn.close()
+    
+    def _load(self):
+        """载入全部测试结果与标准答案，转换为按 (用户, 题目) 排列的数组"""
+        conn = DatabaseService.get_connection()
+        try:
+            rows = conn.execute('''
+                SELECT username, audio_file, v_value, a_value, emotion_type, discrete_emotion, patient_status
+                FROM consistency_test_results
+            ''').fetchall()
+        except sqlite3.OperationalError:
+            rows = []
+        finally:
+            conn.close()
+        
+        references = self.catalog.get_answers()
+        users = sorted({row[0] for row in rows})
+        items = sorted({row[1] for row in rows} | set(references))
+        user_index = {name: i for i, name in enumerate(users)}
+        item_index = {name: i for i, name in enumerate(items)}
+        shape = (len(users), len(items))
+        
+        # 类别字段按字段建立词表，编码为整数，-1 表示未填写
+        vocabularies = {}
+        for field in CATEGORICAL_FIELDS:
+            position = 2 + ALL_FIELDS.index(field)
+            labels = {row[position] for row in rows if row[position] is not None}
+            labels |= {getattr(ref, field) for ref in references.values() if getattr(ref, field) is not None}
+            vocabularies[field] = sorted(labels, key=str)
+        codes = {field: {label: i for i, label in enumerate(vocab)} for field, vocab in vocabularies.items()}
+        
+        answered = np.zeros(shape, dtype=bool)
+        user_values = {field: np.full(shape, np.nan) for field in CONTINUOUS_FIELDS}
+        user_values.update({field: np.full(shape, -1, dtype=np.int64) for field in CATEGORICAL_FIELDS})
+        
+        if rows:
+            u = np.array([user_index[row[0]] for row in rows], dtype=np.int64)
+            i = np.array([item_index[row[1]] for row in rows], dtype=np.int64)
+            answered[u, i] = True
+            for position, field in enumerate(ALL_FIELDS, start=2):
+                if field in CONTINUOUS_FIELDS:
+                    column = [np.nan if row[position] is None else float(row[position]) for row in rows]
+                else:
+                    column = [codes[field].get(row[position], -1) for row in rows]
+                user_values[field][u, i] = column
+        
+        in_reference = np.array([item in references for item in items], dtype=bool)
+        reference_values = {}
+        for field in CONTINUOUS_FIELDS:
+            values = [getattr(references[item], field) if item in references else None for item in items]
+            reference_values[field] = np.array([np.nan if value is None else float(value) for value in values])
+        for field in CATEGORICAL_FIELDS:
+            values = [getattr(references[item], field) if item in references else None for item in items]
+            reference_values[field] = np.array([codes[field].get(value, -1) for value in values], dtype=np.int64)
+        
+        return {
+            'users': users,
+            'items': items,
+            'user_index': user_index,
+            'answered': answered,
+            'user_values': user_values,
+            'in_reference': in_reference,
+            'reference_values': reference_values,
+            'references': references,
+            'vocabularies': vocabularies,
+        }
+    
+    def _compute(self, data):
+        """向量化计算所有用户的一致性指标"""
+        answered = data['answered']
+        scored = answered & data['in_reference'][np.newaxis, :]
+        user_values = data['user_values']
+        reference_values = data['reference_values']
+        
+        # 与标准答案逐题比较（与原有规则一致：未填写的 V/A 按 0 计算，未填写的类别按"空"比较）
+        matches = {}
+        for field in CONTINUOUS_FIELDS:
+            diff = np.nan_to_num(user_values[field]) - np.nan_to_num(reference_values[field])[np.newaxis, :]
+            matches[field] = np.abs(diff) <= VA_TOLERANCE
+        for field in CATEGORICAL_FIELDS:
+            matches[field] = user_values[field] == reference_values[field][np.newaxis, :]
+        
+        total_samples = answered.sum(axis=1)
+        scores = {field: (matches[field] & scored).sum(axis=1) for field in ALL_FIELDS}
+        with np.errstate(divide='ignore', invalid='ignore'):
+            percentages = {
+                field: np.where(total_samples > 0, scores[field] / total_samples * 100, 0.0)
+                for field in ALL_FIELDS
+            }
+        overall = np.mean([percentages[field] for field in ALL_FIELDS], axis=0) if data['users'] else np.zeros(0)
+        
+        # 每个用户与标准答案的混淆矩阵与 Cohen's kappa
+        n_users = len(data['users'])
+        confusions = {}
+        kappas = {}
+        for field in CATEGORICAL_FIELDS:
+            k = len(data['vocabularies'][field])
+            user_codes = user_values[field]
+            ref_codes = np.broadcast_to(reference_values[field], user_codes.shape)
+            valid = scored & (user_codes >= 0) & (ref_codes >= 0)
+            user_rows = np.broadcast_to(np.arange(n_users)[:, np.newaxis], user_codes.shape)
+            flat = (user_rows[valid] * k + user_codes[valid]) * k + ref_codes[valid]
+            confusions[field] = np.bincount(flat, minlength=n_users * k * k).reshape(n_users, k, k)
+            kappas[field] = cohen_kappa(confusions[field]) if k else np.full(n_users, np.nan)
+        
+        # 每个用户与标准答案的 Krippendorff's alpha（两名"标注者"，逐用户向量化）
+        alphas = {}
+        for field in CONTINUOUS_FIELDS:
+            x = user_values[field]
+            r = np.broadcast_to(reference_values[field], x.shape)
+            valid = scored & ~np.isnan(x) & ~np.isnan(r)
+            pairs = valid.sum(axis=1)
+            n = 2 * pairs
+            diff2 = np.where(valid, (x - r) ** 2, 0).sum(axis=1)
+            sums = np.where(valid, x + r, 0).sum(axis=1)
+            squares = np.where(valid, x ** 2 + r ** 2, 0).sum(axis=1)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                observed = diff2 / pairs
+                expected = 2 * (n * squares - sums ** 2) / (n * (n - 1))
+                alphas[field] = np.where(expected > 0, 1 - observed / expected, np.nan)
+        
+        users = []
+        for index, username in enumerate(data['users']):
+            users.append({
+                'username': username,
+                'total_samples': int(total_samples[index]),
+                'consistency_scores': {field: int(scores[field][index]) for field in ALL_FIELDS},
+                'consistency_percentages': {field: float(percentages[field][index]) for field in ALL_FIELDS},
+                'overall_consistency': float(overall[index]),
+                'cohen_kappa': {field: _to_float(kappas[field][index]) for field in CATEGORICAL_FIELDS},
+                'krippendorff_alpha': {field: _to_float(alphas[field][index]) for field in CONTINUOUS_FIELDS},
+            })
+        
+        # 全部用户之间的一致性（不含标准答案）
+        summary = {
+            'users_count': n_users,
+            'samples_count': int(answered.sum()),
+            'average_consistency': float(overall.mean()) if n_users else None,
+            'fleiss_kappa': {
+                field: _to_float(fleiss_kappa(user_values[field], len(data['vocabularies'][field])))
+                for field in CATEGORICAL_FIELDS
+            },
+            'krippendorff_alpha': {
+                field: _to_float(krippendorff_alpha_interval(user_values[field]))
+                for field in CONTINUOUS_FIELDS
+            },
+            'discrete_emotion_confusion': {
+                'labels': data['vocabularies']['discrete_emotion'],
+                'matrix': confusions['discrete_emotion'].sum(axis=0).tolist(),
+            },
+        }
+        
+        return {'summary': summary, 'users': users, 'confusions': confusions, 'matches': matches}
+    
+    def _ensure_current(self):
+        """数据版本变化时重新载入并计算"""
+        self.catalog.get_answers()  # 题库有变化时先重新加载，使版本号更新
+        version = (self._results_version(), self.catalog.version)
+        if version == self._version and self._report is not None:
+            return self._data, self._report
+        
+        with self._lock:
+            if version != self._version or self._report is None:
+                data = self._load()
+                report = self._compute(data)
+                self._data, self._report, self._version = data, report, version
+                emotion_logger.log_system_event("一致性分析已重新计算", {
+                    "users": report['summary']['users_count'],
+                    "samples": report['summary']['samples_count']
+                })
+            return self._data, self._report
+    
+    def get_all_users_report(self):
+        """
+        获取全部用户的一致性报告
+        
+        Returns:
+            dict: {'summary': 全体一致性指标, 'users': [每个用户的一致性指标]}
+        """
+        _, report = self._ensure_current()
+        return {'summary': report['summary'], 'users': report['users']}
+    
+    def get_user_report(self, username):
+        """
+        获取单个用户的一致性报告（包含逐题比较结果）
+        
+        Args:
+            username (str): 用户名
+        
+        Returns:
+            dict: 用户一致性报告，用户没有一致性测试数据时返回None
+        """
+        data, report = self._ensure_current()
+        index = data['user_index'].get(username)
+        if index is None:
+            return None
+        
+        user_report = dict(report['users'][index])
+        matches = report['matches']
+        user_values = data['user_values']
+        scored_items = np.flatnonzero(data['answered'][index] & data['in_reference'])
+        
+        def user_value(field, item):
+            value = user_values[field][index, item]
+            if field in CONTINUOUS_FIELDS:
+                return None if np.isnan(value) else float(value)
+            return data['vocabularies'][field][value] if value >= 0 else None
+        
+        detailed_results = []
+        for item in scored_items:
+            audio_file = data['items'][item]
+            detailed_results.append({
+                'audio_file': audio_file,
+                'v_consistent': bool(matches['v_value'][index, item]),
+                'a_consistent': bool(matches['a_value'][index, item]),
+                'emotion_type_consistent': bool(matches['emotion_type'][index, item]),
+                'discrete_consistent': bool(matches['discrete_emotion'][index, item]),
+                'patient_consistent': bool(matches['patient_status'][index, item]),
+                'user_values': {field: user_value(field, item) for field in ALL_FIELDS},
+                'standard_values': data['references'][audio_file]._asdict()
+            })
+        
+        user_report['detailed_results'] = detailed_results
+        user_report['discrete_emotion_confusion'] = {
+            'labels': data['vocabularies']['discrete_emotion'],
+            'matrix': report['confusions']['discrete_emotion'][index].tolist(),
+        }
+        return user_report
\ No newline at end of file
@@ -5,31 +5,69 @@ import re
 import random
 from config import Config
 from services.order_service import OrderService
-from group_assignment_manager import GroupAssignmentManager
+from group_assignment_manager import get_group_assignment_manager
+
+# 目录列表缓存：(路径, 类型) -> (目录修改时间, 内容)；目录中增删文件会改变修改时间，缓存随之失效
+_listing_cache = {}
+
+def _cached(path, kind, build):
+    """
+    按目录修改时间缓存由目录内容生成的数据（调用方不能修改返回值）
+    
+    Args:
+        path (str): 目录
+        kind (str): 数据类型，同一目录可缓存多种数据
+        build (callable): 生成数据的函数
+    """
+    stamp = os.stat(path).st_mtime_ns
+    cached = _listing_cache.get((path, kind))
+    if cached is None or cached[0] != stamp:
+        cached = (stamp, build())
+        _listing_cache[(path, kind)] = cached
+    return cached[1]
+
+def _cached_listing(path, kind, build):
+    """缓存的目录列表，返回副本（调用方可能原地打乱顺序）"""
+    return list(_cached(path, kind, build))
 
 class AudioService:
     """音频文件相关服务"""
     
     @staticmethod
-    def get_speakers_list(username="default"):
-        """获取说话人列表（根据用户分组过滤）"""
+    def _speaker_dirs():
+        """音频根目录下的所有说话人目录"""
+        return _cached_listing(Config.AUDIO_FOLDER, 'speakers', lambda: [
+            d for d in os.listdir(Config.AUDIO_FOLDER)
+            if os.path.isdir(os.path.join(Config.AUDIO_FOLDER, d))
+        ])
+    
+    @staticmethod
+    def _wav_files(speaker_folder):
+        """说话人目录下的所有 WAV 文件"""
+        return _cached_listing(speaker_folder, 'wav', lambda: glob.glob(os.path.join(speaker_folder, "*.wav")))
+    
+    @staticmethod
+    def get_speakers_list(username="default", group_id=None, conn=None):
+        """
+        获取说话人列表（根据用户分组过滤）
+        
+        group_id 为会话中缓存的用户分组ID，提供时不再查询分组分配数据库；
+        conn 为可选的共享连接（分组数据库已通过 attach 附加）
+        """
         if not os.path.exists(Config.AUDIO_FOLDER):
             raise FileNotFoundError(f"音频文件夹不存在: {Config.AUDIO_FOLDER}")
-
+        
         # 获取用户分配的分组信息
-        group_manager = GroupAssignmentManager()
-        user_assignment = group_manager.get_user_assignment_info(username)
+        group_manager = get_group_assignment_manager()
+        if group_id is None:
+            group_id = group_manager.get_user_group_id(username)
         
-        if user_assignment:
+        if group_id is not None:
             # 用户有分配的分组，只返回该分组的说话人
-            group_id = user_assignment['group_id']
-            assigned_speakers = group_manager.get_group_speakers(group_id)
+            assigned_speakers = group_manager.get_group_speakers(group_id, conn)
             
             # 获取所有说话人目录
-            all_speakers = [
-                d for d in os.listdir(Config.AUDIO_FOLDER)
-                if os.path.isdir(os.path.join(Config.AUDIO_FOLDER, d))
-            ]
+            all_speakers = AudioService._speaker_dirs()
             
             # 按spk编号分组，但只包含分配给用户的说话人
             speaker_groups = {}
@@ -49,10 +87,7 @@ class AudioService:
                         speaker_groups[speaker] = [speaker]
         else:
             # 用户没有分配分组，返回所有说话人（兼容旧逻辑）
-            all_speakers = [
-                d for d in os.listdir(Config.AUDIO_FOLDER)
-                if os.path.isdir(os.path.join(Config.AUDIO_FOLDER, d))
-            ]
+            all_speakers = AudioService._speaker_dirs()
             
             # 按spk编号分组
             speaker_groups = {}
@@ -68,15 +103,15 @@ class AudioService:
                     speaker_groups[speaker] = [speaker]
         
         # 获取或创建用户专属排序
-        return AudioService._get_user_speaker_order(username, speaker_groups)
+        return AudioService._get_user_speaker_order(username, speaker_groups, conn)
     
     @staticmethod
-    def _get_user_speaker_order(username, speaker_groups):
+    def _get_user_speaker_order(username, speaker_groups, conn=None):
         """获取用户专属的说话人排序"""
-        return OrderService.get_user_speaker_order(username, speaker_groups)
+        return OrderService.get_user_speaker_order(username, speaker_groups, conn)
     
     @staticmethod
-    def get_audio_files_list(speaker, username=""):
+    def get_audio_files_list(speaker, username="", conn=None):
         """获取指定说话人的音频文件列表"""
         # 获取音频文件
         if re.match(r'spk\d+$', speaker):
@@ -86,7 +121,7 @@ class AudioService:
         
         # 获取用户专属的文件排序
         if username:
-            audio_files = AudioService._get_user_audio_order(speaker, username, audio_files)
+            audio_files = AudioService._get_user_audio_order(speaker, username, audio_files, conn)
         else:
             random.shuffle(audio_files)
         
@@ -95,17 +130,12 @@ class AudioService:
     @staticmethod
     def _get_grouped_speaker_files(speaker):
         """获取分组说话人的音频文件"""
-        all_speakers = [
-            d for d in os.listdir(Config.AUDIO_FOLDER)
-            if os.path.isdir(os.path.join(Config.AUDIO_FOLDER, d)) 
-            and d.startswith(speaker + '-')
-        ]
+        all_speakers = [d for d in AudioService._speaker_dirs() if d.startswith(speaker + '-')]
         
         audio_files = []
         for sub_speaker in all_speakers:
             speaker_folder = os.path.join(Config.AUDIO_FOLDER, sub_speaker)
-            files = glob.glob(os.path.join(speaker_folder, "*.wav"))
-            audio_files.extend(files)
+            audio_files.extend(AudioService._wav_files(speaker_folder))
         
         return audio_files
     
@@ -116,32 +146,40 @@ class AudioService:
         if not os.path.exists(speaker_folder):
             raise FileNotFoundError(f"找不到说话人 {speaker} 的文件夹")
         
-        return glob.glob(os.path.join(speaker_folder, "*.wav"))
+        return AudioService._wav_files(speaker_folder)
     
     @staticmethod
-    def _get_user_audio_order(speaker, username, audio_files):
+    def _get_user_audio_order(speaker, username, audio_files, conn=None):
         """获取用户专属的音频文件排序"""
-        return OrderService.get_user_audio_order(speaker, username, audio_files)
+        return OrderService.get_user_audio_order(speaker, username, audio_files, conn)
+    
+    @staticmethod
+    def _file_names(speaker_folder):
+        """说话人目录下的文件名索引（目录不存在时为空）"""
+        try:
+            return _cached(speaker_folder, 'names', lambda: frozenset(os.listdir(speaker_folder)))
+        except OSError:
+            return frozenset()
     
     @staticmethod
     def find_audio_file(speaker, filename):
-        """查找音频文件的完整路径"""
+        """
+        查找音频文件的完整路径
+        
+        在目录文件名索引中查找，不逐个检查文件是否存在；
+        文件名只能是目录中的文件，不会解析到说话人目录之外
+        """
         if re.match(r'spk\d+$', speaker):
             # 分组说话人
-            all_speakers = [
-                d for d in os.listdir(Config.AUDIO_FOLDER)
-                if os.path.isdir(os.path.join(Config.AUDIO_FOLDER, d)) 
-                and d.startswith(speaker + '-')
-            ]
-            
-            for sub_speaker in all_speakers:
-                file_path = os.path.join(Config.AUDIO_FOLDER, sub_speaker, filename)
-                if os.path.exists(file_path):
-                    return file_path, sub_speaker
-            return None, None
-        else:
+            candidates = [d for d in AudioService._speaker_dirs() if d.startswith(speaker + '-')]
+        elif speaker in AudioService._speaker_dirs():
             # 单个说话人
-            file_path = os.path.join(Config.AUDIO_FOLDER, speaker, filename)
-            if os.path.exists(file_path):
-                return file_path, speaker
-            return None, None
\ No newline at end of file
+            candidates = [speaker]
+        else:
+            return None, None
+        
+        for sub_speaker in candidates:
+            speaker_folder = os.path.join(Config.AUDIO_FOLDER, sub_speaker)
+            if filename in AudioService._file_names(speaker_folder):
+                return os.path.join(speaker_folder, filename), sub_speaker
+        return None, None
\ No newline at end of file
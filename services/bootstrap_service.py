@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+标注页面启动数据
+标注页面加载时需要的分组进度、说话人排序和当前说话人的音频列表在一次请求中组装，
+所有查询共用一个数据库连接（分组数据库附加到 emotion_labels.db 的连接上）
+"""
+
+import os
+from config import Config
+from services.audio_service import AudioService
+from services.database_service import DatabaseService
+from group_assignment_manager import get_group_assignment_manager
+
+class BootstrapService:
+    """标注页面启动数据服务类"""
+    
+    @staticmethod
+    def get_audio_list(speaker, username, conn=None):
+        """
+        获取说话人的音频列表及每个文件的标注状态
+        
+        Args:
+            speaker (str): 说话人
+            username (str): 用户名
+            conn: 可选的共享数据库连接
+        
+        Returns:
+            list: [{file_name, path, labeled, annotation_completeness}, ...]
+        """
+        audio_files = AudioService.get_audio_files_list(speaker, username, conn)
+        labeled_files, annotation_completeness = DatabaseService.get_labeled_files(username, speaker, conn)
+        
+        result = []
+        for audio_file in audio_files:
+            file_name = os.path.basename(audio_file)
+            result.append({
+                "file_name": file_name,
+                "path": f"/api/audio/{speaker}/{file_name}",
+                "labeled": file_name in labeled_files,
+                "annotation_completeness": annotation_completeness.get(file_name, ['none']),
+            })
+        return result
+    
+    @staticmethod
+    def get_annotation_bootstrap(username, group_id=None, speaker=None, page_size=None):
+        """
+        组装标注页面的启动数据
+        
+        Args:
+            username (str): 用户名
+            group_id (int): 会话中缓存的分组ID
+            speaker (str): 希望打开的说话人（如上次选择的说话人），不在列表中时使用第一个说话人
+            page_size (int): 音频列表第一页的条数
+        
+        Returns:
+            dict: 包含 assignment / speakers / active_speaker / audio_list
+        """
+        page_size = page_size or Config.BOOTSTRAP_AUDIO_PAGE_SIZE
+        group_manager = get_group_assignment_manager()
+        
+        conn = DatabaseService.get_connection()
+        try:
+            # 分组数据库不存在时，分组相关查询各自建立连接
+            group_conn = conn if group_manager.attach(conn) else None
+            
+            assignment = None
+            if group_conn is not None:
+                info = group_manager.get_user_assignment_info(username, group_conn)
+                if info:
+                    total = info['total_segments'] or 0
+                    assignment = {
+                        'group_id': info['group_id'],
+                        'status': info['status'],
+                        'progress_count': info['progress_count'],
+                        'total_segments': total,
+                        'progress_percentage': round(info['progress_count'] / total * 100, 2) if total > 0 else 0
+                    }
+                    group_id = info['group_id']
+            
+            speakers = AudioService.get_speakers_list(username, group_id, group_conn)
+            active_speaker = speaker if speaker in speakers else (speakers[0] if speakers else None)
+            
+            audio_list = None
+            if active_speaker is not None:
+                items = BootstrapService.get_audio_list(active_speaker, username, conn)
+                audio_list = {
+                    'speaker': active_speaker,
+                    'items': items[:page_size],
+                    'total': len(items),
+                    'has_more': len(items) > page_size
+                }
+            
+            return {
+                'group_id': group_id,
+                'assignment': assignment,
+                'speakers': speakers,
+                'active_speaker': active_speaker,
+                'audio_list': audio_list
+            }
+        finally:
+            conn.close()
\ No newline at end of file
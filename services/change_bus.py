@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+进程内变更总线
+标注写入路径发布变更事件，管理后台的 SSE 连接按事件编号读取；
+所有订阅者共用一个固定长度的环形缓冲，发布是 O(1)，订阅者只保存自己读到的位置。
+订阅者落后太多（事件已被覆盖）或从其他进程重连时，通知其重新加载。
+
+总线只在单个进程内有效：多工作进程部署（Config.WORKERS）时，其他进程的写入不会出现在
+本进程的总线上，SSE 连接只能通过共享的 labels 数据版本发现它们并推送 resync
+"""
+
+import os
+import uuid
+import threading
+from collections import deque
+
+# 环形缓冲保留的事件数
+HISTORY_SIZE = 1024
+
+_bus_instance = None
+_bus_lock = threading.Lock()
+
+def get_change_bus():
+    """
+    获取当前进程的变更总线
+
+    fork 出的子进程不能沿用父进程的条件变量和事件，按进程号重新创建
+    """
+    global _bus_instance
+    pid = os.getpid()
+    if _bus_instance is None or _bus_instance.pid != pid:
+        with _bus_lock:
+            if _bus_instance is None or _bus_instance.pid != pid:
+                _bus_instance = ChangeBus()
+    return _bus_instance
+
+class ChangeBus:
+    """进程内变更事件的发布与等待"""
+
+    def __init__(self, history_size=HISTORY_SIZE):
+        self.pid = os.getpid()
+        # 事件编号的前缀，用于识别 Last-Event-ID 是否来自本进程的本次运行
+        self.instance = uuid.uuid4().hex[:8]
+        self._condition = threading.Condition()
+        self._events = deque(maxlen=history_size)  # (seq, event_type, data)
+        self._last_seq = 0
+
+    def publish(self, event_type, data):
+        """
+        发布事件（不阻塞，没有订阅者时只写入环形缓冲）
+
+        Args:
+            event_type (str): 事件类型
+            data (dict): 事件内容（需可 JSON 序列化）
+        """
+        with self._condition:
+            self._last_seq += 1
+            self._events.append((self._last_seq, event_type, data))
+            self._condition.notify_all()
+
+    def event_id(self, seq):
+        """对外的事件编号（SSE 的 id 字段）"""
+        return f"{self.instance}-{seq}"
+
+    def resolve_cursor(self, last_event_id):
+        """
+        将客户端的 Last-Event-ID 转换为读取位置
+
+        Returns:
+            tuple: (seq, valid)；编号不属于本进程本次运行时从当前位置开始，valid 为False
+        """
+        with self._condition:
+            current = self._last_seq
+        if not last_event_id:
+            return current, True
+        instance, _, seq = last_event_id.partition('-')
+        if instance != self.instance or not seq.isdigit() or int(seq) > current:
+            return current, False
+        return int(seq), True
+
+    def wait(self, after_seq, timeout):
+        """
+        等待编号大于 after_seq 的事件
+
+        Args:
+            after_seq (int): 已读取到的事件编号
+            timeout (float): 最长等待秒数
+
+        Returns:
+            tuple: (events, last_seq, missed)
+                events: [(seq, event_type, data), ...]
+                last_seq: 新的读取位置
+                missed: 是否有事件已被环形缓冲覆盖（订阅者应重新加载）
+        """
+        with self._condition:
+            if self._last_seq <= after_seq:
+                self._condition.wait(timeout)
+            if self._last_seq <= after_seq:
+                return [], after_seq, False
+            oldest = self._events[0][0]
+            missed = oldest > after_seq + 1
+            events = [event for event in self._events if event[0] > after_seq]
+            return events, self._last_seq, missed
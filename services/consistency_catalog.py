@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+一致性测试题库
+启动时扫描一次一致性测试目录，在内存中保存题目列表和标准答案（按文件名索引），
+目录内容变化（修改时间改变）时自动重新加载。测试页面和管理后台共用同一份数据
+"""
+
+import os
+import json
+import time
+import threading
+from collections import namedtuple
+from config import Config
+from utils.logger import emotion_logger
+
+# 标准答案记录
+ReferenceAnswer = namedtuple('ReferenceAnswer', [
+    'audio_file', 'v_value', 'a_value', 'emotion_type', 'discrete_emotion', 'patient_status'
+])
+
+# 原地修改 .json 文件不会改变目录的修改时间，每隔这么多秒额外检查一次各文件的修改时间
+FILE_RECHECK_INTERVAL = 30
+
+_catalog_instance = None
+_catalog_lock = threading.Lock()
+
+def get_consistency_catalog():
+    """获取进程内共享的一致性测试题库"""
+    global _catalog_instance
+    if _catalog_instance is None:
+        with _catalog_lock:
+            if _catalog_instance is None:
+                _catalog_instance = ConsistencyCatalog(Config.CONSISTENCY_TEST_FOLDER)
+    return _catalog_instance
+
+class ConsistencyCatalog:
+    """一致性测试题目与标准答案"""
+    
+    def __init__(self, directory):
+        """
+        Args:
+            directory (str): 一致性测试数据目录（.wav 音频 + 同名 .json 标准答案）
+        """
+        self.directory = directory
+        self.version = 0  # 每次重新加载后递增，供依赖题库的缓存判断是否失效
+        self._lock = threading.Lock()
+        self._dir_mtime = None
+        self._file_signature = None
+        self._checked_at = 0
+        self._questions = []
+        self._audio_files = frozenset()
+        self._answers = {}
+    
+    def _scan_signature(self):
+        """目录中所有文件的 (文件名, 修改时间)"""
+        with os.scandir(self.directory) as entries:
+            return frozenset((entry.name, entry.stat().st_mtime) for entry in entries if entry.is_file())
+    
+    def _ensure_loaded(self):
+        """目录修改时间变化（或定期检查发现文件变化）时重新加载"""
+        try:
+            dir_mtime = os.stat(self.directory).st_mtime
+        except FileNotFoundError:
+            dir_mtime = None
+        
+        now = time.monotonic()
+        if dir_mtime == self._dir_mtime and now - self._checked_at < FILE_RECHECK_INTERVAL:
+            return
+        
+        with self._lock:
+            if dir_mtime == self._dir_mtime and now - self._checked_at < FILE_RECHECK_INTERVAL:
+                return
+            
+            signature = self._scan_signature() if dir_mtime is not None else frozenset()
+            if signature != self._file_signature or dir_mtime != self._dir_mtime:
+                self._load(signature)
+            self._dir_mtime = dir_mtime
+            self._file_signature = signature
+            self._checked_at = now
+    
+    def _load(self, signature):
+        """读取目录中的音频列表和标准答案（调用方持有 self._lock）"""
+        filenames = sorted(name for name, _ in signature)
+        
+        questions = []
+        audio_files = set()
+        for filename in filenames:
+            if filename.endswith('.wav'):
+                audio_files.add(filename)
+                questions.append({
+                    'filename': filename,
+                    'base_name': os.path.splitext(filename)[0],
+                    'type': 'consistency'
+                })
+        
+        answers = {}
+        for filename in filenames:
+            if not filename.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.directory, filename), 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except (OSError, ValueError) as e:
+                emotion_logger.log_error(e, f"读取一致性测试标准答案失败 - {filename}")
+                continue
+            audio_file = data.get('audio_file')
+            if audio_file:
+                answers[audio_file] = ReferenceAnswer(*(data.get(field) for field in ReferenceAnswer._fields))
+        
+        self._questions = questions
+        self._audio_files = frozenset(audio_files)
+        self._answers = answers
+        self.version += 1
+        
+        emotion_logger.log_system_event("一致性测试题库已加载", {
+            "directory": self.directory,
+            "questions": len(questions),
+            "answers": len(answers)
+        })
+    
+    def load(self):
+        """立即加载题库（应用启动时调用）"""
+        self._ensure_loaded()
+        return self
+    
+    def exists(self):
+        """一致性测试目录是否存在"""
+        self._ensure_loaded()
+        return self._dir_mtime is not None
+    
+    def get_questions(self):
+        """
+        获取题目列表（按文件名排序）
+        
+        Returns:
+            list: [{'filename', 'base_name', 'type'}, ...]
+        """
+        self._ensure_loaded()
+        return self._questions
+    
+    def has_audio(self, filename):
+        """题库中是否有该音频文件"""
+        self._ensure_loaded()
+        return filename in self._audio_files
+    
+    def get_answers(self):
+        """
+        获取全部标准答案
+        
+        Returns:
+            dict: audio_file -> ReferenceAnswer
+        """
+        self._ensure_loaded()
+        return self._answers
+    
+    def get_answer(self, audio_file):
+        """获取单个音频的标准答案，不存在时返回None"""
+        self._ensure_loaded()
+        return self._answers.get(audio_file)
\ No newline at end of file
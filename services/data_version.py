@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+数据版本计数器
+每类数据（标注、播放次数、分组、排序、一致性分析等）有一个全局计数器和按用户散列的计数器，
+写入时递增。计数器保存在数据库目录下的共享内存映射文件中，所有工作进程（以及初始化脚本）
+共用同一份，读取只访问内存，不打开 SQLite。
+
+读接口用这些计数器生成 ETag：计数器未变化时返回 304，不再重新查询和序列化。
+用户计数器按用户名散列到固定数量的槽位，冲突只会让无关用户的缓存多失效一次
+"""
+
+import os
+import mmap
+import uuid
+import zlib
+import struct
+import threading
+from functools import wraps
+from flask import request, make_response
+from config import Config
+
+try:
+    import fcntl
+except ImportError:  # Windows：只在进程内加锁
+    fcntl = None
+
+VERSION_FILENAME = 'data_versions.bin'
+
+# 数据类别：groups 为用户分组分配和进度，group_layout 为分组包含的说话人，
+# sessions 按会话ID散列（utils/session_store.py 的进程内缓存据此失效）；新类别只能追加在末尾
+NAMESPACES = ('labels', 'play_counts', 'groups', 'group_layout', 'orders', 'agreement', 'sessions')
+
+# 每个类别的用户槽位数
+USER_SLOTS = 4096
+
+_SLOT = struct.Struct('<Q')
+# 槽位 0 保存文件纪元（文件重建后 ETag 不会与旧值重复），之后每个类别 1 个全局槽位 + USER_SLOTS 个用户槽位
+_NAMESPACE_SLOTS = 1 + USER_SLOTS
+_FILE_SIZE = _SLOT.size * (1 + len(NAMESPACES) * _NAMESPACE_SLOTS)
+
+_store_instance = None
+_store_lock = threading.Lock()
+
+def get_data_versions():
+    """
+    获取当前进程的数据版本存储
+    
+    文件锁属于打开的文件描述，fork 出的子进程必须重新打开，按进程号重新创建
+    """
+    global _store_instance
+    pid = os.getpid()
+    if _store_instance is None or _store_instance.pid != pid:
+        with _store_lock:
+            if _store_instance is None or _store_instance.pid != pid:
+                _store_instance = DataVersionStore(os.path.join(Config.DATABASE_FOLDER, VERSION_FILENAME))
+    return _store_instance
+
+def bump_version(namespace, *usernames):
+    """写入后递增数据版本（失败不影响写入本身）"""
+    try:
+        get_data_versions().bump(namespace, *usernames)
+    except OSError as e:
+        print(f"更新数据版本失败: {e}")
+
+def path_stamp(*paths):
+    """目录/文件的修改时间（不存在时为0），用于把文件系统的变化也计入 ETag"""
+    stamps = []
+    for path in paths:
+        try:
+            stamps.append(os.stat(path).st_mtime_ns)
+        except OSError:
+            stamps.append(0)
+    return tuple(stamps)
+
+class DataVersionStore:
+    """基于共享内存映射文件的版本计数器"""
+    
+    def __init__(self, path):
+        self.pid = os.getpid()
+        self._thread_lock = threading.Lock()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        
+        with self._locked():
+            if os.fstat(self._fd).st_size < _FILE_SIZE:
+                os.ftruncate(self._fd, _FILE_SIZE)
+            self._map = mmap.mmap(self._fd, _FILE_SIZE)
+            if self._read(0) == 0:
+                self._write(0, uuid.uuid4().int & ((1 << 63) - 1))
+        self.epoch = self._read(0)
+    
+    def _locked(self):
+        store = self
+        
+        class _Lock:
+            def __enter__(self):
+                store._thread_lock.acquire()
+                if fcntl is not None:
+                    fcntl.flock(store._fd, fcntl.LOCK_EX)
+            
+            def __exit__(self, *exc):
+                if fcntl is not None:
+                    fcntl.flock(store._fd, fcntl.LOCK_UN)
+                store._thread_lock.release()
+        
+        return _Lock()
+    
+    def _read(self, slot):
+        return _SLOT.unpack_from(self._map, slot * _SLOT.size)[0]
+    
+    def _write(self, slot, value):
+        _SLOT.pack_into(self._map, slot * _SLOT.size, value)
+    
+    @staticmethod
+    def _slot(namespace, username=None):
+        base = 1 + NAMESPACES.index(namespace) * _NAMESPACE_SLOTS
+        if username is None:
+            return base
+        return base + 1 + zlib.crc32(username.encode('utf-8')) % USER_SLOTS
+    
+    def bump(self, namespace, *usernames):
+        """
+        递增类别的全局版本，以及给定用户的版本
+        
+        Args:
+            namespace (str): 数据类别（NAMESPACES 之一）
+            usernames: 受影响的用户
+        """
+        slots = {self._slot(namespace)}
+        slots.update(self._slot(namespace, username) for username in usernames if username)
+        with self._locked():
+            for slot in slots:
+                self._write(slot, self._read(slot) + 1)
+    
+    def get(self, namespace, username=None):
+        """读取版本（不加锁）"""
+        return self._read(self._slot(namespace, username))
+    
+    def etag(self, keys, extra=()):
+        """
+        由一组版本生成 ETag
+        
+        Args:
+            keys (list): [(namespace, username或None), ...]
+            extra (tuple): 其他参与计算的值（如请求参数、日期、目录修改时间）
+        """
+        values = [self.epoch] + [self.get(namespace, username) for namespace, username in keys]
+        return f"v{zlib.crc32(repr((values, extra)).encode('utf-8')):08x}-{sum(values[1:])}"
+
+def versioned(keys_func):
+    """
+    读接口装饰器：根据数据版本处理 ETag / If-None-Match
+    
+    keys_func 接收视图参数，返回 (keys, extra)；版本未变化时直接返回 304，
+    否则执行视图，并为成功的响应加上 ETag（Cache-Control: no-cache，每次都需验证）。
+    ETag 在执行视图之前计算，执行期间发生的写入会使下一次请求重新获取
+    
+    Args:
+        keys_func (callable): (**view_kwargs) -> (keys, extra)
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            keys, extra = keys_func(**kwargs)
+            if keys is None:
+                return f(*args, **kwargs)
+            
+            etag = get_data_versions().etag(keys, extra)
+            # 压缩后的响应带弱 ETag（W/），按弱比较匹配
+            if request.if_none_match.contains_weak(etag):
+                response = make_response('', 304)
+                response.set_etag(etag)
+                response.headers['Cache-Control'] = 'no-cache'
+                return response
+            
+            response = make_response(f(*args, **kwargs))
+            if response.status_code == 200:
+                response.set_etag(etag)
+                response.headers['Cache-Control'] = 'no-cache'
+            return response
+        return decorated_function
+    return decorator
\ No newline at end of file
@@ -15,11 +15,22 @@ except ImportError:
 import os
 import json
 from datetime import datetime
-from models.emotion_model import EmotionLabel
+from models.emotion_model import EmotionLabel, LABEL_VALUE_FIELDS, get_speaker_group, is_group_speaker
+from group_assignment_manager import get_group_assignment_manager
+from services.change_bus import get_change_bus
+from services.data_version import bump_version
 from utils.audio_utils import get_audio_duration
 from utils.logger import emotion_logger
 from config import Config
 
+class LabelConflictError(Exception):
+    """保存标注时提交的版本与数据库中的版本不一致（记录已被其他页面或请求修改）"""
+    
+    def __init__(self, current):
+        super().__init__("标注已被修改")
+        # 数据库中的当前记录（get_label 的格式），记录不存在时为None
+        self.current = current
+
 class DatabaseService:
     """数据库服务类"""
     
@@ -61,6 +72,7 @@ class DatabaseService:
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     audio_file TEXT NOT NULL,
                     speaker TEXT NOT NULL,
+                    speaker_group TEXT,
                     username TEXT NOT NULL,
                     v_value REAL,
                     a_value REAL,
@@ -73,16 +85,12 @@ class DatabaseService:
                     discrete_complete BOOLEAN DEFAULT FALSE,
                     timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
                     updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    version INTEGER NOT NULL DEFAULT 1,
                     UNIQUE(audio_file, speaker, username)
                 )
             ''')
             
-            # 创建索引
-            cursor.execute('''
-                CREATE INDEX IF NOT EXISTS idx_audio_speaker_user 
-                ON emotion_labels(audio_file, speaker, username)
-            ''')
-            
+            # 创建索引（(audio_file, speaker, username) 已由唯一约束建立索引）
             cursor.execute('''
                 CREATE INDEX IF NOT EXISTS idx_username 
                 ON emotion_labels(username)
@@ -93,111 +101,360 @@ class DatabaseService:
                 ON emotion_labels(speaker)
             ''')
             
-            # 创建触发器用于更新 updated_at
             cursor.execute('''
-                CREATE TRIGGER IF NOT EXISTS update_emotion_labels_timestamp 
-                AFTER UPDATE ON emotion_labels
-                BEGIN
-                    UPDATE emotion_labels SET updated_at = CURRENT_TIMESTAMP 
-                    WHERE id = NEW.id;
-                END
+                CREATE INDEX IF NOT EXISTS idx_user_group_file 
+                ON emotion_labels(username, speaker_group, audio_file)
             ''')
             
             conn.commit()
             print("数据库表创建成功")
     
+    @staticmethod
+    def init_database():
+        """
+        初始化数据库（应用启动时执行一次）：建表并执行结构迁移
+        """
+        conn = DatabaseService.get_connection()
+        try:
+            DatabaseService._migrate_speaker_group(conn)
+            DatabaseService._migrate_label_upsert(conn)
+            DatabaseService._migrate_label_version(conn)
+            DatabaseService._init_play_count_batches(conn)
+        finally:
+            conn.close()
+    
+    @staticmethod
+    def _migrate_speaker_group(conn):
+        """
+        迁移：为旧表添加 speaker_group 列并回填，建立 (username, speaker_group, audio_file) 索引
+        
+        分组说话人（spkN）的查询改为按 speaker_group 精确匹配，不再使用 LIKE 'spkN-%'
+        """
+        cursor = conn.cursor()
+        cursor.execute("PRAGMA table_info(emotion_labels)")
+        columns = {row['name'] for row in cursor.fetchall()}
+        
+        if 'speaker_group' not in columns:
+            cursor.execute('ALTER TABLE emotion_labels ADD COLUMN speaker_group TEXT')
+        
+        conn.create_function('speaker_group', 1, get_speaker_group)
+        cursor.execute('''
+            UPDATE emotion_labels SET speaker_group = speaker_group(speaker) 
+            WHERE speaker_group IS NULL
+        ''')
+        backfilled = cursor.rowcount
+        
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_user_group_file 
+            ON emotion_labels(username, speaker_group, audio_file)
+        ''')
+        conn.commit()
+        
+        if backfilled > 0:
+            emotion_logger.log_database_operation(
+                operation="MIGRATE",
+                table="emotion_labels",
+                details={"speaker_group_backfilled": backfilled},
+                success=True
+            )
+    
+    @staticmethod
+    def _migrate_label_upsert(conn):
+        """
+        迁移：标注改为 INSERT ... ON CONFLICT DO UPDATE 写入后，删除不再需要的结构
+        
+        - update_emotion_labels_timestamp 触发器：updated_at 改为在写入语句中设置
+        - idx_audio_speaker_user 索引：与唯一约束 (audio_file, speaker, username) 的索引重复
+        """
+        cursor = conn.cursor()
+        cursor.execute('DROP TRIGGER IF EXISTS update_emotion_labels_timestamp')
+        cursor.execute('DROP INDEX IF EXISTS idx_audio_speaker_user')
+        conn.commit()
+    
+    @staticmethod
+    def _migrate_label_version(conn):
+        """迁移：为旧表添加行版本列 version（已有记录从1开始）"""
+        cursor = conn.cursor()
+        cursor.execute("PRAGMA table_info(emotion_labels)")
+        if 'version' not in {row['name'] for row in cursor.fetchall()}:
+            cursor.execute('ALTER TABLE emotion_labels ADD COLUMN version INTEGER NOT NULL DEFAULT 1')
+            conn.commit()
+    
+    @staticmethod
+    def _init_play_count_batches(conn):
+        """创建播放次数批次表（apply_play_count_batch 据此防止同一批次重复累加）"""
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS play_count_batches (
+                batch_id TEXT PRIMARY KEY,
+                applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        conn.commit()
+    
+    @staticmethod
+    def _label_to_dict(row):
+        """标注记录转换为字典，附带标注完整性"""
+        from models.emotion_model import calculate_annotation_completeness
+        label_dict = dict(row)
+        label_dict['annotation_completeness'] = calculate_annotation_completeness(label_dict)
+        return label_dict
+    
+    @staticmethod
+    def _build_label(label_data, audio_file_path):
+        """
+        由请求数据和音频文件创建标注对象（解析音频时长，在事务开始前调用）
+        
+        Returns:
+            tuple: (标注对象, 请求中包含的标注内容字段, 提交时所基于的版本)
+        """
+        fields = [field for field in LABEL_VALUE_FIELDS if field in label_data]
+        if not fields:
+            raise ValueError("缺少标注内容")
+        label = EmotionLabel(
+            audio_file=label_data.get("audio_file"),
+            v_value=label_data.get("v_value"),
+            a_value=label_data.get("a_value"),
+            emotion_type=label_data.get("emotion_type"),
+            discrete_emotion=label_data.get("discrete_emotion"),
+            username=label_data.get("username"),
+            patient_status=label_data.get("patient_status"),
+            audio_duration=get_audio_duration(audio_file_path)
+        )
+        return label, fields, label_data.get("version")
+    
+    @staticmethod
+    def _write_label(cursor, label, fields, speaker, group_manager, track_progress, expected_version=None):
+        """
+        在已开始的写事务中写入一条标注，并在完成状态变化时更新分组进度
+        
+        使用 INSERT ... ON CONFLICT DO UPDATE：已有记录只更新 fields 中的字段、完成状态和时间，
+        id、play_count 等其他列保持不变；未提交的字段取原值计算完成状态。
+        
+        expected_version 为客户端读取到的版本（0 表示记录尚不存在），与当前版本不一致时抛出
+        LabelConflictError；不提供时不检查（后保存的覆盖先保存的）。提交的内容与当前记录相同时
+        （如重试已成功的请求）不视为冲突，也不再写入
+        
+        Returns:
+            tuple: (保存后的版本, 通知管理后台的 label_saved 事件内容；未写入时为None)
+        """
+        cursor.execute('''
+            SELECT * FROM emotion_labels
+            WHERE audio_file = ? AND speaker = ? AND username = ?
+        ''', (label.audio_file, speaker, label.username))
+        previous = cursor.fetchone()
+        current_version = previous['version'] if previous is not None else 0
+        if expected_version is not None and expected_version != current_version:
+            if previous is not None and all(previous[field] == getattr(label, field) for field in fields):
+                return current_version, None
+            raise LabelConflictError(DatabaseService._label_to_dict(previous) if previous is not None else None)
+        
+        new_user = previous is None and cursor.execute(
+            'SELECT 1 FROM emotion_labels WHERE username = ? LIMIT 1', (label.username,)
+        ).fetchone() is None
+        
+        if previous is not None:
+            for field in LABEL_VALUE_FIELDS:
+                if field not in fields:
+                    setattr(label, field, previous[field])
+            label.update_completeness()
+        was_complete = bool(previous and previous['va_complete'] and previous['discrete_complete'])
+        is_complete = bool(label.va_complete and label.discrete_complete)
+        
+        # 插入，或只更新提交的字段（updated_at 在语句中设置，不再由触发器额外执行一次 UPDATE）
+        updates = ', '.join(f'{column} = excluded.{column}' for column in (
+            *fields, 'audio_duration', 'va_complete', 'discrete_complete', 'timestamp', 'updated_at'
+        ))
+        cursor.execute(f'''
+            INSERT INTO emotion_labels (
+                audio_file, speaker, speaker_group, username, v_value, a_value,
+                emotion_type, discrete_emotion, patient_status,
+                audio_duration, va_complete, discrete_complete,
+                timestamp, updated_at, version
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP, 1)
+            ON CONFLICT(audio_file, speaker, username) DO UPDATE SET {updates},
+                version = emotion_labels.version + 1
+        ''', (
+            label.audio_file,
+            speaker,
+            get_speaker_group(speaker),
+            label.username,
+            label.v_value,
+            label.a_value,
+            label.emotion_type,
+            label.discrete_emotion,
+            label.patient_status,
+            label.audio_duration,
+            label.va_complete,
+            label.discrete_complete,
+            label.timestamp
+        ))
+        
+        # 完成状态变化时在同一事务中更新分组进度
+        complete_delta = int(is_complete) - int(was_complete)
+        group_progress_delta = 0
+        if track_progress and complete_delta and group_manager.apply_progress_delta(
+            cursor, label.username, get_speaker_group(speaker), complete_delta
+        ):
+            group_progress_delta = complete_delta
+        
+        emotion_logger.log_database_operation(
+            operation="UPSERT",
+            table="emotion_labels",
+            username=label.username,
+            details={
+                "audio_file": label.audio_file,
+                "speaker": speaker,
+                "fields": fields,
+                "version": current_version + 1,
+                "v_value": label.v_value,
+                "a_value": label.a_value,
+                "emotion_type": label.emotion_type,
+                "discrete_emotion": label.discrete_emotion
+            },
+            success=True
+        )
+        
+        return current_version + 1, {
+            'username': label.username,
+            'speaker': speaker,
+            'audio_file': label.audio_file,
+            'version': current_version + 1,
+            'timestamp': label.timestamp,
+            'is_new': previous is None,
+            'new_user': new_user,
+            # 今日标注数按 timestamp 的日期统计，每次保存都会刷新 timestamp
+            'new_today': previous is None or not str(previous['timestamp']).startswith(label.timestamp[:10]),
+            'complete_delta': complete_delta,
+            'group_progress_delta': group_progress_delta
+        }
+    
     @staticmethod
     def save_label(label_data, speaker, audio_file_path):
         """
         保存标注数据到数据库
         
         Args:
-            label_data: 标注数据字典
+            label_data: 标注数据字典（可带 version：读取时的行版本，用于检测并发修改）
             speaker: 说话人
             audio_file_path: 音频文件路径
-            
+        
         Returns:
-            bool: 保存是否成功
+            int: 保存后的行版本，保存失败时返回None
+        
+        Raises:
+            LabelConflictError: 提交的版本与数据库中的版本不一致
         """
         conn = None
         try:
-            from utils.audio_utils import get_audio_duration
-            
-            # 获取音频时长
-            audio_duration = get_audio_duration(audio_file_path)
-            
-            # 创建标注对象
-            label = EmotionLabel(
-                audio_file=label_data.get("audio_file"),
-                v_value=label_data.get("v_value"),
-                a_value=label_data.get("a_value"),
-                emotion_type=label_data.get("emotion_type"),
-                discrete_emotion=label_data.get("discrete_emotion"),
-                username=label_data.get("username"),
-                patient_status=label_data.get("patient_status"),
-                audio_duration=audio_duration
-            )
+            label, fields, expected_version = DatabaseService._build_label(label_data, audio_file_path)
             
             conn = DatabaseService.get_connection()
+            group_manager = get_group_assignment_manager()
+            track_progress = group_manager.attach(conn)
             cursor = conn.cursor()
             
-            # 插入或更新数据
-            cursor.execute('''
-                INSERT OR REPLACE INTO emotion_labels (
-                    audio_file, speaker, username, v_value, a_value,
-                    emotion_type, discrete_emotion, patient_status,
-                    audio_duration, play_count, va_complete, discrete_complete,
-                    timestamp
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                label.audio_file,
-                speaker,
-                label.username,
-                label.v_value,
-                label.a_value,
-                label.emotion_type,
-                label.discrete_emotion,
-                label.patient_status,
-                label.audio_duration,
-                label.play_count,
-                label.va_complete,
-                label.discrete_complete,
-                label.timestamp
-            ))
-            
-            emotion_logger.log_database_operation(
-                operation="INSERT OR REPLACE",
-                table="emotion_labels",
-                username=label.username,
-                details={
-                    "audio_file": label.audio_file,
-                    "speaker": speaker,
-                    "v_value": label.v_value,
-                    "a_value": label.a_value,
-                    "emotion_type": label.emotion_type,
-                    "discrete_emotion": label.discrete_emotion
-                },
-                success=True
+            # 立即获取写锁，保证读取旧的完成状态与写入之间没有其他写入
+            cursor.execute('BEGIN IMMEDIATE')
+            version, event = DatabaseService._write_label(
+                cursor, label, fields, speaker, group_manager, track_progress, expected_version
             )
-            
             conn.commit()
             conn.close()
-            return True
             
+            if event is not None:
+                bump_version('labels', label.username)
+                
+                # 通知管理后台（SSE）
+                get_change_bus().publish('label_saved', event)
+            return version
+        
+        except LabelConflictError:
+            raise
         except Exception as e:
             emotion_logger.log_database_operation(
-                operation="INSERT OR REPLACE",
+                operation="UPSERT",
                 table="emotion_labels",
                 username=label_data.get("username", "unknown"),
                 details={"audio_file": label_data.get("audio_file"), "error": str(e)},
                 success=False
             )
             print(f"保存标注数据时出错: {e}")
-            return False
+            return None
         finally:
             if conn:
                 conn.close()
     
+    @staticmethod
+    def save_labels(entries):
+        """
+        批量保存标注数据，所有条目在一个事务中写入
+        
+        每条在各自的保存点中写入，单条失败（包括版本冲突）只回滚该条；音频时长在获取写锁之前解析
+        
+        Args:
+            entries: [(标注数据字典, 说话人, 音频文件路径), ...]
+        
+        Returns:
+            list: 与 entries 一一对应的结果：成功为 {'version': 保存后的版本}，
+                  失败为 {'error': 错误信息, 'retryable': 重试是否可能成功}（数据库锁定等暂时性错误可重试），
+                  版本冲突时另有 'conflict': True 和 'current': 当前记录
+        """
+        outcomes = [None] * len(entries)
+        labels = []
+        for index, (label_data, speaker, audio_file_path) in enumerate(entries):
+            try:
+                labels.append((index, *DatabaseService._build_label(label_data, audio_file_path), speaker))
+            except Exception as e:
+                outcomes[index] = {'error': str(e), 'retryable': False}
+        if not labels:
+            return outcomes
+        
+        conn = DatabaseService.get_connection()
+        try:
+            group_manager = get_group_assignment_manager()
+            track_progress = group_manager.attach(conn)
+            cursor = conn.cursor()
+            
+            events = []
+            cursor.execute('BEGIN IMMEDIATE')
+            for index, label, fields, expected_version, speaker in labels:
+                cursor.execute('SAVEPOINT label_item')
+                try:
+                    version, event = DatabaseService._write_label(
+                        cursor, label, fields, speaker, group_manager, track_progress, expected_version
+                    )
+                    cursor.execute('RELEASE SAVEPOINT label_item')
+                    outcomes[index] = {'version': version}
+                    if event is not None:
+                        events.append(event)
+                except LabelConflictError as e:
+                    cursor.execute('RELEASE SAVEPOINT label_item')
+                    outcomes[index] = {'error': str(e), 'retryable': False, 'conflict': True, 'current': e.current}
+                except sqlite3.Error as e:
+                    cursor.execute('ROLLBACK TO SAVEPOINT label_item')
+                    cursor.execute('RELEASE SAVEPOINT label_item')
+                    outcomes[index] = {'error': str(e), 'retryable': True}
+                    emotion_logger.log_database_operation(
+                        operation="UPSERT",
+                        table="emotion_labels",
+                        username=label.username,
+                        details={"audio_file": label.audio_file, "error": str(e)},
+                        success=False
+                    )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        
+        if events:
+            bump_version('labels', *{event['username'] for event in events})
+            change_bus = get_change_bus()
+            for event in events:
+                change_bus.publish('label_saved', event)
+        return outcomes
+    
     @staticmethod
     def get_label(username, speaker, filename):
         """
@@ -207,7 +464,7 @@ class DatabaseService:
             username: 用户名
             speaker: 说话人
             filename: 文件名
-            
+        
         Returns:
             dict: 标注数据字典，如果不存在则返回None
         """
@@ -217,13 +474,12 @@ class DatabaseService:
             cursor = conn.cursor()
             
             # 处理分组说话人
-            import re
-            if re.match(r'spk\d+$', speaker):
-                # 查询所有以该speaker开头的数据
+            if is_group_speaker(speaker):
+                # 按说话人分组精确匹配
                 cursor.execute('''
                     SELECT * FROM emotion_labels 
-                    WHERE username = ? AND speaker LIKE ? AND audio_file = ?
-                ''', (username, f"{speaker}-%", filename))
+                    WHERE username = ? AND speaker_group = ? AND audio_file = ?
+                ''', (username, speaker, filename))
             else:
                 cursor.execute('''
                     SELECT * FROM emotion_labels 
@@ -234,13 +490,8 @@ class DatabaseService:
             conn.close()
             
             if row:
-                # 将数据库行转换为字典
-                label_dict = dict(row)
-                
-                # 计算标注完整性
-                from models.emotion_model import calculate_annotation_completeness
-                completeness = calculate_annotation_completeness(label_dict)
-                label_dict['annotation_completeness'] = completeness
+                # 将数据库行转换为字典（附带标注完整性）
+                label_dict = DatabaseService._label_to_dict(row)
                 
                 emotion_logger.log_database_operation(
                     operation="SELECT",
@@ -261,7 +512,7 @@ class DatabaseService:
             )
             
             return None
-            
+        
         except Exception as e:
             emotion_logger.log_database_operation(
                 operation="SELECT",
@@ -277,31 +528,33 @@ class DatabaseService:
                 conn.close()
     
     @staticmethod
-    def get_labeled_files(username, speaker):
+    def get_labeled_files(username, speaker, conn=None):
         """
         获取已标注的文件列表
         
         Args:
             username: 用户名
             speaker: 说话人
-            
+            conn: 可选的共享数据库连接，不提供时新建连接
+        
         Returns:
             tuple: (已标注文件集合, 标注完整性字典)
         """
+        own_connection = conn is None
         try:
-            conn = DatabaseService.get_connection()
+            if own_connection:
+                conn = DatabaseService.get_connection()
             cursor = conn.cursor()
             
             # 处理分组说话人
-            import re
-            if re.match(r'spk\d+$', speaker):
-                # 查询所有以该speaker开头的数据
+            if is_group_speaker(speaker):
+                # 按说话人分组精确匹配
                 cursor.execute('''
                     SELECT audio_file, v_value, a_value, emotion_type, 
                            discrete_emotion, patient_status, va_complete, discrete_complete
                     FROM emotion_labels 
-                    WHERE username = ? AND speaker LIKE ?
-                ''', (username, f"{speaker}-%"))
+                    WHERE username = ? AND speaker_group = ?
+                ''', (username, speaker))
             else:
                 cursor.execute('''
                     SELECT audio_file, v_value, a_value, emotion_type, 
@@ -311,7 +564,8 @@ class DatabaseService:
                 ''', (username, speaker))
             
             rows = cursor.fetchall()
-            conn.close()
+            if own_connection:
+                conn.close()
             
             labeled_files = set()
             annotation_completeness = {}
@@ -327,76 +581,81 @@ class DatabaseService:
                 annotation_completeness[filename] = completeness
             
             return labeled_files, annotation_completeness
-            
+        
         except Exception as e:
             print(f"获取已标注文件列表时出错: {e}")
             return set(), {}
     
     @staticmethod
-    def update_play_count(username, speaker, filename):
+    def apply_play_count_batch(batch_id, increments):
         """
-        更新音频播放次数
+        批量累加播放次数（单个事务）
+        
+        每条更新都是原子的 play_count = play_count + n；批次ID与更新在同一事务中记录，
+        同一批次重复提交（如崩溃恢复时重放溢出文件）不会重复累加
         
         Args:
-            username: 用户名
-            speaker: 说话人
-            filename: 文件名
-            
+            batch_id: 批次ID
+            increments: [(username, speaker, filename, n), ...]
+        
         Returns:
-            int: 更新后的播放次数
+            bool: 本次是否实际写入（批次已提交过时返回False）
         """
+        conn = DatabaseService.get_connection()
         try:
-            conn = DatabaseService.get_connection()
             cursor = conn.cursor()
-            
-            # 处理分组说话人
-            import re
-            if re.match(r'spk\d+$', speaker):
-                # 查找匹配的记录
-                cursor.execute('''
-                    SELECT speaker, play_count FROM emotion_labels 
-                    WHERE username = ? AND audio_file = ? AND speaker LIKE ?
-                ''', (username, filename, f"{speaker}-%"))
-                
-                row = cursor.fetchone()
-                if row:
-                    actual_speaker = row['speaker']
-                    new_count = row['play_count'] + 1
-                    
-                    cursor.execute('''
-                        UPDATE emotion_labels 
-                        SET play_count = ? 
-                        WHERE username = ? AND speaker = ? AND audio_file = ?
-                    ''', (new_count, username, actual_speaker, filename))
-                    
-                    conn.commit()
-                    conn.close()
-                    return new_count
-            else:
-                cursor.execute('''
+            # 立即获取写锁，保证"检查批次是否已提交"与写入之间没有其他进程插入
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute('SELECT 1 FROM play_count_batches WHERE batch_id = ?', (batch_id,))
+            if cursor.fetchone():
+                conn.rollback()
+                return False
+            
+            grouped = []
+            exact = []
+            for username, speaker, filename, n in increments:
+                if is_group_speaker(speaker):
+                    # 分组说话人：只累加第一条匹配记录，与查询时的行为一致
+                    grouped.append((n, username, speaker, filename))
+                else:
+                    exact.append((n, username, speaker, filename))
+            
+            if exact:
+                cursor.executemany('''
                     UPDATE emotion_labels 
-                    SET play_count = play_count + 1 
+                    SET play_count = play_count + ? 
                     WHERE username = ? AND speaker = ? AND audio_file = ?
-                ''', (username, speaker, filename))
-                
-                if cursor.rowcount > 0:
-                    # 获取更新后的播放次数
-                    cursor.execute('''
-                        SELECT play_count FROM emotion_labels 
-                        WHERE username = ? AND speaker = ? AND audio_file = ?
-                    ''', (username, speaker, filename))
-                    
-                    row = cursor.fetchone()
-                    conn.commit()
-                    conn.close()
-                    return row['play_count'] if row else 1
+                ''', exact)
             
-            conn.close()
-            return 0
+            if grouped:
+                cursor.executemany('''
+                    UPDATE emotion_labels 
+                    SET play_count = play_count + ? 
+                    WHERE id = (
+                        SELECT id FROM emotion_labels 
+                        WHERE username = ? AND speaker_group = ? AND audio_file = ? 
+                        LIMIT 1
+                    )
+                ''', grouped)
+            
+            cursor.execute('INSERT INTO play_count_batches (batch_id) VALUES (?)', (batch_id,))
+            # 批次记录只用于防止重放，保留一周足够
+            cursor.execute("DELETE FROM play_count_batches WHERE applied_at < datetime('now', '-7 days')")
+            conn.commit()
+            bump_version('play_counts', *{increment[0] for increment in increments})
             
-        except Exception as e:
-            print(f"更新播放次数时出错: {e}")
-            return 0
+            emotion_logger.log_database_operation(
+                operation="UPDATE",
+                table="emotion_labels",
+                details={"batch_id": batch_id, "play_count_updates": len(increments)},
+                success=True
+            )
+            return True
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
     
     @staticmethod
     def get_play_count(username, speaker, filename):
@@ -407,7 +666,7 @@ class DatabaseService:
             username: 用户名
             speaker: 说话人
             filename: 文件名
-            
+        
         Returns:
             int: 播放次数
         """
@@ -416,12 +675,11 @@ class DatabaseService:
             cursor = conn.cursor()
             
             # 处理分组说话人
-            import re
-            if re.match(r'spk\d+$', speaker):
+            if is_group_speaker(speaker):
                 cursor.execute('''
                     SELECT play_count FROM emotion_labels 
-                    WHERE username = ? AND audio_file = ? AND speaker LIKE ?
-                ''', (username, filename, f"{speaker}-%"))
+                    WHERE username = ? AND speaker_group = ? AND audio_file = ?
+                ''', (username, speaker, filename))
             else:
                 cursor.execute('''
                     SELECT play_count FROM emotion_labels 
@@ -432,7 +690,7 @@ class DatabaseService:
             conn.close()
             
             return row['play_count'] if row else 0
-            
+        
         except Exception as e:
             print(f"获取播放次数时出错: {e}")
             return 0
@@ -444,7 +702,7 @@ class DatabaseService:
         
         Args:
             username: 用户名
-            
+        
         Returns:
             dict: 统计信息
         """
@@ -490,7 +748,7 @@ class DatabaseService:
                 'discrete_complete_count': discrete_complete_count,
                 'speaker_stats': [dict(row) for row in speaker_stats]
             }
-            
+        
         except Exception as e:
             print(f"获取用户统计信息时出错: {e}")
             return {
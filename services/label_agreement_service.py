@@ -0,0 +1,445 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+正式标注的标注者间一致性分析
+把 emotion_labels 按 (audio_file, speaker) 跨用户展开为数组，计算每个文件的分歧程度、
+每个用户相对其他标注者的偏差与可靠性，结果写入汇总表供管理后台读取。
+增量运行：只重新计算上次运行后标注有变化（或被删除）的文件。
+每批文件单独提交，分析期间不会长时间占用数据库写锁
+"""
+
+import json
+import warnings
+import threading
+from datetime import datetime
+import numpy as np
+from services.database_service import DatabaseService
+from services.agreement_service import CATEGORICAL_FIELDS
+from services.data_version import bump_version
+from utils.logger import emotion_logger
+
+V_RANGE = 4.0  # V 值取值范围 -2 ~ 2
+A_RANGE = 4.0  # A 值取值范围 1 ~ 5
+BATCH_SIZE = 500  # 每批处理的文件数
+
+# 本进程中正在运行的后台分析
+_run_lock = threading.Lock()
+
+def init_agreement_tables(conn=None):
+    """创建一致性汇总表及增量扫描所需的索引（应用启动时及每次分析前执行）"""
+    if conn is None:
+        conn = DatabaseService.get_connection()
+        try:
+            return init_agreement_tables(conn)
+        finally:
+            conn.close()
+    
+    cursor = conn.cursor()
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS label_agreement_files (
+            audio_file TEXT NOT NULL,
+            speaker TEXT NOT NULL,
+            annotators INTEGER NOT NULL,
+            v_mean REAL,
+            v_std REAL,
+            a_mean REAL,
+            a_std REAL,
+            emotion_type_agreement REAL,
+            discrete_emotion_agreement REAL,
+            patient_status_agreement REAL,
+            disagreement REAL,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (audio_file, speaker)
+        )
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_agreement_files_disagreement
+        ON label_agreement_files(disagreement)
+    ''')
+    # 每个用户在每个文件上相对其他标注者的偏差，用户汇总由此聚合
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS label_agreement_contributions (
+            audio_file TEXT NOT NULL,
+            speaker TEXT NOT NULL,
+            username TEXT NOT NULL,
+            v_deviation REAL,
+            a_deviation REAL,
+            categorical_agreement REAL,
+            PRIMARY KEY (audio_file, speaker, username)
+        )
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_agreement_contributions_user
+        ON label_agreement_contributions(username)
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS label_agreement_users (
+            username TEXT PRIMARY KEY,
+            files_compared INTEGER NOT NULL,
+            v_bias REAL,
+            a_bias REAL,
+            v_mae REAL,
+            a_mae REAL,
+            categorical_agreement REAL,
+            reliability REAL,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS label_agreement_state (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_emotion_labels_updated_at
+        ON emotion_labels(updated_at)
+    ''')
+    # 删除的标注不会出现在按 updated_at 的增量扫描中，由触发器记录到这里，下次分析时重新计算
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS label_agreement_deleted (
+            audio_file TEXT NOT NULL,
+            speaker TEXT NOT NULL,
+            PRIMARY KEY (audio_file, speaker)
+        )
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS label_agreement_track_delete
+        AFTER DELETE ON emotion_labels
+        BEGIN
+            INSERT OR IGNORE INTO label_agreement_deleted (audio_file, speaker)
+            VALUES (OLD.audio_file, OLD.speaker);
+        END
+    ''')
+    conn.commit()
+
+def _pairwise_agreement(codes):
+    """
+    每个文件上类别标注的两两一致率，以及每个标注者与其他标注者的一致率
+    
+    Args:
+        codes: 形状为 (文件, 用户) 的类别编码，-1 表示缺失
+    
+    Returns:
+        tuple: (每个文件的一致率 (F,), 每个标注者的一致率 (F, U))，无法计算处为 NaN
+    """
+    n_files = codes.shape[0]
+    valid = codes >= 0
+    n_categories = int(codes.max()) + 1 if valid.any() else 0
+    counts = np.zeros((n_files, max(n_categories, 1)))
+    file_index = np.broadcast_to(np.arange(n_files)[:, np.newaxis], codes.shape)
+    np.add.at(counts, (file_index[valid], codes[valid]), 1)
+    
+    raters = counts.sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        file_agreement = np.where(
+            raters >= 2, ((counts ** 2).sum(axis=1) - raters) / (raters * (raters - 1)), np.nan
+        )
+        same_label = np.take_along_axis(counts, np.where(valid, codes, 0), axis=1) - 1
+        user_agreement = np.where(valid & (raters[:, np.newaxis] >= 2),
+                                  same_label / (raters[:, np.newaxis] - 1), np.nan)
+    return file_agreement, user_agreement
+
+def _leave_one_out_deviation(values):
+    """每个标注者的值与同一文件其他标注者均值之差，(F, U)，其他标注者不足时为 NaN"""
+    present = ~np.isnan(values)
+    counts = present.sum(axis=1, keepdims=True)
+    sums = np.nansum(values, axis=1, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        others_mean = (sums - np.where(present, values, 0)) / (counts - 1)
+    return np.where(present & (counts >= 2), values - others_mean, np.nan)
+
+def _nullable(value):
+    """NaN 转为 None 以写入数据库"""
+    return None if value is None or np.isnan(value) else float(value)
+
+class LabelAgreementAnalyzer:
+    """正式标注一致性分析任务"""
+    
+    def run(self, full=False):
+        """
+        执行一次分析
+        
+        每批文件在单独的事务中提交，批次之间其他连接可以写入标注；
+        水位线在最后一批之后才推进，中途失败时下次运行会重新处理（结果幂等）
+        
+        Args:
+            full (bool): 是否全量重算（默认只处理上次运行后有变化的文件）
+        
+        Returns:
+            dict: 运行结果（处理的文件数、更新的用户数）
+        """
+        conn = DatabaseService.get_connection()
+        try:
+            init_agreement_tables(conn)
+            cursor = conn.cursor()
+            
+            watermark = None
+            if not full:
+                row = cursor.execute(
+                    "SELECT value FROM label_agreement_state WHERE key = 'labels_updated_at'"
+                ).fetchone()
+                watermark = row[0] if row else None
+            
+            # 先读取新的水位线，之后发生的写入在下次运行时处理；
+            # 同一秒内的写入可能发生在上次运行之后，使用 >= 重新处理边界上的文件（结果幂等）
+            new_watermark = cursor.execute('SELECT MAX(updated_at) FROM emotion_labels').fetchone()[0]
+            affected_users = set()
+            if watermark is None:
+                # 全量：汇总表中已有的文件和用户一并重算，标注已不存在的随之删除
+                changed = cursor.execute('''
+                    SELECT audio_file, speaker FROM emotion_labels
+                    UNION SELECT audio_file, speaker FROM label_agreement_files
+                    UNION SELECT audio_file, speaker FROM label_agreement_contributions
+                    UNION SELECT audio_file, speaker FROM label_agreement_deleted
+                ''').fetchall()
+                affected_users = {row[0] for row in cursor.execute('SELECT username FROM label_agreement_users')}
+            else:
+                changed = cursor.execute('''
+                    SELECT audio_file, speaker FROM emotion_labels WHERE updated_at >= ?
+                    UNION SELECT audio_file, speaker FROM label_agreement_deleted
+                ''', (watermark,)).fetchall()
+            
+            changed = [tuple(row) for row in changed]
+            for start in range(0, len(changed), BATCH_SIZE):
+                cursor.execute('BEGIN IMMEDIATE')
+                try:
+                    affected_users |= self._process_batch(conn, changed[start:start + BATCH_SIZE])
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+            
+            result = {'files_processed': len(changed), 'users_updated': len(affected_users), 'full': watermark is None}
+            cursor.execute('BEGIN IMMEDIATE')
+            try:
+                self._update_users(conn, affected_users)
+                if new_watermark is not None:
+                    cursor.execute('''
+                        INSERT OR REPLACE INTO label_agreement_state (key, value)
+                        VALUES ('labels_updated_at', ?)
+                    ''', (new_watermark,))
+                # 后台运行时管理后台据此判断分析是否已完成（可能由其他进程执行）
+                cursor.execute('''
+                    INSERT OR REPLACE INTO label_agreement_state (key, value)
+                    VALUES ('last_run', ?)
+                ''', (json.dumps({**result, 'finished_at': datetime.now().isoformat()}),))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            bump_version('agreement')
+            
+            emotion_logger.log_system_event("标注一致性分析完成", result)
+            return result
+        finally:
+            conn.close()
+    
+    def _process_batch(self, conn, files):
+        """重新计算一批文件的一致性，返回受影响的用户"""
+        cursor = conn.cursor()
+        cursor.execute('CREATE TEMP TABLE IF NOT EXISTS agreement_batch (audio_file TEXT, speaker TEXT)')
+        cursor.execute('DELETE FROM agreement_batch')
+        cursor.executemany('INSERT INTO agreement_batch (audio_file, speaker) VALUES (?, ?)', files)
+        
+        affected_users = {row[0] for row in cursor.execute('''
+            SELECT DISTINCT c.username FROM label_agreement_contributions c
+            JOIN agreement_batch b ON c.audio_file = b.audio_file AND c.speaker = b.speaker
+        ''')}
+        cursor.execute('''
+            DELETE FROM label_agreement_contributions
+            WHERE (audio_file, speaker) IN (SELECT audio_file, speaker FROM agreement_batch)
+        ''')
+        cursor.execute('''
+            DELETE FROM label_agreement_files
+            WHERE (audio_file, speaker) IN (SELECT audio_file, speaker FROM agreement_batch)
+        ''')
+        cursor.execute('''
+            DELETE FROM label_agreement_deleted
+            WHERE (audio_file, speaker) IN (SELECT audio_file, speaker FROM agreement_batch)
+        ''')
+        
+        rows = cursor.execute('''
+            SELECT e.audio_file, e.speaker, e.username, e.v_value, e.a_value,
+                   e.emotion_type, e.discrete_emotion, e.patient_status
+            FROM emotion_labels e
+            JOIN agreement_batch b ON e.audio_file = b.audio_file AND e.speaker = b.speaker
+        ''').fetchall()
+        if not rows:
+            return affected_users
+        
+        # 展开为 (文件, 用户) 数组
+        file_keys = sorted({(row[0], row[1]) for row in rows})
+        users = sorted({row[2] for row in rows})
+        file_index = {key: i for i, key in enumerate(file_keys)}
+        user_index = {name: i for i, name in enumerate(users)}
+        f = np.array([file_index[(row[0], row[1])] for row in rows], dtype=np.int64)
+        u = np.array([user_index[row[2]] for row in rows], dtype=np.int64)
+        shape = (len(file_keys), len(users))
+        
+        values = {}
+        for position, field in ((3, 'v_value'), (4, 'a_value')):
+            values[field] = np.full(shape, np.nan)
+            values[field][f, u] = [np.nan if row[position] is None else float(row[position]) for row in rows]
+        
+        file_agreement = {}
+        user_agreement = []
+        for position, field in zip((5, 6, 7), CATEGORICAL_FIELDS):
+            vocabulary = {label: i for i, label in enumerate(sorted({row[position] for row in rows if row[position] is not None}))}
+            codes = np.full(shape, -1, dtype=np.int64)
+            codes[f, u] = [vocabulary.get(row[position], -1) for row in rows]
+            file_agreement[field], per_user = _pairwise_agreement(codes)
+            user_agreement.append(per_user)
+        
+        annotators = np.zeros(shape, dtype=bool)
+        annotators[f, u] = True
+        annotator_counts = annotators.sum(axis=1)
+        
+        # 只有一个标注者或全部缺失的文件，统计量为 NaN（写入时转为 NULL）
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            v_mean = np.nanmean(values['v_value'], axis=1)
+            v_std = np.nanstd(values['v_value'], axis=1)
+            a_mean = np.nanmean(values['a_value'], axis=1)
+            a_std = np.nanstd(values['a_value'], axis=1)
+            # 分歧程度：V/A 标准差（按取值范围归一化）与类别不一致率的平均
+            disagreement = np.nanmean(np.stack([
+                v_std / V_RANGE,
+                a_std / A_RANGE,
+                1 - file_agreement['emotion_type'],
+                1 - file_agreement['discrete_emotion'],
+                1 - file_agreement['patient_status'],
+            ]), axis=0)
+            categorical = np.nanmean(np.stack(user_agreement), axis=0)
+        
+        multi = annotator_counts >= 2
+        cursor.executemany('''
+            INSERT INTO label_agreement_files (
+                audio_file, speaker, annotators, v_mean, v_std, a_mean, a_std,
+                emotion_type_agreement, discrete_emotion_agreement, patient_status_agreement, disagreement
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [(
+            file_keys[i][0], file_keys[i][1], int(annotator_counts[i]),
+            _nullable(v_mean[i]), _nullable(v_std[i]), _nullable(a_mean[i]), _nullable(a_std[i]),
+            _nullable(file_agreement['emotion_type'][i]),
+            _nullable(file_agreement['discrete_emotion'][i]),
+            _nullable(file_agreement['patient_status'][i]),
+            _nullable(disagreement[i]) if multi[i] else None
+        ) for i in range(len(file_keys))])
+        
+        # 只有与其他人标注过同一文件时才计入用户偏差
+        v_deviation = _leave_one_out_deviation(values['v_value'])
+        a_deviation = _leave_one_out_deviation(values['a_value'])
+        fi, ui = np.nonzero(annotators & multi[:, np.newaxis])
+        cursor.executemany('''
+            INSERT INTO label_agreement_contributions (
+                audio_file, speaker, username, v_deviation, a_deviation, categorical_agreement
+            ) VALUES (?, ?, ?, ?, ?, ?)
+        ''', [(
+            file_keys[i][0], file_keys[i][1], users[j],
+            _nullable(v_deviation[i, j]), _nullable(a_deviation[i, j]), _nullable(categorical[i, j])
+        ) for i, j in zip(fi, ui)])
+        
+        return affected_users | {users[j] for j in set(ui.tolist())}
+    
+    def _update_users(self, conn, usernames):
+        """按用户聚合偏差，重新计算受影响用户的汇总"""
+        if not usernames:
+            return
+        cursor = conn.cursor()
+        usernames = sorted(usernames)
+        placeholders = ','.join('?' * len(usernames))
+        cursor.execute(f'DELETE FROM label_agreement_users WHERE username IN ({placeholders})', usernames)
+        
+        rows = cursor.execute(f'''
+            SELECT username, COUNT(*), AVG(v_deviation), AVG(a_deviation),
+                   AVG(ABS(v_deviation)), AVG(ABS(a_deviation)), AVG(categorical_agreement)
+            FROM label_agreement_contributions
+            WHERE username IN ({placeholders})
+            GROUP BY username
+        ''', usernames).fetchall()
+        
+        records = []
+        for username, files_compared, v_bias, a_bias, v_mae, a_mae, categorical in rows:
+            # 可靠性：V/A 与其他标注者的接近程度和类别一致率各占一半
+            components = []
+            va_errors = [error / value_range for error, value_range in ((v_mae, V_RANGE), (a_mae, A_RANGE)) if error is not None]
+            if va_errors:
+                components.append(max(0.0, 1 - sum(va_errors) / len(va_errors)))
+            if categorical is not None:
+                components.append(categorical)
+            reliability = sum(components) / len(components) if components else None
+            records.append((username, files_compared, v_bias, a_bias, v_mae, a_mae, categorical, reliability))
+        
+        cursor.executemany('''
+            INSERT INTO label_agreement_users (
+                username, files_compared, v_bias, a_bias, v_mae, a_mae, categorical_agreement, reliability
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', records)
+
+def start_analysis(full=False):
+    """
+    在后台线程中执行一次分析，请求线程立即返回
+    
+    Returns:
+        bool: 是否已启动（本进程中已有分析在运行时返回 False）
+    """
+    if not _run_lock.acquire(blocking=False):
+        return False
+    
+    def worker():
+        try:
+            LabelAgreementAnalyzer().run(full=full)
+        except Exception as e:
+            emotion_logger.log_error(e, "标注一致性分析失败")
+        finally:
+            _run_lock.release()
+    
+    threading.Thread(target=worker, name='label-agreement', daemon=True).start()
+    return True
+
+def get_analysis_status():
+    """后台分析状态：本进程是否在运行，以及最近一次完成的分析结果"""
+    conn = DatabaseService.get_connection()
+    try:
+        row = conn.execute("SELECT value FROM label_agreement_state WHERE key = 'last_run'").fetchone()
+    finally:
+        conn.close()
+    return {'running': _run_lock.locked(), 'last_run': json.loads(row[0]) if row else None}
+
+def get_user_agreement():
+    """读取每个用户的一致性汇总（按可靠性升序，最需要关注的在前）"""
+    conn = DatabaseService.get_connection()
+    try:
+        rows = conn.execute('''
+            SELECT username, files_compared, v_bias, a_bias, v_mae, a_mae,
+                   categorical_agreement, reliability, updated_at
+            FROM label_agreement_users
+            ORDER BY reliability IS NULL, reliability ASC
+        ''').fetchall()
+        last_run = conn.execute(
+            "SELECT value FROM label_agreement_state WHERE key = 'labels_updated_at'"
+        ).fetchone()
+    finally:
+        conn.close()
+    return {
+        'users': [dict(row) for row in rows],
+        'labels_updated_at': last_run[0] if last_run else None
+    }
+
+def get_disagreement_files(limit=50, offset=0):
+    """读取分歧最大的文件"""
+    conn = DatabaseService.get_connection()
+    try:
+        rows = conn.execute('''
+            SELECT * FROM label_agreement_files
+            WHERE disagreement IS NOT NULL
+            ORDER BY disagreement DESC
+            LIMIT ? OFFSET ?
+        ''', (limit, offset)).fetchall()
+        total = conn.execute(
+            'SELECT COUNT(*) FROM label_agreement_files WHERE disagreement IS NOT NULL'
+        ).fetchone()[0]
+    finally:
+        conn.close()
+    return {'files': [dict(row) for row in rows], 'total': total}
\ No newline at end of file
@@ -1,5 +1,6 @@
 import os
 from services.database_service import DatabaseService
+from services.play_count_buffer import get_play_count_buffer
 
 class LabelService:
     """标注相关服务"""
@@ -13,11 +14,18 @@ class LabelService:
     
     @staticmethod
     def save_label(label_data, speaker, audio_file_path):
-        """保存标注数据到数据库"""
+        """保存标注数据到数据库，返回保存后的行版本（版本冲突时抛出 LabelConflictError）"""
         return DatabaseService.save_label(label_data, speaker, audio_file_path)
     
 
     
+    @staticmethod
+    def save_labels(entries):
+        """批量保存标注数据（一个事务），返回每条的结果（版本或错误信息）"""
+        return DatabaseService.save_labels(entries)
+    
+
+    
     @staticmethod
     def get_label(username, speaker, filename):
         """获取标注数据"""
@@ -27,12 +35,12 @@ class LabelService:
     
     @staticmethod
     def save_play_count(username, speaker, filename):
-        """保存音频播放次数"""
-        return DatabaseService.update_play_count(username, speaker, filename)
+        """记录一次播放（先进入缓冲，由后台线程批量写入数据库）"""
+        return get_play_count_buffer().record(username, speaker, filename)
     
 
     
     @staticmethod
     def get_play_count(username, speaker, filename):
-        """获取音频播放次数"""
-        return DatabaseService.get_play_count(username, speaker, filename)
\ No newline at end of file
+        """获取音频播放次数（包含尚未写入数据库的部分）"""
+        return get_play_count_buffer().count(username, speaker, filename)
\ No newline at end of file
@@ -10,24 +10,28 @@ import json
 import random
 from datetime import datetime
 from services.database_service import DatabaseService
+from services.data_version import bump_version
 
 class OrderService:
     """排序服务类"""
     
     @staticmethod
-    def get_user_speaker_order(username, speaker_groups):
+    def get_user_speaker_order(username, speaker_groups, conn=None):
         """
         获取用户专属的说话人排序
         
         Args:
             username (str): 用户名
             speaker_groups (dict): 说话人分组字典
+            conn: 可选的共享数据库连接，不提供时新建连接
             
         Returns:
             list: 排序后的说话人列表
         """
+        own_connection = conn is None
         try:
-            conn = DatabaseService.get_connection()
+            if own_connection:
+                conn = DatabaseService.get_connection()
             cursor = conn.cursor()
             
             # 查询用户的说话人排序
@@ -66,7 +70,8 @@ class OrderService:
                 # 保存到数据库
                 OrderService._save_user_speaker_order(username, sorted_groups)
             
-            conn.close()
+            if own_connection:
+                conn.close()
             return sorted_groups
             
         except Exception as e:
@@ -103,12 +108,13 @@ class OrderService:
             
             conn.commit()
             conn.close()
+            bump_version('orders', username)
             
         except Exception as e:
             print(f"保存用户说话人排序失败: {e}")
     
     @staticmethod
-    def get_user_audio_order(speaker, username, audio_files):
+    def get_user_audio_order(speaker, username, audio_files, conn=None):
         """
         获取用户专属的音频文件排序
         
@@ -116,12 +122,15 @@ class OrderService:
             speaker (str): 说话人
             username (str): 用户名
             audio_files (list): 音频文件列表
+            conn: 可选的共享数据库连接，不提供时新建连接
             
         Returns:
             list: 排序后的音频文件列表
         """
+        own_connection = conn is None
         try:
-            conn = DatabaseService.get_connection()
+            if own_connection:
+                conn = DatabaseService.get_connection()
             cursor = conn.cursor()
             
             # 查询用户的音频文件排序
@@ -173,7 +182,8 @@ class OrderService:
                 audio_order = [os.path.basename(f) for f in sorted_files]
                 OrderService._save_user_audio_order(username, speaker, audio_order)
             
-            conn.close()
+            if own_connection:
+                conn.close()
             return sorted_files
             
         except Exception as e:
@@ -212,6 +222,7 @@ class OrderService:
             
             conn.commit()
             conn.close()
+            bump_version('orders', username)
             
         except Exception as e:
             print(f"保存用户音频排序失败: {e}")
@@ -242,6 +253,7 @@ class OrderService:
             
             conn.commit()
             conn.close()
+            bump_version('orders', username)
             
         except Exception as e:
             print(f"删除用户排序数据失败: {e}")
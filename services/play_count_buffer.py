@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+播放次数缓冲服务
+播放事件先在内存中累加，由后台线程按固定间隔批量写入数据库。
+每个事件同时追加到本进程的溢出文件（只写入操作系统缓冲，不做 fsync），
+进程崩溃后由其他进程或下次启动时重放，批次ID保证重放不会重复累加
+"""
+
+import os
+import json
+import uuid
+import atexit
+import threading
+from collections import OrderedDict
+from config import Config
+from services.database_service import DatabaseService
+from services.data_version import get_data_versions
+from utils.logger import emotion_logger
+
+SPILL_PREFIX = 'play_counts.'
+SPILL_SUFFIX = '.log'
+FLUSHING_SUFFIX = '.flushing'
+BASE_CACHE_SIZE = 10000  # 缓存的数据库播放次数条数
+
+_buffer_instance = None
+_buffer_lock = threading.Lock()
+
+def get_play_count_buffer():
+    """
+    获取当前进程的播放次数缓冲
+    
+    fork 出的子进程不能沿用父进程的缓冲（溢出文件按进程区分），按进程号重新创建
+    """
+    global _buffer_instance
+    pid = os.getpid()
+    if _buffer_instance is None or _buffer_instance.pid != pid:
+        with _buffer_lock:
+            if _buffer_instance is None or _buffer_instance.pid != pid:
+                _buffer_instance = PlayCountBuffer(
+                    Config.PLAY_COUNT_SPOOL_FOLDER,
+                    Config.PLAY_COUNT_FLUSH_INTERVAL
+                )
+    return _buffer_instance
+
+def _process_alive(pid):
+    """判断进程是否仍在运行"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def _read_spill_file(path):
+    """
+    读取溢出文件并按 (username, speaker, filename) 汇总次数
+    
+    进程崩溃时最后一行可能只写了一半，解析失败的行直接跳过
+    """
+    counts = {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    key = tuple(json.loads(line))
+                except ValueError:
+                    continue
+                if len(key) == 3:
+                    counts[key] = counts.get(key, 0) + 1
+    except FileNotFoundError:
+        return None
+    return counts
+
+def _apply_spill_file(path, batch_id):
+    """把溢出文件中的事件作为一个批次写入数据库，成功后删除文件"""
+    counts = _read_spill_file(path)
+    if counts is None:
+        return 0
+    if counts:
+        increments = [(username, speaker, filename, n) for (username, speaker, filename), n in counts.items()]
+        DatabaseService.apply_play_count_batch(batch_id, increments)
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    return sum(counts.values())
+
+def recover_spill_files(spool_folder=None):
+    """
+    重放已退出进程留下的溢出文件
+    
+    应用启动时调用，运行期间每次刷新也会顺带检查（工作进程被强制结束的情况）。
+    多个进程同时恢复时依靠 os.replace 的原子性和批次ID去重
+    
+    Args:
+        spool_folder (str): 溢出文件目录，默认为 Config.PLAY_COUNT_SPOOL_FOLDER
+    
+    Returns:
+        int: 重放的播放事件数
+    """
+    spool_folder = spool_folder or Config.PLAY_COUNT_SPOOL_FOLDER
+    try:
+        filenames = os.listdir(spool_folder)
+    except FileNotFoundError:
+        return 0
+    
+    current_pid = os.getpid()
+    recovered = 0
+    for filename in filenames:
+        if not filename.startswith(SPILL_PREFIX):
+            continue
+        
+        if filename.endswith(SPILL_SUFFIX):
+            # play_counts.<pid>.log：进程退出前未刷新的事件
+            pid_part = filename[len(SPILL_PREFIX):-len(SPILL_SUFFIX)]
+            if not pid_part.isdigit():
+                continue
+            pid = int(pid_part)
+            if pid == current_pid or _process_alive(pid):
+                continue
+            batch_id = uuid.uuid4().hex
+            path = os.path.join(spool_folder, f"{SPILL_PREFIX}{pid}.{batch_id}{FLUSHING_SUFFIX}")
+            try:
+                os.replace(os.path.join(spool_folder, filename), path)
+            except FileNotFoundError:
+                continue  # 已被其他进程接管
+        elif filename.endswith(FLUSHING_SUFFIX):
+            # play_counts.<pid>.<batch_id>.flushing：刷新过程中进程退出，数据库中可能已提交
+            parts = filename[len(SPILL_PREFIX):-len(FLUSHING_SUFFIX)].split('.')
+            if len(parts) != 2 or not parts[0].isdigit():
+                continue
+            pid, batch_id = int(parts[0]), parts[1]
+            if pid == current_pid or _process_alive(pid):
+                continue
+            path = os.path.join(spool_folder, filename)
+        else:
+            continue
+        
+        try:
+            recovered += _apply_spill_file(path, batch_id)
+        except Exception as e:
+            emotion_logger.log_error(e, f"重放播放次数溢出文件失败 - {path}")
+    
+    if recovered:
+        emotion_logger.log_system_event("播放次数溢出文件已重放", {"events": recovered})
+    return recovered
+
+class PlayCountBuffer:
+    """单个进程内的播放次数缓冲"""
+    
+    def __init__(self, spool_folder, flush_interval):
+        """
+        Args:
+            spool_folder (str): 溢出文件目录
+            flush_interval (float): 刷新间隔（秒）
+        """
+        self.spool_folder = spool_folder
+        self.flush_interval = flush_interval
+        self.pid = os.getpid()
+        self.spill_path = os.path.join(spool_folder, f"{SPILL_PREFIX}{self.pid}{SPILL_SUFFIX}")
+        
+        self._pending = {}  # (username, speaker, filename) -> 尚未写入数据库的次数
+        self._inflight = {}  # 正在写入数据库的批次中的次数
+        self._failed = []  # 写入失败、等待重试的批次: (batch_id, increments, 溢出文件路径)
+        # 数据库中的播放次数: key -> (次数, 读取时该用户的 play_counts 版本)
+        self._base = OrderedDict()
+        self._spill = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+    
+    def _ensure_started(self):
+        """首次记录事件时打开溢出文件并启动刷新线程（调用方持有 self._lock）"""
+        if self._spill is None:
+            os.makedirs(self.spool_folder, exist_ok=True)
+            self._spill = open(self.spill_path, 'a', encoding='utf-8')
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='play-count-flush', daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+    
+    def record(self, username, speaker, filename):
+        """
+        记录一次播放事件
+        
+        Args:
+            username: 用户名
+            speaker: 说话人
+            filename: 文件名
+        
+        Returns:
+            int: 包含未写入部分的当前播放次数
+        """
+        key = (username, speaker, filename)
+        with self._lock:
+            self._ensure_started()
+            self._spill.write(json.dumps(key, ensure_ascii=False) + '\n')
+            self._spill.flush()
+            self._pending[key] = self._pending.get(key, 0) + 1
+        
+        return self.count(username, speaker, filename)
+    
+    def count(self, username, speaker, filename):
+        """
+        当前播放次数：数据库中的次数加上尚未写入的部分
+        
+        数据库中的次数按 key 缓存，只在首次读取或该用户的 play_counts 版本变化
+        （其他进程写入、重置进度）时查询数据库；本进程的批次写入后直接在缓存上累加
+        """
+        key = (username, speaker, filename)
+        version = get_data_versions().get('play_counts', username)
+        with self._lock:
+            cached = self._base.get(key)
+            if cached is not None and cached[1] == version:
+                self._base.move_to_end(key)
+                return cached[0] + self._unflushed(key)
+        
+        base = DatabaseService.get_play_count(username, speaker, filename)
+        with self._lock:
+            self._base[key] = (base, version)
+            self._base.move_to_end(key)
+            while len(self._base) > BASE_CACHE_SIZE:
+                self._base.popitem(last=False)
+            return base + self._unflushed(key)
+    
+    def _unflushed(self, key):
+        """尚未写入数据库的播放次数（调用方持有 self._lock）"""
+        return self._pending.get(key, 0) + self._inflight.get(key, 0)
+    
+    def unflushed_count(self, username, speaker, filename):
+        """尚未写入数据库的播放次数"""
+        with self._lock:
+            return self._unflushed((username, speaker, filename))
+    
+    def flush(self):
+        """
+        把缓冲中的事件作为一个批次写入数据库
+        
+        Returns:
+            int: 本次写入的播放事件数
+        """
+        with self._flush_lock:
+            self._retry_failed()
+            
+            with self._lock:
+                if not self._pending:
+                    return 0
+                batch = self._pending
+                self._pending = {}
+                for key, n in batch.items():
+                    self._inflight[key] = self._inflight.get(key, 0) + n
+                
+                # 换出当前溢出文件，之后的事件写入新文件
+                batch_id = uuid.uuid4().hex
+                flushing_path = os.path.join(
+                    self.spool_folder, f"{SPILL_PREFIX}{self.pid}.{batch_id}{FLUSHING_SUFFIX}"
+                )
+                self._spill.close()
+                os.replace(self.spill_path, flushing_path)
+                self._spill = open(self.spill_path, 'a', encoding='utf-8')
+            
+            increments = [(username, speaker, filename, n) for (username, speaker, filename), n in batch.items()]
+            return self._apply(batch_id, increments, flushing_path)
+    
+    def _apply(self, batch_id, increments, flushing_path):
+        """写入一个批次，失败时保留待重试（同一批次ID重试不会重复累加）"""
+        versions = get_data_versions()
+        before = {username: versions.get('play_counts', username) for username, _, _, _ in increments}
+        try:
+            DatabaseService.apply_play_count_batch(batch_id, increments)
+        except Exception as e:
+            emotion_logger.log_error(e, f"批量写入播放次数失败 - {batch_id}")
+            self._failed.append((batch_id, increments, flushing_path))
+            return 0
+        after = {username: versions.get('play_counts', username) for username in before}
+        
+        with self._lock:
+            for username, speaker, filename, n in increments:
+                key = (username, speaker, filename)
+                remaining = self._inflight.get(key, 0) - n
+                if remaining > 0:
+                    self._inflight[key] = remaining
+                else:
+                    self._inflight.pop(key, None)
+                
+                # 期间只有本批次改变了该用户的版本时，在缓存上累加；否则下次读取时重新查询
+                cached = self._base.get(key)
+                if cached is None:
+                    continue
+                if cached[1] == before[username] and after[username] == before[username] + 1:
+                    self._base[key] = (cached[0] + n, after[username])
+                else:
+                    del self._base[key]
+        
+        try:
+            os.remove(flushing_path)
+        except FileNotFoundError:
+            pass
+        return sum(n for _, _, _, n in increments)
+    
+    def _retry_failed(self):
+        """重试之前写入失败的批次"""
+        failed = self._failed
+        self._failed = []
+        for batch_id, increments, flushing_path in failed:
+            self._apply(batch_id, increments, flushing_path)
+    
+    def _run(self):
+        """后台刷新线程"""
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+                recover_spill_files(self.spool_folder)
+            except Exception as e:
+                emotion_logger.log_error(e, "刷新播放次数缓冲失败")
+    
+    def close(self):
+        """停止刷新线程并写入剩余事件（进程退出时调用）"""
+        self._stop.set()
+        if os.getpid() != self.pid:
+            return
+        try:
+            self.flush()
+        except Exception as e:
+            emotion_logger.log_error(e, "退出时刷新播放次数缓冲失败")
+        with self._lock:
+            if self._spill is not None and not self._pending:
+                self._spill.close()
+                self._spill = None
+                if os.path.exists(self.spill_path) and os.path.getsize(self.spill_path) == 0:
+                    os.remove(self.spill_path)
\ No newline at end of file
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+能力测试题库
+启动时扫描一次测试音频目录，预先解析文件名中的正确答案，并建立文件名到所在目录的索引。
+每次请求只做 O(k) 的随机抽题；目录修改时间变化时自动重新加载
+"""
+
+import os
+import random
+import threading
+from config import Config
+from utils.logger import emotion_logger
+
+# 子目录 -> 题目类型
+QUESTION_FOLDERS = (
+    ('discrete_emotions', 'discrete'),
+    ('potency', 'potency'),  # 效价测试（V值）
+    ('wake_up', 'arousal'),  # 唤醒测试（A值）
+)
+
+_bank_instance = None
+_bank_lock = threading.Lock()
+
+def get_test_question_bank():
+    """获取进程内共享的能力测试题库"""
+    global _bank_instance
+    if _bank_instance is None:
+        with _bank_lock:
+            if _bank_instance is None:
+                _bank_instance = TestQuestionBank(Config.TEST_AUDIO_FOLDER)
+    return _bank_instance
+
+def parse_question(folder, question_type, filename):
+    """
+    从文件名解析题目及正确答案
+    
+    例如: 愤怒-2.wav -> 愤怒, V负1-2.wav -> -1.0, V0-2.wav -> 0.0, A2-1.wav -> 2.0
+    
+    Returns:
+        dict: 题目，文件名不符合规则时返回None
+    """
+    label_part = filename.split('-')[0]
+    
+    if question_type == 'discrete':
+        if not (filename.endswith('.wav') or filename.endswith('.MP3')):
+            return None
+        correct_answer = label_part
+    elif question_type == 'potency':
+        if not filename.endswith('.wav') or not label_part.startswith('V'):
+            return None
+        if '负' in label_part:
+            correct_answer = -float(label_part.replace('V负', ''))  # V负1 -> -1
+        else:
+            correct_answer = float(label_part[1:])  # V0 -> 0, V1 -> 1, etc.
+    else:
+        if not filename.endswith('.wav') or not label_part.startswith('A'):
+            return None
+        correct_answer = float(label_part[1:])  # A2 -> 2, A1 -> 1, etc.
+    
+    return {
+        'filename': filename,
+        'type': question_type,
+        'correct_answer': correct_answer,
+        'folder': folder
+    }
+
+class TestQuestionBank:
+    """能力测试题目索引"""
+    
+    def __init__(self, root):
+        """
+        Args:
+            root (str): 测试音频根目录（包含 discrete_emotions / potency / wake_up 子目录）
+        """
+        self.root = os.path.abspath(root)
+        self._lock = threading.Lock()
+        self._mtimes = None
+        self._questions = []
+        self._by_type = {}
+        self._paths = {}
+    
+    def _folder_mtimes(self):
+        """各子目录的修改时间（不存在为None），作为是否需要重新加载的依据"""
+        mtimes = []
+        for folder, _ in QUESTION_FOLDERS:
+            try:
+                mtimes.append(os.stat(os.path.join(self.root, folder)).st_mtime)
+            except FileNotFoundError:
+                mtimes.append(None)
+        return tuple(mtimes)
+    
+    def _ensure_loaded(self):
+        mtimes = self._folder_mtimes()
+        if mtimes == self._mtimes:
+            return
+        with self._lock:
+            if mtimes != self._mtimes:
+                self._load()
+                self._mtimes = mtimes
+    
+    def _load(self):
+        """扫描子目录，解析题目并建立文件名索引（调用方持有 self._lock）"""
+        questions = []
+        paths = {}
+        for folder, question_type in QUESTION_FOLDERS:
+            directory = os.path.join(self.root, folder)
+            if not os.path.isdir(directory):
+                continue
+            filenames = sorted(os.listdir(directory))
+            
+            # 文件名 -> (所在目录, 实际文件名)；按子目录顺序，先出现的优先
+            for filename in filenames:
+                paths.setdefault(filename, (directory, filename))
+            for filename in filenames:
+                if filename.endswith('.MP3'):
+                    # 请求 .wav 而实际只有 .MP3 时使用 .MP3 文件
+                    paths.setdefault(filename[:-len('.MP3')] + '.wav', (directory, filename))
+            
+            for filename in filenames:
+                try:
+                    question = parse_question(folder, question_type, filename)
+                except ValueError:
+                    question = None
+                if question:
+                    questions.append(question)
+        
+        by_type = {}
+        for question in questions:
+            by_type.setdefault(question['type'], []).append(question)
+        
+        self._questions = questions
+        self._by_type = by_type
+        self._paths = paths
+        
+        emotion_logger.log_system_event("能力测试题库已加载", {
+            "root": self.root,
+            "questions": len(questions),
+            "by_type": {question_type: len(items) for question_type, items in by_type.items()}
+        })
+    
+    def load(self):
+        """立即加载题库（应用启动时调用）"""
+        self._ensure_loaded()
+        return self
+    
+    def sample(self, k, stratified=False):
+        """
+        随机抽取题目
+        
+        Args:
+            k (int): 题目数量
+            stratified (bool): 是否按题目类型分层抽取（各类型数量尽量均衡）
+        
+        Returns:
+            list: 题目列表（随机顺序）
+        """
+        self._ensure_loaded()
+        if not stratified:
+            return random.sample(self._questions, min(k, len(self._questions)))
+        
+        # 分层：按类型轮流分配名额，某类型题目不足时名额让给其他类型
+        pools = {question_type: items for question_type, items in self._by_type.items() if items}
+        quotas = dict.fromkeys(pools, 0)
+        remaining = min(k, sum(len(items) for items in pools.values()))
+        while remaining > 0:
+            for question_type, items in pools.items():
+                if remaining > 0 and quotas[question_type] < len(items):
+                    quotas[question_type] += 1
+                    remaining -= 1
+        
+        selected = []
+        for question_type, quota in quotas.items():
+            selected.extend(random.sample(pools[question_type], quota))
+        random.shuffle(selected)  # 只打乱抽中的 k 道题
+        return selected
+    
+    def resolve_audio(self, filename):
+        """
+        查找测试音频文件
+        
+        Returns:
+            tuple: (所在目录, 实际文件名)，不存在时返回None
+        """
+        self._ensure_loaded()
+        return self._paths.get(filename)
\ No newline at end of file
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+能力测试结果服务
+测试结果保存在 emotion_labels.db 中（每次提交一行，逐题答案批量写入明细表），
+历史记录按用户分页查询；提供从旧版按用户保存的 JSON 文件一次性导入的功能
+"""
+
+import os
+import json
+from datetime import datetime
+from services.database_service import DatabaseService
+from utils.logger import emotion_logger
+
+LEGACY_FILE_SUFFIX = '_test_results.json'
+
+class TestResultService:
+    """能力测试结果服务类"""
+    
+    @staticmethod
+    def init_database():
+        """创建测试结果表（应用启动时执行一次）"""
+        conn = DatabaseService.get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS test_attempts (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    username TEXT NOT NULL,
+                    total_questions INTEGER NOT NULL,
+                    correct_count INTEGER NOT NULL,
+                    score REAL NOT NULL,
+                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_test_attempts_user_time
+                ON test_attempts(username, timestamp DESC, id DESC)
+            ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS test_attempt_answers (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    attempt_id INTEGER NOT NULL,
+                    filename TEXT,
+                    question_type TEXT,
+                    user_answer TEXT,  -- JSON 编码，保留原始类型（字符串或数值）
+                    correct_answer TEXT,
+                    is_correct BOOLEAN,
+                    FOREIGN KEY (attempt_id) REFERENCES test_attempts(id)
+                )
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_test_attempt_answers_attempt
+                ON test_attempt_answers(attempt_id)
+            ''')
+            # 已导入的旧版 JSON 文件，避免重复导入
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS test_result_imports (
+                    source_file TEXT PRIMARY KEY,
+                    attempts INTEGER NOT NULL,
+                    imported_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            conn.commit()
+        finally:
+            conn.close()
+    
+    @staticmethod
+    def is_answer_correct(result):
+        """
+        判断单题是否回答正确
+        
+        离散情感需完全匹配，效价/唤醒允许±0.5误差
+        """
+        user_answer = result.get('user_answer')
+        correct_answer = result.get('correct_answer')
+        question_type = result.get('type')
+        
+        if question_type == 'discrete':
+            return user_answer == correct_answer
+        if question_type in ['potency', 'arousal']:
+            try:
+                return abs(float(user_answer) - float(correct_answer)) <= 0.5
+            except (TypeError, ValueError):
+                return False
+        return False
+    
+    @staticmethod
+    def _insert_attempt(cursor, username, results, correct_count, score, timestamp):
+        """写入一次测试及其逐题答案（不提交事务）"""
+        cursor.execute('''
+            INSERT INTO test_attempts (username, total_questions, correct_count, score, timestamp)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (username, len(results), correct_count, score, timestamp))
+        attempt_id = cursor.lastrowid
+        
+        cursor.executemany('''
+            INSERT INTO test_attempt_answers (
+                attempt_id, filename, question_type, user_answer, correct_answer, is_correct
+            ) VALUES (?, ?, ?, ?, ?, ?)
+        ''', [(
+            attempt_id,
+            result.get('filename'),
+            result.get('type'),
+            json.dumps(result.get('user_answer'), ensure_ascii=False),
+            json.dumps(result.get('correct_answer'), ensure_ascii=False),
+            result.get('is_correct')
+        ) for result in results])
+        return attempt_id
+    
+    @staticmethod
+    def save_result(username, results):
+        """
+        评分并保存一次测试结果
+        
+        Args:
+            username (str): 用户名
+            results (list): 逐题结果，每项包含 filename, type, user_answer, correct_answer
+        
+        Returns:
+            dict: 包含 attempt_id, score, correct_count, total_questions
+        """
+        scored = []
+        for result in results:
+            scored.append({**result, 'is_correct': TestResultService.is_answer_correct(result)})
+        
+        total_questions = len(scored)
+        correct_count = sum(1 for result in scored if result['is_correct'])
+        score = round((correct_count / total_questions * 100) if total_questions > 0 else 0, 2)
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        
+        conn = DatabaseService.get_connection()
+        try:
+            cursor = conn.cursor()
+            attempt_id = TestResultService._insert_attempt(cursor, username, scored, correct_count, score, timestamp)
+            conn.commit()
+        finally:
+            conn.close()
+        
+        emotion_logger.log_database_operation(
+            operation="INSERT",
+            table="test_attempts",
+            username=username,
+            details={"attempt_id": attempt_id, "score": score, "total_questions": total_questions},
+            success=True
+        )
+        
+        return {
+            'attempt_id': attempt_id,
+            'score': score,
+            'correct_count': correct_count,
+            'total_questions': total_questions
+        }
+    
+    @staticmethod
+    def get_history(username, limit=20, offset=0):
+        """
+        分页获取用户测试历史（最新的在前，只含摘要）
+        
+        Args:
+            username (str): 用户名
+            limit (int): 每页条数
+            offset (int): 偏移量
+        
+        Returns:
+            tuple: (历史记录列表, 总条数)
+        """
+        conn = DatabaseService.get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT id, timestamp, score, correct_count, total_questions
+                FROM test_attempts
+                WHERE username = ?
+                ORDER BY timestamp DESC, id DESC
+                LIMIT ? OFFSET ?
+            ''', (username, limit, offset))
+            history = [{
+                'attempt_id': row['id'],
+                'timestamp': row['timestamp'],
+                'score': row['score'],
+                'correct_count': row['correct_count'],
+                'total_questions': row['total_questions']
+            } for row in cursor.fetchall()]
+            
+            cursor.execute('SELECT COUNT(*) FROM test_attempts WHERE username = ?', (username,))
+            total = cursor.fetchone()[0]
+        finally:
+            conn.close()
+        
+        return history, total
+    
+    @staticmethod
+    def import_legacy_json(directory):
+        """
+        一次性导入旧版按用户保存的测试结果文件（{username}_test_results.json）
+        
+        已导入的文件记录在 test_result_imports 中，重复执行不会重复导入
+        
+        Args:
+            directory (str): 旧版测试结果目录
+        
+        Returns:
+            dict: {'files': 导入的文件数, 'attempts': 导入的测试次数, 'skipped': 跳过的文件数}
+        """
+        TestResultService.init_database()
+        summary = {'files': 0, 'attempts': 0, 'skipped': 0}
+        if not os.path.isdir(directory):
+            return summary
+        
+        conn = DatabaseService.get_connection()
+        try:
+            cursor = conn.cursor()
+            imported = {row[0] for row in cursor.execute('SELECT source_file FROM test_result_imports')}
+            
+            for filename in sorted(os.listdir(directory)):
+                if not filename.endswith(LEGACY_FILE_SUFFIX):
+                    continue
+                source_file = os.path.abspath(os.path.join(directory, filename))
+                if source_file in imported:
+                    summary['skipped'] += 1
+                    continue
+                
+                try:
+                    with open(source_file, 'r', encoding='utf-8') as f:
+                        attempts = json.load(f)
+                except (OSError, json.JSONDecodeError) as e:
+                    emotion_logger.log_error(e, f"读取旧版测试结果失败 - {source_file}")
+                    summary['skipped'] += 1
+                    continue
+                
+                username = filename[:-len(LEGACY_FILE_SUFFIX)]
+                for attempt in attempts:
+                    details = [{**result, 'is_correct': TestResultService.is_answer_correct(result)}
+                               for result in attempt.get('details', [])]
+                    TestResultService._insert_attempt(
+                        cursor,
+                        username,
+                        details,
+                        attempt.get('correct_count', sum(1 for result in details if result['is_correct'])),
+                        attempt.get('score', 0),
+                        attempt.get('timestamp')
+                    )
+                
+                # 每个文件一个事务：文件内的测试记录与导入标记一起提交
+                cursor.execute(
+                    'INSERT INTO test_result_imports (source_file, attempts) VALUES (?, ?)',
+                    (source_file, len(attempts))
+                )
+                conn.commit()
+                summary['files'] += 1
+                summary['attempts'] += len(attempts)
+        finally:
+            conn.close()
+        
+        emotion_logger.log_system_event("旧版测试结果导入完成", {"directory": directory, **summary})
+        return summary
\ No newline at end of file
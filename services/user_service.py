@@ -4,6 +4,7 @@ from config import Config
 from utils.file_utils import safe_json_load, safe_json_save
 from services.order_service import OrderService
 from services.database_service import DatabaseService
+from services.data_version import bump_version
 from utils.logger import emotion_logger
 
 class UserService:
@@ -97,12 +98,15 @@ class UserService:
             
             # 更新情感标注表中的用户名
             cursor.execute(
-                "UPDATE emotion_labels SET username = ? WHERE username = ?",
+                "UPDATE emotion_labels SET username = ?, updated_at = CURRENT_TIMESTAMP WHERE username = ?",
                 (new_username, old_username)
             )
             
             conn.commit()
             conn.close()
+            bump_version('orders', old_username, new_username)
+            bump_version('labels', old_username, new_username)
+            bump_version('play_counts', old_username, new_username)
             
             print(f"已更新数据库中用户 {old_username} 的数据为 {new_username}")
             
@@ -132,6 +136,8 @@ class UserService:
             
             conn.commit()
             conn.close()
+            bump_version('labels', username)
+            bump_version('play_counts', username)
             
             # 删除文件系统中的用户目录（如果存在）
             user_dir = os.path.join(Config.DATABASE_FOLDER, username)
@@ -1,9 +1,12 @@
 import os
 import socket
 import sys
+import importlib.util
 import logging
+import argparse
 from datetime import datetime
 from logging.handlers import RotatingFileHandler
+from config import Config
 from utils.logger import emotion_logger
 
 # 创建日志目录
@@ -48,8 +51,9 @@ def import_app():
     sys.path.append(os.path.dirname(os.path.abspath(__file__)))
     
     # 只使用标准版本
-    from app import create_app
+    from app import create_app, format_startup_report
     app = create_app()
+    logging.getLogger(__name__).info("应用启动耗时明细:\n" + format_startup_report(app))
     return app, "标准版本 (app.py)"
 
 def get_local_ip():
@@ -66,36 +70,164 @@ def get_local_ip():
     except:
         return "0.0.0.0"
 
+def parse_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='启动情感标注系统')
+    parser.add_argument('--production', action='store_true',
+                        help='使用多进程WSGI服务器启动（生产模式）')
+    parser.add_argument('--host', default=None,
+                        help='监听地址（开发模式默认为本机IP，生产模式默认为 Config.HOST）')
+    parser.add_argument('--port', type=int, default=Config.PORT,
+                        help=f'监听端口 (默认: {Config.PORT})')
+    parser.add_argument('--workers', type=int, default=Config.WORKERS,
+                        help=f'工作进程数 (默认: {Config.WORKERS})')
+    parser.add_argument('--threads', type=int, default=Config.THREADS,
+                        help=f'每个工作进程的线程数 (默认: {Config.THREADS})')
+    parser.add_argument('--timeout', type=int, default=Config.WORKER_TIMEOUT,
+                        help=f'请求超时秒数 (默认: {Config.WORKER_TIMEOUT})')
+    parser.add_argument('--no-preload', action='store_true',
+                        help='不在主进程中预加载应用，每个工作进程各自加载')
+    return parser.parse_args()
+
+def _post_fork(server, worker):
+    """gunicorn钩子：工作进程fork之后重置进程级状态"""
+    from app import init_worker
+    init_worker()
+
+def _worker_abort(worker):
+    """gunicorn钩子：工作进程因请求超时被中止"""
+    emotion_logger.log_system_event(
+        "工作进程请求超时被中止",
+        {"pid": worker.pid, "timeout": worker.cfg.timeout},
+        level='warning'
+    )
+
+def run_gunicorn(host, port, args):
+    """
+    使用gunicorn以预派生多进程模式运行应用
+    
+    主进程收到 SIGHUP 时平滑重启工作进程，收到 SIGTERM 时等待处理中的请求完成后退出
+    """
+    from gunicorn.app.base import BaseApplication
+    
+    class StandaloneApplication(BaseApplication):
+        def __init__(self, options):
+            self.options = options
+            super().__init__()
+        
+        def load_config(self):
+            for key, value in self.options.items():
+                if key in self.cfg.settings and value is not None:
+                    self.cfg.set(key, value)
+        
+        def load(self):
+            app, _ = import_app()
+            return app
+    
+    options = {
+        'bind': f"{host}:{port}",
+        'workers': args.workers,
+        'threads': args.threads,
+        'worker_class': 'gthread' if args.threads > 1 else 'sync',
+        'timeout': args.timeout,
+        'graceful_timeout': Config.GRACEFUL_TIMEOUT,
+        'keepalive': Config.KEEPALIVE,
+        'max_requests': Config.MAX_REQUESTS,
+        'max_requests_jitter': Config.MAX_REQUESTS // 10,
+        'preload_app': Config.PRELOAD_APP and not args.no_preload,
+        'post_fork': _post_fork,
+        'worker_abort': _worker_abort,
+        'accesslog': os.path.join(LOG_DIR, 'access.log'),
+        'errorlog': os.path.join(LOG_DIR, 'gunicorn_error.log'),
+    }
+    StandaloneApplication(options).run()
+
+def run_waitress(host, port, args):
+    """
+    使用waitress运行应用（gunicorn不可用时的备选，例如Windows环境）
+    
+    waitress为单进程多线程模型，线程池大小为 workers × threads
+    """
+    from waitress import serve
+    app, _ = import_app()
+    serve(app, host=host, port=port, threads=args.workers * args.threads,
+          channel_timeout=args.timeout)
+
+def run_production(args, logger):
+    """以生产模式启动服务器"""
+    host = args.host or Config.HOST
+    port = args.port
+    
+    server_name = 'gunicorn' if importlib.util.find_spec('gunicorn') else 'waitress'
+    
+    print("\n" + "=" * 60)
+    print(f"情感标注系统以生产模式启动 ({server_name})")
+    print(f"监听地址: http://{host}:{port}")
+    print(f"工作进程: {args.workers}  每进程线程: {args.threads}  请求超时: {args.timeout}s")
+    print(f"日志保存在: {LOG_DIR}")
+    print("=" * 60 + "\n")
+    
+    logger.info(f"生产模式启动: {server_name} {host}:{port}")
+    emotion_logger.log_system_event("服务器启动", {
+        "host": host,
+        "port": port,
+        "mode": "production",
+        "server": server_name,
+        "workers": args.workers,
+        "threads": args.threads,
+        "timeout": args.timeout
+    })
+    
+    if server_name == 'gunicorn':
+        run_gunicorn(host, port, args)
+    else:
+        run_waitress(host, port, args)
+
 if __name__ == "__main__":
+    args = parse_args()
+    
     # 设置日志
     logger = setup_logging()
     logger.info("正在启动情感标注系统...")
     emotion_logger.log_system_event("系统启动", {"version": "标准版本", "module": "app.py"})
     
+    if args.production:
+        try:
+            run_production(args, logger)
+        except Exception as e:
+            logger.error(f"服务器错误: {str(e)}", exc_info=True)
+            emotion_logger.log_error(e, "服务器启动失败", traceback_info=str(e))
+            print(f"\n发生错误: {str(e)}")
+        finally:
+            logger.info("服务器关闭")
+        sys.exit(0)
+    
     # 导入应用（只使用标准版本）
     app, version_info = import_app()
+    from app import format_startup_report
     logger.info(f"已加载应用: {version_info}")
     emotion_logger.log_system_event("应用加载完成", {"app_type": "Flask应用"})
     
     # 获取本机IP
-    ip_address = get_local_ip()
-    port = 5000
+    ip_address = args.host or get_local_ip()
+    port = args.port
     
     # 显示自定义启动消息
     print("\n" + "=" * 60)
     print(f"情感标注系统已启动! ({version_info})")
     print(f"请访问: http://{ip_address}:{port}")
     print(f"日志保存在: {LOG_DIR}")
+    print(format_startup_report(app))
     print("按Ctrl+C停止服务器")
     print("=" * 60 + "\n")
     
     # 记录应用启动信息
     logger.info(f"服务器正在监听: {ip_address}:{port}")
-    emotion_logger.log_system_event("服务器启动", {"host": ip_address, "port": port, "debug": True})
+    emotion_logger.log_system_event("服务器启动", {"host": ip_address, "port": port, "debug": Config.DEBUG})
     
     try:
-        # 运行Flask应用
-        app.run(host=ip_address, port=port, debug=True, use_reloader=False)
+        # 运行Flask开发服务器（多线程，避免单个慢请求阻塞其他用户）
+        app.run(host=ip_address, port=port, debug=Config.DEBUG, use_reloader=False, threaded=True)
     except KeyboardInterrupt:
         logger.info("服务器关闭")
         emotion_logger.log_system_event("服务器关闭", {"reason": "用户中断"})
@@ -10,6 +10,10 @@ class AdminDashboard {
     constructor() {
         this.currentSection = 'overview';
         this.charts = {};
+        this.overviewData = null;   // 最近一次加载的概览数据，收到推送事件时在此基础上累加
+        this.usersData = null;      // 最近一次加载的用户统计
+        this.eventSource = null;
+        this.reloadTimer = null;
         this.init();
     }
 
@@ -20,6 +24,101 @@ class AdminDashboard {
         this.bindEvents();
         this.loadOverviewData();
         this.setupNavigation();
+        this.connectEventStream();
+    }
+
+    /**
+     * 连接服务端变更推送（SSE），断线后由浏览器自动重连
+     */
+    connectEventStream() {
+        if (!window.EventSource) {
+            return;
+        }
+
+        this.eventSource = new EventSource('/admin/api/events');
+
+        this.eventSource.addEventListener('label_saved', (e) => {
+            this.applyLabelEvent(JSON.parse(e.data));
+        });
+
+        this.eventSource.addEventListener('user_reset', () => {
+            this.scheduleSectionReload();
+        });
+
+        // 推送事件有缺失（断线太久或其他工作进程有写入）时重新加载当前页面
+        this.eventSource.addEventListener('resync', () => {
+            this.scheduleSectionReload();
+        });
+    }
+
+    /**
+     * 根据一条标注保存事件增量更新概览和用户统计
+     * @param {Object} event - label_saved 事件内容
+     */
+    applyLabelEvent(event) {
+        let needsReload = false;
+
+        if (this.overviewData) {
+            const overview = this.overviewData;
+            overview.total_users += event.new_user ? 1 : 0;
+            overview.active_users += event.new_user ? 1 : 0;
+            overview.total_annotations += event.is_new ? 1 : 0;
+            overview.completed_annotations += event.complete_delta;
+            overview.today_annotations += event.new_today ? 1 : 0;
+            overview.completion_rate = overview.total_annotations > 0
+                ? Math.round(overview.completed_annotations / overview.total_annotations * 10000) / 100
+                : 0;
+            this.updateOverviewUI(overview);
+        }
+
+        if (this.usersData) {
+            const user = this.usersData.find(item => item.username === event.username);
+            if (user) {
+                if (user.group_id !== null && user.group_id !== undefined) {
+                    // 分组用户：总数为分组段数，完成数为分组内完成数
+                    user.completed_annotations += event.group_progress_delta;
+                } else {
+                    user.total_annotations += event.is_new ? 1 : 0;
+                    user.completed_annotations += event.complete_delta;
+                }
+                user.completion_rate = user.total_annotations > 0
+                    ? Math.round(user.completed_annotations / user.total_annotations * 10000) / 100
+                    : 0;
+                user.last_annotation = event.timestamp;
+                if (this.currentSection === 'users') {
+                    this.updateUsersTable(this.usersData);
+                }
+            } else {
+                // 新用户：用户数、活跃用户数等无法增量推算
+                needsReload = true;
+            }
+        }
+
+        // 图表类页面（说话人、进度、质量）不做增量更新，正在查看时合并刷新
+        if (needsReload || ['speakers', 'progress', 'quality'].includes(this.currentSection)) {
+            this.scheduleSectionReload();
+        }
+    }
+
+    /**
+     * 合并短时间内的多次刷新请求，只重新加载当前页面一次
+     */
+    scheduleSectionReload() {
+        // 其他页面的缓存数据作废，切换过去时会重新加载
+        if (this.currentSection !== 'overview') {
+            this.overviewData = null;
+        }
+        if (this.currentSection !== 'users') {
+            this.usersData = null;
+        }
+
+        if (this.reloadTimer) {
+            return;
+        }
+        this.reloadTimer = setTimeout(() => {
+            this.reloadTimer = null;
+            this.loadSectionData(this.currentSection);
+        }, 10000);
     }
 
     /**
@@ -87,6 +186,10 @@ class AdminDashboard {
         });
 
         // 一致性分析按钮
+        document.getElementById('refresh-agreement')?.addEventListener('click', () => {
+            this.refreshAgreement();
+        });
+
         document.getElementById('calculate-consistency')?.addEventListener('click', () => {
             this.calculateConsistency();
         });
@@ -210,6 +313,7 @@ class AdminDashboard {
      * @param {Object} data - 概览数据
      */
     updateOverviewUI(data) {
+        this.overviewData = data;
         document.getElementById('total-users').textContent = data.total_users;
         document.getElementById('total-audio-files').textContent = data.total_audio_files;
         document.getElementById('total-annotations').textContent = data.total_annotations;
@@ -241,6 +345,7 @@ class AdminDashboard {
      * @param {Array} users - 用户数据数组
      */
     updateUsersTable(users) {
+        this.usersData = users;
         const tbody = document.querySelector('#users-table tbody');
         tbody.innerHTML = '';
 
@@ -520,6 +625,142 @@ class AdminDashboard {
         } catch (error) {
             this.showError('网络错误: ' + error.message);
         }
+        
+        this.loadAgreementData();
+    }
+
+    /**
+     * 加载标注者间一致性汇总
+     */
+    async loadAgreementData() {
+        try {
+            const response = await fetch('/admin/api/agreement?limit=20');
+            const data = await response.json();
+
+            if (response.ok) {
+                this.displayAgreement(data);
+            } else {
+                this.showError('加载标注一致性失败: ' + data.error);
+            }
+        } catch (error) {
+            this.showError('网络错误: ' + error.message);
+        }
+    }
+
+    /**
+     * 增量更新标注者间一致性分析（后台运行，完成后刷新汇总）
+     */
+    async refreshAgreement() {
+        try {
+            const response = await fetch('/admin/api/agreement/refresh', { method: 'POST' });
+            const data = await response.json();
+
+            if (!response.ok) {
+                this.showError('更新标注一致性失败: ' + data.error);
+                return;
+            }
+            this.showSuccess(data.started ? '一致性分析已在后台开始' : '一致性分析正在进行中');
+            this.waitForAgreement(data.last_run ? data.last_run.finished_at : null);
+        } catch (error) {
+            this.showError('网络错误: ' + error.message);
+        }
+    }
+
+    /**
+     * 轮询分析状态，出现新的完成记录后重新加载汇总
+     * @param {string|null} previousFinishedAt - 开始时最近一次分析的完成时间
+     */
+    async waitForAgreement(previousFinishedAt) {
+        const deadline = Date.now() + 30 * 60 * 1000;
+        while (Date.now() < deadline) {
+            await new Promise(resolve => setTimeout(resolve, 2000));
+            try {
+                const response = await fetch('/admin/api/agreement/status');
+                const data = await response.json();
+                const lastRun = data.last_run;
+                if (response.ok && lastRun && lastRun.finished_at !== previousFinishedAt) {
+                    this.showSuccess(`一致性分析已更新：处理 ${lastRun.files_processed} 个文件`);
+                    this.loadAgreementData();
+                    return;
+                }
+            } catch (error) {
+                // 网络中断时继续等待
+            }
+        }
+    }
+
+    /**
+     * 显示标注者间一致性汇总
+     * @param {Object} data - 一致性汇总数据
+     */
+    displayAgreement(data) {
+        const format = (value, digits = 3) => (value === null || value === undefined) ? '-' : value.toFixed(digits);
+        
+        document.getElementById('agreement-updated-at').textContent =
+            data.labels_updated_at ? `数据截至 ${data.labels_updated_at}` : '尚未运行一致性分析';
+        
+        document.getElementById('agreement-users').innerHTML = `
+            <table class="consistency-table">
+                <thead>
+                    <tr>
+                        <th>用户</th>
+                        <th>对比文件数</th>
+                        <th>可靠性</th>
+                        <th>V值偏差</th>
+                        <th>A值偏差</th>
+                        <th>V值平均误差</th>
+                        <th>A值平均误差</th>
+                        <th>类别一致率</th>
+                    </tr>
+                </thead>
+                <tbody>
+                    ${data.users.map(user => `
+                        <tr>
+                            <td>${user.username}</td>
+                            <td>${user.files_compared}</td>
+                            <td>${format(user.reliability)}</td>
+                            <td>${format(user.v_bias)}</td>
+                            <td>${format(user.a_bias)}</td>
+                            <td>${format(user.v_mae)}</td>
+                            <td>${format(user.a_mae)}</td>
+                            <td>${format(user.categorical_agreement)}</td>
+                        </tr>
+                    `).join('')}
+                </tbody>
+            </table>
+        `;
+        
+        document.getElementById('agreement-files').innerHTML = `
+            <h4>分歧最大的文件（共 ${data.total} 个多人标注文件）</h4>
+            <table class="consistency-table">
+                <thead>
+                    <tr>
+                        <th>音频文件</th>
+                        <th>说话人</th>
+                        <th>标注人数</th>
+                        <th>分歧程度</th>
+                        <th>V值标准差</th>
+                        <th>A值标准差</th>
+                        <th>情感类型一致率</th>
+                        <th>离散情感一致率</th>
+                    </tr>
+                </thead>
+                <tbody>
+                    ${data.files.map(file => `
+                        <tr>
+                            <td>${file.audio_file}</td>
+                            <td>${file.speaker}</td>
+                            <td>${file.annotators}</td>
+                            <td>${format(file.disagreement)}</td>
+                            <td>${format(file.v_std)}</td>
+                            <td>${format(file.a_std)}</td>
+                            <td>${format(file.emotion_type_agreement)}</td>
+                            <td>${format(file.discrete_emotion_agreement)}</td>
+                        </tr>
+                    `).join('')}
+                </tbody>
+            </table>
+        `;
     }
 
     /**
@@ -890,11 +1131,75 @@ class AdminDashboard {
             if (usersResponse.ok) {
                 this.updateConsistencyUserSelect(usersData.users);
             }
+            
+            // 加载全部用户的一致性分析（一次请求）
+            const reportResponse = await fetch('/admin/api/consistency/report');
+            const reportData = await reportResponse.json();
+            
+            if (reportResponse.ok) {
+                this.displayConsistencyOverview(reportData);
+            }
         } catch (error) {
             this.showError('加载一致性数据失败: ' + error.message);
         }
     }
 
+    /**
+     * 显示全部用户的一致性分析
+     * @param {Object} data - 一致性分析数据（summary + users）
+     */
+    displayConsistencyOverview(data) {
+        const formatMetric = value => (value === null || value === undefined) ? '-' : value.toFixed(3);
+        const summary = data.summary;
+        
+        document.getElementById('average-consistency-score').textContent =
+            summary.average_consistency === null ? '-' : summary.average_consistency.toFixed(2) + '%';
+        
+        const rows = data.users.map(user => `
+            <tr>
+                <td>${user.username}</td>
+                <td>${user.total_samples}</td>
+                <td>${user.overall_consistency.toFixed(2)}%</td>
+                <td>${user.consistency_percentages.v_value.toFixed(2)}%</td>
+                <td>${user.consistency_percentages.a_value.toFixed(2)}%</td>
+                <td>${formatMetric(user.krippendorff_alpha.v_value)}</td>
+                <td>${formatMetric(user.krippendorff_alpha.a_value)}</td>
+                <td>${formatMetric(user.cohen_kappa.emotion_type)}</td>
+                <td>${formatMetric(user.cohen_kappa.discrete_emotion)}</td>
+                <td>${formatMetric(user.cohen_kappa.patient_status)}</td>
+            </tr>
+        `).join('');
+        
+        document.getElementById('consistency-all-users').innerHTML = `
+            <div class="consistency-summary">
+                <p><strong>标注者间一致性 (Krippendorff α):</strong>
+                    V值 ${formatMetric(summary.krippendorff_alpha.v_value)},
+                    A值 ${formatMetric(summary.krippendorff_alpha.a_value)}</p>
+                <p><strong>标注者间一致性 (Fleiss κ):</strong>
+                    情感类型 ${formatMetric(summary.fleiss_kappa.emotion_type)},
+                    离散情感 ${formatMetric(summary.fleiss_kappa.discrete_emotion)},
+                    患者状态 ${formatMetric(summary.fleiss_kappa.patient_status)}</p>
+            </div>
+            <table class="consistency-table">
+                <thead>
+                    <tr>
+                        <th>用户</th>
+                        <th>样本数</th>
+                        <th>总体一致性</th>
+                        <th>V值一致率</th>
+                        <th>A值一致率</th>
+                        <th>V值 α</th>
+                        <th>A值 α</th>
+                        <th>情感类型 κ</th>
+                        <th>离散情感 κ</th>
+                        <th>患者状态 κ</th>
+                    </tr>
+                </thead>
+                <tbody>${rows}</tbody>
+            </table>
+        `;
+    }
+
     /**
      * 更新一致性统计信息
      * @param {Object} data - 统计数据
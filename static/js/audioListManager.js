@@ -25,11 +25,18 @@ class AudioListManager {
 
     /**
      * 初始化说话人列表
+     * @param {string} username - 用户名
+     * @param {object} bootstrap - /api/bootstrap 返回的启动数据，提供时直接使用其中的说话人和音频列表
      */
-    async initSpeakers(username) {
+    async initSpeakers(username, bootstrap = null) {
         try {
-            const response = await fetch(`/api/speakers/${encodeURIComponent(username)}`);
-            const speakers = await response.json();
+            let speakers;
+            if (bootstrap && Array.isArray(bootstrap.speakers)) {
+                speakers = bootstrap.speakers;
+            } else {
+                const response = await fetch(`/api/speakers/${encodeURIComponent(username)}`);
+                speakers = await response.json();
+            }
             
             this.speakerSelect.innerHTML = '<option value="">请选择说话人</option>';
             speakers.forEach(speaker => {
@@ -38,6 +45,18 @@ class AudioListManager {
                 option.textContent = speaker;
                 this.speakerSelect.appendChild(option);
             });
+            
+            // 启动数据中已包含当前说话人音频列表的第一页，先显示，其余部分在后台加载
+            const audioList = bootstrap && bootstrap.audio_list;
+            if (audioList && speakers.includes(audioList.speaker)) {
+                this.speakerSelect.value = audioList.speaker;
+                this.currentSpeaker = audioList.speaker;
+                this.audioList = labelSaveQueue.applyPending(username, audioList.speaker, audioList.items);
+                this.renderAudioList();
+                if (audioList.has_more) {
+                    this.loadAudioList(audioList.speaker);
+                }
+            }
         } catch (error) {
             console.error('加载说话人列表失败:', error);
         }
@@ -53,6 +72,7 @@ class AudioListManager {
         }
         
         this.currentSpeaker = speaker;
+        localStorage.setItem('emotion_labeling_last_speaker', speaker);
         await this.loadAudioList(speaker);
     }
 
@@ -70,8 +90,14 @@ class AudioListManager {
             const response = await fetch(`/api/audio_list/${encodeURIComponent(username)}/${encodeURIComponent(speaker)}`);
             const audioList = await response.json();
             
-            this.audioList = audioList;
+            // 加载期间用户已切换到其他说话人时丢弃结果
+            if (speaker !== this.currentSpeaker) {
+                return;
+            }
+            // 尚未提交的标注比服务器返回的状态新
+            this.audioList = labelSaveQueue.applyPending(username, speaker, audioList);
             this.renderAudioList();
+            this.updateAudioSelection();
         } catch (error) {
             console.error('加载音频列表失败:', error);
         }
@@ -1,15 +1,18 @@
 /**
  * 音频播放器模块
- * 负责音频播放控制和播放计数
+ * 负责音频播放控制、播放计数和波形显示
  */
 class AudioPlayer {
-    constructor(audioElement, playCountElement) {
+    constructor(audioElement, playCountElement, waveformCanvas = null) {
         this.audioElement = audioElement;
         this.playCountElement = playCountElement;
+        this.waveformCanvas = waveformCanvas;
         this.currentPlayCount = 0;
         this.currentAudioFile = null;
         this.currentSpeaker = null;
         this.currentUsername = null;
+        this.waveformPeaks = null;
+        this.waveformRequest = 0;
         
         this.initEventListeners();
     }
@@ -18,7 +21,17 @@ class AudioPlayer {
         this.audioElement.addEventListener('loadedmetadata', () => {
             const duration = this.audioElement.duration;
             console.log(`音频时长: ${duration.toFixed(2)}秒`);
+            this.drawWaveform();
         });
+        
+        if (this.waveformCanvas) {
+            // 点击波形跳转到对应位置，不必从头重放
+            this.waveformCanvas.addEventListener('click', (event) => this.seekFromWaveform(event));
+            this.audioElement.addEventListener('play', () => this.animateWaveform());
+            this.audioElement.addEventListener('timeupdate', () => this.drawWaveform());
+            this.audioElement.addEventListener('seeked', () => this.drawWaveform());
+            window.addEventListener('resize', () => this.drawWaveform());
+        }
     }
 
     /**
@@ -44,6 +57,7 @@ class AudioPlayer {
         
         this.audioElement.src = audioFile.path;
         this.audioElement.load();
+        this.loadWaveform(speaker, audioFile.file_name);
         
         // 移除之前的播放结束事件监听器
         this.audioElement.removeEventListener('ended', this.handleAudioEnded);
@@ -154,6 +168,113 @@ class AudioPlayer {
         }
     }
 
+    /**
+     * 加载波形峰值数据（/api/waveform 返回的 .dat 格式）
+     */
+    async loadWaveform(speaker, fileName) {
+        if (!this.waveformCanvas) {
+            return;
+        }
+        const request = ++this.waveformRequest;
+        this.waveformPeaks = null;
+        this.drawWaveform();
+        
+        try {
+            const response = await fetch(`/api/waveform/${encodeURIComponent(speaker)}/${encodeURIComponent(fileName)}`);
+            if (!response.ok) {
+                throw new Error(`HTTP ${response.status}`);
+            }
+            const peaks = AudioPlayer.parsePeaks(await response.arrayBuffer());
+            // 加载期间已切换到其他音频时丢弃结果
+            if (request === this.waveformRequest) {
+                this.waveformPeaks = peaks;
+                this.drawWaveform();
+            }
+        } catch (error) {
+            console.error('加载波形失败:', error);
+        }
+    }
+
+    /**
+     * 解析峰值数据：20字节文件头之后是每个区间的 (min, max)
+     */
+    static parsePeaks(buffer) {
+        const view = new DataView(buffer);
+        const eightBit = (view.getUint32(4, true) & 1) === 1;
+        const length = view.getUint32(16, true);
+        return {
+            length,
+            data: eightBit ? new Int8Array(buffer, 20, length * 2) : new Int16Array(buffer.slice(20, 20 + length * 4)),
+            scale: eightBit ? 128 : 32768
+        };
+    }
+
+    /**
+     * 绘制波形，已播放部分使用高亮颜色
+     */
+    drawWaveform() {
+        const canvas = this.waveformCanvas;
+        if (!canvas) {
+            return;
+        }
+        const ratio = window.devicePixelRatio || 1;
+        const width = Math.round(canvas.clientWidth * ratio);
+        const height = Math.round(canvas.clientHeight * ratio);
+        if (canvas.width !== width || canvas.height !== height) {
+            canvas.width = width;
+            canvas.height = height;
+        }
+        
+        const context = canvas.getContext('2d');
+        context.clearRect(0, 0, width, height);
+        const peaks = this.waveformPeaks;
+        if (!peaks || peaks.length === 0 || width === 0) {
+            return;
+        }
+        
+        const duration = this.audioElement.duration;
+        const playedX = duration ? this.audioElement.currentTime / duration * width : 0;
+        const middle = height / 2;
+        for (let x = 0; x < width; x++) {
+            // 每个画布像素覆盖的峰值区间
+            const start = Math.floor(x * peaks.length / width);
+            const end = Math.max(start + 1, Math.floor((x + 1) * peaks.length / width));
+            let low = peaks.data[start * 2];
+            let high = peaks.data[start * 2 + 1];
+            for (let i = start + 1; i < end; i++) {
+                low = Math.min(low, peaks.data[i * 2]);
+                high = Math.max(high, peaks.data[i * 2 + 1]);
+            }
+            const top = middle - high / peaks.scale * middle;
+            const bottom = middle - low / peaks.scale * middle;
+            context.fillStyle = x < playedX ? '#3498db' : '#bdc3c7';
+            context.fillRect(x, top, 1, Math.max(1, bottom - top));
+        }
+    }
+
+    /**
+     * 播放期间逐帧刷新波形上的播放进度
+     */
+    animateWaveform() {
+        this.drawWaveform();
+        if (!this.audioElement.paused && !this.audioElement.ended) {
+            requestAnimationFrame(() => this.animateWaveform());
+        }
+    }
+
+    /**
+     * 跳转到波形上点击的位置
+     */
+    seekFromWaveform(event) {
+        const duration = this.audioElement.duration;
+        if (!duration) {
+            return;
+        }
+        const rect = this.waveformCanvas.getBoundingClientRect();
+        const position = Math.min(Math.max((event.clientX - rect.left) / rect.width, 0), 1);
+        this.audioElement.currentTime = position * duration;
+    }
+
     /**
      * 重置播放器
      */
@@ -161,6 +282,9 @@ class AudioPlayer {
         this.audioElement.src = '';
         this.currentPlayCount = 0;
         this.updatePlayCountDisplay();
+        this.waveformRequest++;
+        this.waveformPeaks = null;
+        this.drawWaveform();
     }
 }
 
@@ -5,24 +5,52 @@
 class DataService {
     /**
      * 保存标注数据
+     * 
+     * 标注先写入本地队列（labelSaveQueue），随后批量提交；返回时已持久化到 localStorage
+     * @param {object} labelData - 标注数据
+     * @param {Array} completeness - 标注完整性，用于在提交完成前显示列表状态
      */
-    static saveLabel(labelData) {
-        return fetch('/api/save_label', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json'
-            },
-            body: JSON.stringify(labelData)
-        })
-        .then(response => response.json());
+    static saveLabel(labelData, completeness = []) {
+        labelSaveQueue.enqueue(labelData, completeness);
+        return Promise.resolve({ success: true, queued: true });
+    }
+
+    /**
+     * 获取标注页面启动数据（会话身份、测试设置、分组进度、说话人列表、当前说话人音频列表第一页）
+     */
+    static getBootstrap(speaker) {
+        const query = speaker ? `?speaker=${encodeURIComponent(speaker)}` : '';
+        return fetch(`/api/bootstrap${query}`, { credentials: 'same-origin' });
     }
 
     /**
      * 获取标注数据
      */
     static getLabel(username, speaker, filename) {
-        return fetch(`/api/get_label/${encodeURIComponent(username)}/${encodeURIComponent(speaker)}/${encodeURIComponent(filename)}`)
-            .then(response => response.json());
+        const request = fetch(`/api/get_label/${encodeURIComponent(username)}/${encodeURIComponent(speaker)}/${encodeURIComponent(filename)}`)
+            .then(response => {
+                // 404 表示还没有标注记录；其他错误时没有拿到行版本，之后的保存无法检测冲突
+                if (!response.ok && response.status !== 404) {
+                    throw new Error(`获取标注失败 (HTTP ${response.status})`);
+                }
+                return response.json();
+            })
+            .then(result => {
+                // 记录服务器上的行版本，之后的保存基于该版本提交
+                if (result.success) {
+                    labelSaveQueue.rememberVersion(username, speaker, filename, result.data.version);
+                }
+                return result;
+            });
+        const pending = labelSaveQueue.get(username, speaker, filename);
+        if (!pending) {
+            return request;
+        }
+        // 尚未提交的字段比服务器上的新（部分保存时其余字段仍取服务器上的值）
+        return request.catch(() => null).then(result => ({
+            success: true,
+            data: { ...(result && result.success ? result.data : {}), ...pending.label }
+        }));
     }
 
     /**
@@ -68,3 +96,244 @@ class DataService {
     }
 }
 
+/**
+ * 标注写入队列
+ * 保存的标注先写入 localStorage，再按批提交到 /api/save_labels。
+ * 同一音频只保留最新一次保存；网络或服务器错误时按指数退避重试，
+ * 页面关闭时未提交的标注在下次打开页面时继续提交。
+ * 同时打开的多个页面共用同一份存储：每次修改先重新读取再只改动对应的条目，
+ * 不会覆盖其他页面保存的标注，并通过 storage 事件同步其他页面的修改。
+ * 每条标注带上读取时的行版本（version），记录已被其他页面修改时服务器返回冲突和当前记录，
+ * 由 onConflict 决定基于新版本重新提交还是放弃本页面的修改
+ */
+class LabelSaveQueue {
+    constructor(options = {}) {
+        this.storageKey = options.storageKey || 'emotion_labeling_pending_labels';
+        this.batchSize = options.batchSize || 50;
+        this.flushDelay = options.flushDelay || 500;
+        this.maxRetryDelay = options.maxRetryDelay || 30000;
+        this.retryDelay = 0;
+        this.timer = null;
+        this.flushing = null;
+        this.sequence = 0;
+        // 不可重试的失败（参数错误、文件不存在等）：(entry, error) => {}
+        this.onFailure = null;
+        // 版本冲突：(entry, current) => 是否基于当前记录的版本重新提交，未设置时重新提交
+        this.onConflict = null;
+        // 已知的服务器行版本（0 表示服务器上没有记录）
+        this.versions = {};
+        this.entries = this.load();
+        
+        window.addEventListener('online', () => this.flush());
+        window.addEventListener('pagehide', () => this.flush({ keepalive: true }));
+        window.addEventListener('storage', (event) => {
+            if (event.key === this.storageKey) {
+                this.entries = this.load();
+            }
+        });
+        if (this.size() > 0) {
+            this.schedule(0);
+        }
+    }
+
+    static key(username, speaker, audioFile) {
+        return `${username}|${speaker}|${audioFile}`;
+    }
+
+    load() {
+        try {
+            return JSON.parse(localStorage.getItem(this.storageKey)) || {};
+        } catch (error) {
+            console.error('读取未提交的标注失败:', error);
+            return {};
+        }
+    }
+
+    /**
+     * 修改存储中的一条标注（重新读取后只改动这一条，保留其他页面写入的条目）
+     * @param {string} key - 条目键
+     * @param {Function} update - (当前条目或null) => 新条目，返回null时删除
+     */
+    updateStored(key, update) {
+        const stored = this.load();
+        const entry = update(stored[key] || null);
+        if (entry) {
+            stored[key] = entry;
+        } else {
+            delete stored[key];
+        }
+        this.entries = stored;
+        try {
+            localStorage.setItem(this.storageKey, JSON.stringify(stored));
+        } catch (error) {
+            console.error('保存未提交的标注失败:', error);
+        }
+    }
+
+    size() {
+        return Object.keys(this.entries).length;
+    }
+
+    /**
+     * 加入队列（与同一音频尚未提交的标注合并，后保存的字段覆盖先保存的）
+     */
+    enqueue(labelData, completeness = []) {
+        const key = LabelSaveQueue.key(labelData.username, labelData.speaker, labelData.audio_file);
+        const clientId = `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 8)}-${(this.sequence++).toString(36)}`;
+        this.updateStored(key, (previous) => {
+            const label = { ...(previous ? previous.label : {}), ...labelData, client_id: clientId };
+            // 尚未提交的修改基于同一个版本，不随合并改变
+            if (!previous && this.versions[key] !== undefined) {
+                label.version = this.versions[key];
+            }
+            return { label, completeness };
+        });
+        this.schedule(this.size() >= this.batchSize ? 0 : this.flushDelay);
+        return clientId;
+    }
+
+    /**
+     * 记录服务器上的行版本（尚未保存过的音频为0）
+     */
+    rememberVersion(username, speaker, audioFile, version) {
+        if (Number.isInteger(version)) {
+            this.versions[LabelSaveQueue.key(username, speaker, audioFile)] = version;
+        }
+    }
+
+    /**
+     * 获取某个音频尚未提交的标注
+     */
+    get(username, speaker, audioFile) {
+        return this.entries[LabelSaveQueue.key(username, speaker, audioFile)] || null;
+    }
+
+    /**
+     * 用尚未提交的标注更新音频列表的标注状态
+     */
+    applyPending(username, speaker, audioList) {
+        audioList.forEach(audio => {
+            const pending = this.get(username, speaker, audio.file_name);
+            if (pending) {
+                audio.labeled = true;
+                audio.annotation_completeness = pending.completeness;
+            }
+        });
+        return audioList;
+    }
+
+    schedule(delay) {
+        if (this.timer) {
+            return;
+        }
+        this.timer = setTimeout(() => {
+            this.timer = null;
+            this.flush();
+        }, delay);
+    }
+
+    retryLater() {
+        this.retryDelay = Math.min(Math.max(this.retryDelay * 2, 1000), this.maxRetryDelay);
+        this.schedule(this.retryDelay);
+    }
+
+    /**
+     * 提交队列中的标注（同一时间只有一次提交在进行）
+     */
+    flush(options = {}) {
+        if (!this.flushing) {
+            this.flushing = this.flushBatches(options).finally(() => {
+                this.flushing = null;
+            });
+        }
+        return this.flushing;
+    }
+
+    async flushBatches({ keepalive = false } = {}) {
+        this.entries = this.load();
+        // 本次提交中暂不处理的条目（页面关闭时的版本冲突），留在队列中下次打开页面时再处理
+        const deferred = new Set();
+        while (true) {
+            const batch = Object.keys(this.entries)
+                .filter(key => !deferred.has(key))
+                .slice(0, this.batchSize)
+                .map(key => this.entries[key].label);
+            if (batch.length === 0) {
+                break;
+            }
+            let data;
+            try {
+                const response = await fetch('/api/save_labels', {
+                    method: 'POST',
+                    headers: {
+                        'Content-Type': 'application/json'
+                    },
+                    credentials: 'same-origin',
+                    keepalive,
+                    body: JSON.stringify({ labels: batch })
+                });
+                if (!response.ok) {
+                    throw new Error(`HTTP ${response.status}`);
+                }
+                data = await response.json();
+            } catch (error) {
+                console.warn('提交标注失败，稍后重试:', error);
+                this.retryLater();
+                return;
+            }
+            
+            let retry = false;
+            data.results.forEach((result, index) => {
+                const label = batch[index];
+                const key = LabelSaveQueue.key(label.username, label.speaker, label.audio_file);
+                const entry = this.entries[key];
+                // 提交期间同一音频又保存过（本页面或其他页面）时保留新的标注
+                const isSubmitted = (stored) => stored && stored.label.client_id === label.client_id;
+                if (result.success) {
+                    this.versions[key] = result.version;
+                    this.updateStored(key, (stored) => {
+                        if (!stored || isSubmitted(stored)) {
+                            return null;
+                        }
+                        // 新的修改是在本次提交之后做的，基于本次保存后的版本
+                        stored.label.version = result.version;
+                        return stored;
+                    });
+                } else if (result.conflict) {
+                    const latest = result.current ? result.current.version : 0;
+                    this.versions[key] = latest;
+                    if (keepalive) {
+                        // 页面关闭时浏览器不显示对话框（confirm 直接返回 false），不能据此丢弃修改
+                        deferred.add(key);
+                        return;
+                    }
+                    // 先询问再修改存储，等待确认期间其他页面写入的条目不会被覆盖
+                    const rebase = entry && (!this.onConflict || this.onConflict(entry, result.current));
+                    this.updateStored(key, (stored) => {
+                        if (rebase && stored) {
+                            stored.label.version = latest;
+                            return stored;
+                        }
+                        // 放弃的只是本次提交的修改，其间新保存的标注仍然保留（提交时会再次检查冲突）
+                        return isSubmitted(stored) ? null : stored;
+                    });
+                } else if (result.retryable === false) {
+                    this.updateStored(key, (stored) => isSubmitted(stored) ? null : stored);
+                    if (this.onFailure) {
+                        this.onFailure({ label, completeness: entry ? entry.completeness : [] }, result.error);
+                    }
+                } else {
+                    retry = true;
+                }
+            });
+            
+            if (retry) {
+                this.retryLater();
+                return;
+            }
+            this.retryDelay = 0;
+        }
+    }
+}
+
+const labelSaveQueue = new LabelSaveQueue();
@@ -15,6 +15,10 @@ class EmotionLabelingApp {
     }
 
     async initApp() {
+        // 标注在后台批量提交，提交被服务器拒绝时提示重新标注
+        labelSaveQueue.onFailure = (entry, error) => this.handleLabelSaveFailure(entry, error);
+        labelSaveQueue.onConflict = (entry, current) => this.handleLabelConflict(entry, current);
+        
         // 初始化用户管理
         this.userManager = new UserManager();
         const isAuthenticated = await this.userManager.initAuth();
@@ -36,7 +40,10 @@ class EmotionLabelingApp {
         
         // 初始化说话人列表
         try {
-            await this.audioListManager.initSpeakers(this.userManager.getCurrentUsername());
+            await this.audioListManager.initSpeakers(
+                this.userManager.getCurrentUsername(),
+                this.userManager.bootstrapData
+            );
         } catch (error) {
             console.error('初始化说话人列表失败:', error);
         }
@@ -56,6 +63,7 @@ class EmotionLabelingApp {
             speakerSelect: document.getElementById('speaker-select'),
             audioListContainer: document.getElementById('audio-list-container'),
             audioPlayer: document.getElementById('audio-player'),
+            waveformCanvas: document.getElementById('waveform-canvas'),
             playCountValue: document.getElementById('play-count-value'),
             
             // 标注相关元素
@@ -90,7 +98,7 @@ class EmotionLabelingApp {
 
     initModules(elements) {
         // 初始化音频播放器
-        this.audioPlayer = new AudioPlayer(elements.audioPlayer, elements.playCountValue);
+        this.audioPlayer = new AudioPlayer(elements.audioPlayer, elements.playCountValue, elements.waveformCanvas);
         
         // 初始化音频列表管理器
         this.audioListManager = new AudioListManager(elements.speakerSelect, elements.audioListContainer);
@@ -238,6 +246,13 @@ class EmotionLabelingApp {
                 }
             } else {
                 console.log(`File ${audioFile.file_name} is not marked as labeled. UI remains reset. Not calling dataService.getLabel.`);
+                // 未标注的音频在服务器上没有记录，保存时以版本0提交
+                labelSaveQueue.rememberVersion(
+                    this.userManager.getCurrentUsername(),
+                    this.audioListManager.currentSpeaker,
+                    audioFile.file_name,
+                    0
+                );
                 this.updateSaveButtonStatus(false);
             }
             this.updateSaveButtonVisibility(); // 统一更新保存按钮可见性
@@ -257,6 +272,40 @@ class EmotionLabelingApp {
         }
     }
 
+    /**
+     * 后台提交的标注被服务器拒绝（不会再重试）
+     */
+    handleLabelSaveFailure(entry, error) {
+        const label = entry.label;
+        console.error(`标注提交失败 ${label.speaker}/${label.audio_file}:`, error);
+        if (this.audioListManager && label.speaker === this.audioListManager.currentSpeaker) {
+            const index = this.audioListManager.audioList.findIndex(audio => audio.file_name === label.audio_file);
+            this.audioListManager.updateAudioLabelStatus(index, false, ['none']);
+        }
+        alert(`音频 ${label.audio_file} 的标注保存失败（${error}），请重新标注`);
+    }
+
+    /**
+     * 后台提交时发现标注已在其他页面修改
+     * @returns {boolean} 是否用本页面的标注覆盖
+     */
+    handleLabelConflict(entry, current) {
+        const label = entry.label;
+        const overwrite = confirm(
+            `音频 ${label.audio_file} 的标注已在其他页面修改。\n` +
+            '确定：用本页面的标注覆盖；取消：放弃本页面的修改'
+        );
+        if (!overwrite && this.audioListManager && label.speaker === this.audioListManager.currentSpeaker) {
+            const index = this.audioListManager.audioList.findIndex(audio => audio.file_name === label.audio_file);
+            this.audioListManager.updateAudioLabelStatus(
+                index,
+                Boolean(current),
+                current ? current.annotation_completeness : ['none']
+            );
+        }
+        return overwrite;
+    }
+
     /**
      * 根据当前模式调用相应的保存方法
      */
@@ -275,12 +324,14 @@ class EmotionLabelingApp {
         const currentAudio = this.audioListManager.getCurrentAudio();
         if (!currentAudio) return;
         
+        // 只提交VA，已保存的离散情感标注保持不变
         const annotation = this.emotionAnnotator.getCurrentAnnotation();
         const labelData = {
             speaker: this.audioListManager.currentSpeaker,
             audio_file: currentAudio.file_name,
             username: this.userManager.getCurrentUsername(),
-            ...annotation
+            v_value: annotation.v_value,
+            a_value: annotation.a_value
         };
         
         const saveButton = document.getElementById('save-va-button');
@@ -288,9 +339,9 @@ class EmotionLabelingApp {
         saveButton.textContent = '保存中...';
         
         try {
-            const result = await DataService.saveLabel(labelData);
+            const completeness = this.emotionAnnotator.getAnnotationCompleteness();
+            const result = await DataService.saveLabel(labelData, completeness);
             if (result.success) {
-                const completeness = this.emotionAnnotator.getAnnotationCompleteness();
                 this.audioListManager.updateAudioLabelStatus(
                     this.audioListManager.currentAudioIndex, 
                     true, 
@@ -318,12 +369,15 @@ class EmotionLabelingApp {
         const currentAudio = this.audioListManager.getCurrentAudio();
         if (!currentAudio) return;
         
+        // 只提交离散情感标注，已保存的VA保持不变
         const annotation = this.emotionAnnotator.getCurrentAnnotation();
         const labelData = {
             speaker: this.audioListManager.currentSpeaker,
             audio_file: currentAudio.file_name,
             username: this.userManager.getCurrentUsername(),
-            ...annotation
+            emotion_type: annotation.emotion_type,
+            discrete_emotion: annotation.discrete_emotion,
+            patient_status: annotation.patient_status
         };
         
         const saveButton = document.getElementById('save-discrete-button');
@@ -331,9 +385,9 @@ class EmotionLabelingApp {
         saveButton.textContent = '保存中...';
         
         try {
-            const result = await DataService.saveLabel(labelData);
+            const completeness = this.emotionAnnotator.getAnnotationCompleteness();
+            const result = await DataService.saveLabel(labelData, completeness);
             if (result.success) {
-                const completeness = this.emotionAnnotator.getAnnotationCompleteness();
                 this.audioListManager.updateAudioLabelStatus(
                     this.audioListManager.currentAudioIndex, 
                     true, 
@@ -6,14 +6,51 @@ class UserManager {
     constructor() {
         this.currentUsername = '';
         this.previousUsername = '';
+        this.bootstrapData = null;
     }
 
     /**
      * 初始化用户认证
+     * 
+     * 通过 /api/bootstrap 验证会话，同时取得标注页面的启动数据（保存在 bootstrapData 中）。
+     * 只有 401 表示未登录；启动数据获取失败（服务器错误、网络错误）时改用会话状态接口验证，
+     * 页面数据由各接口分别加载
      */
     async initAuth() {
         try {
-            // 通过服务器端验证用户会话状态
+            const lastSpeaker = localStorage.getItem('emotion_labeling_last_speaker');
+            const response = await DataService.getBootstrap(lastSpeaker);
+            
+            if (response.status === 401) {
+                // 用户未登录，重定向到登录页面
+                window.location.href = '/login';
+                return false;
+            }
+            if (response.ok) {
+                const data = await response.json();
+                if (data.authenticated) {
+                    this.previousUsername = this.currentUsername;
+                    this.currentUsername = data.username;
+                    this.bootstrapData = data;
+                    return true;
+                }
+                window.location.href = '/login';
+                return false;
+            }
+            console.error(`获取启动数据失败 (HTTP ${response.status})，改用会话状态接口`);
+        } catch (error) {
+            console.error('获取启动数据时出错，改用会话状态接口:', error);
+        }
+        
+        this.bootstrapData = null;
+        return this.checkSessionStatus();
+    }
+
+    /**
+     * 通过会话状态接口验证用户会话
+     */
+    async checkSessionStatus() {
+        try {
             const response = await fetch('/api/user/session-status', {
                 method: 'GET',
                 credentials: 'same-origin'  // 确保发送Cookie
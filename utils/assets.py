@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+静态资源清单
+utils/build_assets.py 把各页面的 JS/CSS 合并压缩后写入 static/dist/，文件名带内容哈希，
+并生成 manifest.json。模板通过 asset_url / asset_urls 引用资源：
+已构建时返回带哈希的文件（一年的 immutable 缓存），未构建时（开发环境）退回原始文件
+"""
+
+import os
+import json
+import threading
+from flask import request, url_for
+
+# 构建输出目录（相对 static/）
+DIST_FOLDER = 'dist'
+MANIFEST_FILENAME = 'manifest.json'
+
+# 各页面的资源包：包名 -> 按加载顺序排列的源文件（相对 static/）
+BUNDLES = {
+    'index.js': [
+        'js/userManager.js',
+        'js/audioPlayer.js',
+        'js/audioListManager.js',
+        'js/emotionAnnotator.js',
+        'js/keyboardHandler.js',
+        'js/dataService.js',
+        'js/main.js',
+    ],
+    'test.js': ['js/test.js'],
+    'consistency_test.js': ['js/consistency_test.js'],
+    'admin.js': ['js/admin.js'],
+    'login.js': ['js/login.js'],
+    'style.css': ['css/style.css'],
+    'admin.css': ['css/admin.css'],
+    'login.css': ['css/login.css'],
+}
+
+# 带哈希的资源缓存一年，内容变化时文件名随之变化
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+class AssetManifest:
+    """读取构建清单，解析模板中引用的资源地址"""
+    
+    def __init__(self):
+        self._manifest = {'bundles': {}, 'files': {}}
+        self._mtime = None
+        self._lock = threading.Lock()
+    
+    def init_app(self, app):
+        """注册模板函数和带哈希资源的缓存头"""
+        self.path = os.path.join(app.static_folder, DIST_FOLDER, MANIFEST_FILENAME)
+        app.jinja_env.globals['asset_url'] = self.asset_url
+        app.jinja_env.globals['asset_urls'] = self.asset_urls
+        app.after_request(self.set_cache_headers)
+    
+    def _load(self):
+        """清单文件变化（重新构建）后重新读取"""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime != self._mtime:
+            with self._lock:
+                if mtime != self._mtime:
+                    manifest = {'bundles': {}, 'files': {}}
+                    if mtime is not None:
+                        try:
+                            with open(self.path, 'r', encoding='utf-8') as f:
+                                manifest.update(json.load(f))
+                        except (OSError, ValueError) as e:
+                            print(f"读取静态资源清单失败: {e}")
+                    self._manifest = manifest
+                    self._mtime = mtime
+        return self._manifest
+    
+    def asset_urls(self, name):
+        """
+        资源包或单个文件的地址列表
+        
+        Args:
+            name (str): BUNDLES 中的包名，或相对 static/ 的文件路径
+        
+        Returns:
+            list: 已构建时为带哈希的单个文件；未构建的资源包返回各源文件
+        """
+        manifest = self._load()
+        if name in manifest['bundles']:
+            return [url_for('static', filename=manifest['bundles'][name])]
+        if name in BUNDLES:
+            return [url_for('static', filename=source) for source in BUNDLES[name]]
+        return [url_for('static', filename=manifest['files'].get(name, name))]
+    
+    def asset_url(self, name):
+        """单个文件（或只有一个源文件的资源包）的地址"""
+        urls = self.asset_urls(name)
+        if len(urls) != 1:
+            raise ValueError(f"资源包 {name} 未构建，包含多个文件，请使用 asset_urls")
+        return urls[0]
+    
+    @staticmethod
+    def set_cache_headers(response):
+        """带哈希的资源（static/dist/ 下）使用一年的 immutable 缓存"""
+        filename = (request.view_args or {}).get('filename', '')
+        if (request.endpoint == 'static' and filename.startswith(DIST_FOLDER + '/')
+                and not filename.endswith(MANIFEST_FILENAME) and response.status_code in (200, 304)):
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = IMMUTABLE_MAX_AGE
+            response.cache_control.immutable = True
+        return response
\ No newline at end of file
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+音频清单扫描脚本
+并行扫描 emotion_annotation 下的各说话人目录，统计音频数量和总时长（WAV 只读取文件头），
+结果写入 group_assignments.db 的 audio_inventory 表；按说话人（spkN-x-y 归入 spkN）汇总后
+可直接生成 scripts/init_all_db.import_group_data 使用的分组文件（data/分组.txt）格式
+"""
+
+import os
+import sys
+import struct
+import sqlite3
+import argparse
+from datetime import datetime
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from config import Config
+from models.emotion_model import get_speaker_group
+from scripts.init_all_db import init_group_assignment_database
+
+AUDIO_EXTENSIONS = ('.wav', '.mp3', '.flac', '.m4a')
+
+def get_inventory_db_path():
+    """清单表所在数据库（与分组表放在一起）"""
+    return os.path.join(Config.DATABASE_FOLDER, 'group_assignments.db')
+
+def connect_inventory_db():
+    """
+    打开清单表所在数据库
+    
+    应用启动时只检查 group_assignments.db 是否存在，因此在 init_all_db 之前扫描时
+    先创建完整的分组表结构，不能只留下 audio_inventory 一张表
+    """
+    os.makedirs(Config.DATABASE_FOLDER, exist_ok=True)
+    conn = sqlite3.connect(get_inventory_db_path())
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'speaker_groups'").fetchone():
+        init_group_assignment_database(conn)
+    init_inventory_table(conn)
+    return conn
+
+def init_inventory_table(conn):
+    """创建音频清单表"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS audio_inventory (
+            speaker_dir TEXT PRIMARY KEY,      -- 目录名，如 spk2-1-3
+            speaker_id TEXT NOT NULL,          -- 所属说话人，如 spk2
+            file_count INTEGER NOT NULL,
+            total_duration REAL NOT NULL,      -- 秒，无法读取时长的文件不计入
+            unreadable_count INTEGER NOT NULL, -- 非 WAV 或文件头损坏的文件数
+            dir_mtime REAL NOT NULL,           -- 目录树（含子目录）中最新的修改时间
+            scanned_at TIMESTAMP NOT NULL
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_audio_inventory_speaker ON audio_inventory(speaker_id)')
+
+def read_wav_duration(file_path):
+    """
+    只读取 WAV 文件头计算时长
+    
+    遍历 RIFF 块，取 fmt 块的字节率和 data 块的大小，不读取音频数据
+    
+    Returns:
+        float: 时长（秒），不是有效 WAV 文件时返回None
+    """
+    try:
+        with open(file_path, 'rb') as f:
+            header = f.read(12)
+            if len(header) < 12 or header[:4] not in (b'RIFF', b'RF64') or header[8:12] != b'WAVE':
+                return None
+            
+            byte_rate = None
+            while True:
+                chunk = f.read(8)
+                if len(chunk) < 8:
+                    return None
+                chunk_id, chunk_size = struct.unpack('<4sI', chunk)
+                if chunk_id == b'fmt ':
+                    fmt = f.read(chunk_size)
+                    if len(fmt) < 12:
+                        return None
+                    byte_rate = struct.unpack('<I', fmt[8:12])[0]
+                    if chunk_size % 2:
+                        f.seek(1, os.SEEK_CUR)
+                elif chunk_id == b'data':
+                    if not byte_rate:
+                        return None
+                    if chunk_size == 0xFFFFFFFF:
+                        # 大小未知（流式写入/RF64），以文件剩余长度计算
+                        chunk_size = os.fstat(f.fileno()).st_size - f.tell()
+                    return chunk_size / byte_rate
+                else:
+                    # 块按偶数字节对齐
+                    f.seek(chunk_size + (chunk_size % 2), os.SEEK_CUR)
+    except (OSError, struct.error):
+        return None
+
+def tree_mtime(path):
+    """目录树（含子目录）中最新的修改时间；子目录中增删音频只会改变该子目录的修改时间"""
+    latest = 0.0
+    stack = [path]
+    while stack:
+        directory = stack.pop()
+        latest = max(latest, os.stat(directory).st_mtime)
+        with os.scandir(directory) as entries:
+            stack.extend(entry.path for entry in entries if entry.is_dir(follow_symlinks=False))
+    return latest
+
+def scan_speaker_dir(path):
+    """
+    扫描单个说话人目录（含子目录）
+    
+    Returns:
+        dict: speaker_dir, file_count, total_duration, unreadable_count, dir_mtime（同 tree_mtime）
+    """
+    file_count = 0
+    total_duration = 0.0
+    unreadable_count = 0
+    latest = 0.0
+    
+    stack = [path]
+    while stack:
+        directory = stack.pop()
+        # 先取修改时间再读取目录内容，扫描期间的改动会在下次扫描时发现
+        latest = max(latest, os.stat(directory).st_mtime)
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                    continue
+                extension = os.path.splitext(entry.name)[1].lower()
+                if extension not in AUDIO_EXTENSIONS:
+                    continue
+                file_count += 1
+                duration = read_wav_duration(entry.path) if extension == '.wav' else None
+                if duration is None:
+                    unreadable_count += 1
+                else:
+                    total_duration += duration
+    
+    return {
+        'speaker_dir': os.path.basename(path),
+        'file_count': file_count,
+        'total_duration': total_duration,
+        'unreadable_count': unreadable_count,
+        'dir_mtime': latest
+    }
+
+def scan_inventory(audio_folder=None, workers=8, full=False, verbose=False):
+    """
+    扫描音频目录并更新 audio_inventory 表
+    
+    目录树（含子目录）修改时间未变化的说话人目录沿用上次结果（full=True 时全部重新扫描）；
+    已不存在的目录从表中删除
+    
+    Args:
+        audio_folder (str): 音频根目录，默认 Config.AUDIO_FOLDER
+        workers (int): 并行扫描线程数
+        full (bool): 是否忽略上次结果全部重新扫描
+        verbose (bool): 是否显示详细信息
+    
+    Returns:
+        dict: {'scanned': 重新扫描的目录数, 'unchanged': 沿用的目录数, 'removed': 删除的目录数}
+    """
+    audio_folder = audio_folder or Config.AUDIO_FOLDER
+    with os.scandir(audio_folder) as entries:
+        speaker_dirs = {entry.name: entry.path for entry in entries if entry.is_dir()}
+    
+    conn = connect_inventory_db()
+    try:
+        previous = dict(conn.execute('SELECT speaker_dir, dir_mtime FROM audio_inventory'))
+        removed = [name for name in previous if name not in speaker_dirs]
+        
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            # 增删音频会改变所在目录的修改时间；原地替换文件内容不会，此时需使用 full=True
+            paths = [path for _, path in sorted(speaker_dirs.items())]
+            if not full:
+                paths = [
+                    path for path, stamp in zip(paths, executor.map(tree_mtime, paths))
+                    if previous.get(os.path.basename(path)) != stamp
+                ]
+            results = list(executor.map(scan_speaker_dir, paths))
+        
+        scanned_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with conn:
+            conn.executemany('DELETE FROM audio_inventory WHERE speaker_dir = ?', [(name,) for name in removed])
+            conn.executemany('''
+                INSERT OR REPLACE INTO audio_inventory
+                (speaker_dir, speaker_id, file_count, total_duration, unreadable_count, dir_mtime, scanned_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', [(
+                result['speaker_dir'],
+                get_speaker_group(result['speaker_dir']),
+                result['file_count'],
+                round(result['total_duration'], 3),
+                result['unreadable_count'],
+                result['dir_mtime'],
+                scanned_at
+            ) for result in results])
+    finally:
+        conn.close()
+    
+    if verbose:
+        for result in results:
+            print(f"目录 {result['speaker_dir']}: {result['file_count']} 个音频, "
+                  f"{result['total_duration']:.2f} 秒, {result['unreadable_count']} 个无法读取时长")
+    
+    return {'scanned': len(results), 'unchanged': len(speaker_dirs) - len(results), 'removed': len(removed)}
+
+def get_speaker_inventory():
+    """
+    按说话人汇总清单
+    
+    Returns:
+        list: [{'speaker_id', 'total_duration', 'file_count', 'unreadable_count',
+                'segments': [{'speaker_dir', 'file_count', 'total_duration'}, ...]}, ...]，按说话人编号排序
+    """
+    conn = connect_inventory_db()
+    conn.row_factory = sqlite3.Row
+    try:
+        rows = conn.execute('''
+            SELECT speaker_dir, speaker_id, file_count, total_duration, unreadable_count
+            FROM audio_inventory
+            ORDER BY speaker_id, speaker_dir
+        ''').fetchall()
+    finally:
+        conn.close()
+    
+    speakers = {}
+    for row in rows:
+        speaker = speakers.setdefault(row['speaker_id'], {
+            'speaker_id': row['speaker_id'],
+            'total_duration': 0.0,
+            'file_count': 0,
+            'unreadable_count': 0,
+            'segments': []
+        })
+        speaker['total_duration'] += row['total_duration']
+        speaker['file_count'] += row['file_count']
+        speaker['unreadable_count'] += row['unreadable_count']
+        speaker['segments'].append({
+            'speaker_dir': row['speaker_dir'],
+            'file_count': row['file_count'],
+            'total_duration': row['total_duration']
+        })
+    
+    def speaker_sort_key(speaker_id):
+        digits = speaker_id[3:] if speaker_id.startswith('spk') else ''
+        return (0, int(digits), speaker_id) if digits.isdigit() else (1, 0, speaker_id)
+    
+    return [speakers[speaker_id] for speaker_id in sorted(speakers, key=speaker_sort_key)]
+
+def format_speaker_line(speaker):
+    """分组文件中的说话人行：spkX: 总时长 Y秒 段数 Z"""
+    return f"{speaker['speaker_id']}: 总时长 {speaker['total_duration']:.2f}秒 段数 {speaker['file_count']}"
+
+def write_group_file(groups, output_path):
+    """
+    按 data/分组.txt 的格式写出分组文件
+    
+    Args:
+        groups (list): 分组列表，每个分组是 get_speaker_inventory() 返回的说话人列表
+        output_path (str): 输出文件路径
+    """
+    lines = []
+    for group_id, speakers in enumerate(groups, start=1):
+        lines.append(f"=== 第{group_id}组 ===")
+        lines.extend(format_speaker_line(speaker) for speaker in speakers)
+        lines.append("")
+    with open(output_path, 'w', encoding='utf-8') as f:
+        f.write("\n".join(lines))
+
+def main():
+    """
+    主函数
+    """
+    parser = argparse.ArgumentParser(description='扫描音频目录，统计各说话人的音频数量和时长')
+    parser.add_argument('--audio-folder', default=Config.AUDIO_FOLDER,
+                        help=f'音频根目录 (默认: {Config.AUDIO_FOLDER})')
+    parser.add_argument('--workers', type=int, default=8, help='并行扫描线程数 (默认: 8)')
+    parser.add_argument('--full', action='store_true', help='忽略上次结果，全部重新扫描')
+    parser.add_argument('--export', metavar='PATH',
+                        help='将说话人汇总按分组文件的说话人行格式写出（全部说话人作为第1组）')
+    parser.add_argument('--verbose', action='store_true', help='显示每个目录的扫描结果')
+    args = parser.parse_args()
+    
+    print(f"开始扫描音频目录: {args.audio_folder}")
+    summary = scan_inventory(args.audio_folder, workers=args.workers, full=args.full, verbose=args.verbose)
+    print(f"重新扫描 {summary['scanned']} 个目录，沿用 {summary['unchanged']} 个，删除 {summary['removed']} 个")
+    
+    speakers = get_speaker_inventory()
+    print(f"\n=== 说话人统计（共 {len(speakers)} 个） ===")
+    for speaker in speakers:
+        segments = ", ".join(f"{segment['speaker_dir']}({segment['file_count']})" for segment in speaker['segments'])
+        unreadable = f"，{speaker['unreadable_count']} 个无法读取时长" if speaker['unreadable_count'] else ""
+        print(f"{format_speaker_line(speaker)}{unreadable}  [{segments}]")
+    
+    if args.export:
+        write_group_file([speakers], args.export)
+        print(f"\n已写出: {args.export}")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
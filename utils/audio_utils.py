@@ -1,8 +1,34 @@
-from pydub import AudioSegment
-import pydub.exceptions
+import os
+import wave
+from functools import lru_cache
 
 def get_audio_duration(file_path):
-    """获取音频文件的时长（秒）"""
+    """
+    获取音频文件的时长（秒）
+    
+    按文件路径、修改时间和大小缓存，同一文件重复保存标注时不再解码
+    """
+    try:
+        stat = os.stat(file_path)
+    except OSError as e:
+        print(f"获取音频时长时出错: {e}")
+        return 0.0
+    return _decode_duration(file_path, stat.st_mtime_ns, stat.st_size)
+
+@lru_cache(maxsize=4096)
+def _decode_duration(file_path, mtime_ns, size):
+    # PCM WAV 直接读取文件头，不解码音频数据
+    if file_path.lower().endswith('.wav'):
+        try:
+            with wave.open(file_path, 'rb') as f:
+                return f.getnframes() / float(f.getframerate())
+        except (wave.Error, EOFError, ZeroDivisionError):
+            pass  # 非 PCM 编码等情况交给 pydub
+    
+    # pydub 导入开销较大且只有保存标注时才用到，延迟到首次调用时再导入
+    from pydub import AudioSegment
+    import pydub.exceptions
+    
     try:
         audio = AudioSegment.from_file(file_path)
         return len(audio) / 1000.0  # 毫秒转换为秒
@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+静态资源构建脚本
+按 utils/assets.py 中的 BUNDLES 合并各页面的 JS/CSS 并压缩，CSS 中引用的图片和
+static/images 下的图片一并复制，输出文件名带内容哈希（static/dist/），写出 manifest.json，
+最后为输出文件生成预压缩的 .gz / .br。
+
+压缩只删除注释和多余空白（保留换行，不改变自动分号插入），不改写变量名。
+旧版本的输出保留一次构建，正在加载旧页面的浏览器仍能取到对应文件
+"""
+
+import os
+import re
+import sys
+import json
+import hashlib
+import argparse
+import posixpath
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from utils.assets import BUNDLES, DIST_FOLDER, MANIFEST_FILENAME
+from utils.compression import precompress_static_files
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.svg', '.webp', '.ico')
+
+# 这些符号或关键字之后的 / 是正则表达式的开始，而不是除号
+_REGEX_PRECEDING_CHARS = set('(,=:[!&|?{};+-*%<>~^')
+_REGEX_PRECEDING_WORDS = {
+    'return', 'typeof', 'instanceof', 'in', 'of', 'new', 'delete', 'void',
+    'throw', 'case', 'do', 'else', 'yield', 'await'
+}
+
+def _is_word_char(ch):
+    return ch.isalnum() or ch in '_$' or ord(ch) > 127
+
+def minify_js(source):
+    """
+    删除 JS 注释和多余空白
+    
+    逐字符扫描，跳过字符串、模板字符串（含 ${} 嵌套）和正则表达式字面量；
+    换行保留为单个换行，行内连续空白只在两侧都是标识符字符（或 + +、- -）时保留一个空格
+    """
+    out = []
+    i = 0
+    n = len(source)
+    # 模板字符串 ${} 中的代码：每层记录尚未闭合的 { 数
+    template_braces = []
+    last_word = ''
+    
+    def last_char(skip_space=False):
+        # 已输出内容的最后一个字符（skip_space 时跳过行内空格）
+        for piece in reversed(out):
+            text = piece.rstrip(' ') if skip_space else piece
+            if text:
+                return text[-1]
+        return ''
+    
+    def read_template(i):
+        # 从开头的 ` 或 ${} 结束的 } 开始，读取模板字符串直到结束的 ` 或下一个 ${，
+        # 返回 (结束位置, 是否进入 ${)
+        start = i
+        i += 1
+        while i < n:
+            ch = source[i]
+            if ch == '\\':
+                i += 2
+                continue
+            if ch == '`':
+                out.append(source[start:i + 1])
+                return i + 1, False
+            if ch == '$' and i + 1 < n and source[i + 1] == '{':
+                out.append(source[start:i + 2])
+                return i + 2, True
+            i += 1
+        out.append(source[start:])
+        return n, False
+    
+    while i < n:
+        ch = source[i]
+        nxt = source[i + 1] if i + 1 < n else ''
+        
+        # 注释
+        if ch == '/' and nxt == '/':
+            end = source.find('\n', i)
+            i = n if end == -1 else end
+            continue
+        if ch == '/' and nxt == '*':
+            end = source.find('*/', i + 2)
+            comment = source[i:n if end == -1 else end]
+            i = n if end == -1 else end + 2
+            # 注释相当于空白：跨行的注释保留换行（自动分号插入），避免把两侧的标识符连在一起
+            if '\n' in comment and last_char() not in ('', '\n'):
+                out.append('\n')
+            elif i < n and _is_word_char(last_char() or ' ') and _is_word_char(source[i]):
+                out.append(' ')
+            continue
+        
+        # 空白
+        if ch.isspace():
+            start = i
+            while i < n and source[i].isspace():
+                i += 1
+            prev, following = last_char(), source[i] if i < n else ''
+            if not prev or prev == '\n':
+                continue
+            if '\n' in source[start:i]:
+                out.append('\n')
+            elif ((_is_word_char(prev) and following and _is_word_char(following))
+                  or (prev == following and prev in '+-') or '/' in (prev, following)):
+                out.append(' ')
+            continue
+        
+        # 字符串
+        if ch in '"\'':
+            start = i
+            i += 1
+            while i < n and source[i] != ch and source[i] != '\n':
+                i += 2 if source[i] == '\\' else 1
+            i += 1
+            out.append(source[start:i])
+            last_word = ''
+            continue
+        
+        # 模板字符串
+        if ch == '`':
+            i, entered = read_template(i)
+            if entered:
+                template_braces.append(0)
+            last_word = ''
+            continue
+        
+        # 模板字符串 ${} 中的括号
+        if template_braces:
+            if ch == '{':
+                template_braces[-1] += 1
+            elif ch == '}':
+                if template_braces[-1] == 0:
+                    template_braces.pop()
+                    i, entered = read_template(i)
+                    if entered:
+                        template_braces.append(0)
+                    last_word = ''
+                    continue
+                template_braces[-1] -= 1
+        
+        # 正则表达式字面量
+        if ch == '/':
+            prev = last_char(skip_space=True)
+            if not prev or prev == '\n' or prev in _REGEX_PRECEDING_CHARS or last_word in _REGEX_PRECEDING_WORDS:
+                start = i
+                i += 1
+                in_class = False
+                while i < n and source[i] != '\n':
+                    c = source[i]
+                    if c == '\\':
+                        i += 2
+                        continue
+                    if c == '[':
+                        in_class = True
+                    elif c == ']':
+                        in_class = False
+                    elif c == '/' and not in_class:
+                        break
+                    i += 1
+                i += 1
+                while i < n and _is_word_char(source[i]):
+                    i += 1
+                out.append(source[start:i])
+                last_word = ''
+                continue
+        
+        # 标识符 / 关键字 / 数字
+        if _is_word_char(ch):
+            start = i
+            while i < n and _is_word_char(source[i]):
+                i += 1
+            last_word = source[start:i]
+            out.append(last_word)
+            continue
+        
+        out.append(ch)
+        last_word = ''
+        i += 1
+    
+    return ''.join(out).strip() + '\n'
+
+def minify_css(source):
+    """删除 CSS 注释和多余空白（字符串内容不变）"""
+    parts = re.split(r'("(?:[^"\\]|\\.)*"|\'(?:[^\'\\]|\\.)*\')', source)
+    for index in range(0, len(parts), 2):
+        text = re.sub(r'/\*.*?\*/', '', parts[index], flags=re.S)
+        text = re.sub(r'\s+', ' ', text)
+        parts[index] = re.sub(r'\s*([{};,])\s*', r'\1', text)
+    return ''.join(parts).replace(';}', '}').strip() + '\n'
+
+def _fingerprint(name, content):
+    """在扩展名前插入内容哈希：index.js -> index.3f2a1b4c.js"""
+    stem, ext = posixpath.splitext(name)
+    return f"{stem}.{hashlib.sha256(content).hexdigest()[:10]}{ext}"
+
+class AssetBuilder:
+    """构建一次静态资源"""
+    
+    def __init__(self, static_folder, verbose=False):
+        self.static_folder = static_folder
+        self.dist_folder = os.path.join(static_folder, DIST_FOLDER)
+        self.verbose = verbose
+        self.manifest = {'bundles': {}, 'files': {}}
+    
+    def _write(self, name, content):
+        """写出带哈希的文件，返回相对 static/ 的路径"""
+        relative = posixpath.join(DIST_FOLDER, _fingerprint(name, content))
+        path = os.path.join(self.static_folder, relative)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(content)
+        return relative
+    
+    def add_file(self, relative):
+        """复制单个文件（如图片），返回带哈希的路径"""
+        if relative not in self.manifest['files']:
+            with open(os.path.join(self.static_folder, relative), 'rb') as f:
+                content = f.read()
+            self.manifest['files'][relative] = self._write(relative, content)
+        return self.manifest['files'][relative]
+    
+    def _rewrite_css_urls(self, css, source):
+        """CSS 中的相对地址改为带哈希文件相对 dist/ 的地址"""
+        base = posixpath.dirname(source)
+        
+        def replace(match):
+            url = match.group(2).strip()
+            if re.match(r'^([a-z]+:|/|#)', url, re.I):
+                return match.group(0)
+            path = url.split('?')[0].split('#')[0]
+            relative = posixpath.normpath(posixpath.join(base, path))
+            if not os.path.isfile(os.path.join(self.static_folder, relative)):
+                print(f"  ⚠ {source} 引用的文件不存在: {url}")
+                return match.group(0)
+            hashed = self.add_file(relative)
+            return f"url('{posixpath.relpath(hashed, DIST_FOLDER)}')"
+        
+        return re.sub(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)', replace, css)
+    
+    def add_bundle(self, name, sources):
+        """合并并压缩一个资源包"""
+        pieces = []
+        for source in sources:
+            with open(os.path.join(self.static_folder, source), 'r', encoding='utf-8') as f:
+                text = f.read()
+            if name.endswith('.css'):
+                pieces.append(minify_css(self._rewrite_css_urls(text, source)))
+            else:
+                # 各文件原本是独立的 <script>，用分号隔开避免末尾缺少分号时与下一个文件相连
+                pieces.append(minify_js(text) + ';')
+        content = '\n'.join(pieces).encode('utf-8')
+        self.manifest['bundles'][name] = self._write(name, content)
+        if self.verbose:
+            original = sum(os.path.getsize(os.path.join(self.static_folder, source)) for source in sources)
+            print(f"  {name}: {len(sources)} 个文件 {original} -> {len(content)} 字节 "
+                  f"({self.manifest['bundles'][name]})")
+    
+    def build(self, bundles=BUNDLES):
+        """
+        构建全部资源包和图片，写出清单并清理更早的输出
+        
+        Returns:
+            dict: 新的清单
+        """
+        os.makedirs(self.dist_folder, exist_ok=True)
+        manifest_path = os.path.join(self.dist_folder, MANIFEST_FILENAME)
+        previous = {'bundles': {}, 'files': {}}
+        if os.path.exists(manifest_path):
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                previous.update(json.load(f))
+        
+        for name, sources in bundles.items():
+            self.add_bundle(name, sources)
+        images_folder = os.path.join(self.static_folder, 'images')
+        if os.path.isdir(images_folder):
+            for filename in sorted(os.listdir(images_folder)):
+                if filename.lower().endswith(IMAGE_EXTENSIONS):
+                    self.add_file(posixpath.join('images', filename))
+        
+        # 写入临时文件后替换，运行中的进程不会读到写了一半的清单
+        temp_path = manifest_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+        os.replace(temp_path, manifest_path)
+        
+        self._clean({
+            path for manifest in (self.manifest, previous)
+            for section in ('bundles', 'files') for path in manifest[section].values()
+        })
+        precompress_static_files(self.dist_folder)
+        return self.manifest
+    
+    def _clean(self, keep):
+        """删除不属于本次和上一次构建的输出（及其压缩文件）"""
+        removed = 0
+        for root, _, files in os.walk(self.dist_folder):
+            for filename in files:
+                path = os.path.join(root, filename)
+                relative = posixpath.join(DIST_FOLDER, Path(os.path.relpath(path, self.dist_folder)).as_posix())
+                if relative.endswith(('.gz', '.br')):
+                    relative = relative[:-3]
+                if relative in keep or filename == MANIFEST_FILENAME:
+                    continue
+                os.remove(path)
+                removed += 1
+        if self.verbose and removed:
+            print(f"  删除 {removed} 个旧文件")
+
+def main():
+    """
+    主函数
+    """
+    parser = argparse.ArgumentParser(description='合并压缩静态资源并生成带哈希的文件名')
+    parser.add_argument('--static-folder', default=str(project_root / 'static'),
+                        help='静态文件目录 (默认: static/)')
+    parser.add_argument('--verbose', action='store_true', help='显示每个资源包的大小')
+    args = parser.parse_args()
+    
+    manifest = AssetBuilder(args.static_folder, verbose=args.verbose).build()
+    print(f"构建完成: {len(manifest['bundles'])} 个资源包，{len(manifest['files'])} 个图片，"
+          f"清单 {os.path.join(args.static_folder, DIST_FOLDER, MANIFEST_FILENAME)}")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
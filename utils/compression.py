@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+响应压缩
+按 Accept-Encoding 协商 brotli / gzip，压缩 JSON、文本和脚本等响应：
+- 普通响应超过阈值时整体压缩
+- 流式响应（SSE、生成器）逐块压缩并刷新，客户端仍能及时收到每个事件
+- 静态文件优先直接返回预压缩的 .br / .gz 文件（由本脚本生成），不在请求时压缩
+
+brotli 为可选依赖，未安装时只使用 gzip
+"""
+
+import os
+import sys
+import zlib
+import argparse
+import mimetypes
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from flask import request, send_from_directory
+from werkzeug.security import safe_join
+from config import Config
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# 需要压缩的内容类型（音频、图片等已压缩的格式不处理）
+COMPRESSIBLE_MIMETYPES = {
+    'application/json',
+    'application/javascript',
+    'text/javascript',
+    'text/html',
+    'text/css',
+    'text/plain',
+    'text/csv',
+    'text/event-stream',
+    'image/svg+xml',
+}
+
+# 预压缩文件的扩展名，按优先顺序
+PRECOMPRESSED_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+def available_encodings():
+    """服务端支持的编码，按优先顺序"""
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+def negotiate_encoding(encodings=None):
+    """
+    根据请求的 Accept-Encoding 选择编码
+    
+    Returns:
+        str: 'br' / 'gzip'，客户端不接受压缩时返回None
+    """
+    encodings = encodings or available_encodings()
+    accepted = [encoding for encoding in encodings if request.accept_encodings[encoding] > 0]
+    if not accepted:
+        return None
+    # 质量值相同时按服务端的优先顺序
+    return max(accepted, key=lambda encoding: (request.accept_encodings[encoding], -encodings.index(encoding)))
+
+class _StreamCompressor:
+    """增量压缩器，统一 gzip 与 brotli 的接口"""
+    
+    def __init__(self, encoding, gzip_level, brotli_quality):
+        self.encoding = encoding
+        if encoding == 'br':
+            self._compressor = brotli.Compressor(quality=brotli_quality)
+        else:
+            # wbits=31：带 gzip 头和校验
+            self._compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+    
+    def compress(self, data, flush=False):
+        if self.encoding == 'br':
+            out = self._compressor.process(data)
+            return out + self._compressor.flush() if flush else out
+        out = self._compressor.compress(data)
+        return out + self._compressor.flush(zlib.Z_SYNC_FLUSH) if flush else out
+    
+    def finish(self):
+        if self.encoding == 'br':
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+class ResponseCompressor:
+    """Flask 响应压缩钩子"""
+    
+    def __init__(self, config=Config):
+        self.min_size = config.COMPRESSION_MIN_SIZE
+        self.gzip_level = config.COMPRESSION_GZIP_LEVEL
+        self.brotli_quality = config.COMPRESSION_BROTLI_QUALITY
+    
+    def init_app(self, app):
+        """注册静态文件预压缩版本的查找和响应压缩"""
+        self.static_folder = app.static_folder
+        app.before_request(self.serve_precompressed)
+        app.after_request(self.compress_response)
+    
+    def serve_precompressed(self):
+        """
+        静态文件请求：存在不旧于原文件的 .br / .gz 时直接返回该文件
+        
+        Returns:
+            Response 或 None（交给默认的静态文件处理）
+        """
+        if request.endpoint != 'static' or request.method not in ('GET', 'HEAD') or 'Range' in request.headers:
+            return None
+        filename = (request.view_args or {}).get('filename')
+        mimetype = mimetypes.guess_type(filename or '')[0]
+        if not filename or mimetype not in COMPRESSIBLE_MIMETYPES:
+            return None
+        path = safe_join(self.static_folder, filename)
+        if path is None or not os.path.isfile(path):
+            return None
+        
+        # 返回已有的预压缩文件不需要 brotli 模块
+        encodings = [encoding for encoding in PRECOMPRESSED_SUFFIXES if self._fresh_variant(path, encoding)]
+        encoding = negotiate_encoding(encodings) if encodings else None
+        if encoding is None:
+            return None
+        
+        response = send_from_directory(self.static_folder, filename + PRECOMPRESSED_SUFFIXES[encoding],
+                                       mimetype=mimetype)
+        response.headers['Content-Encoding'] = encoding
+        response.vary.add('Accept-Encoding')
+        return response
+    
+    @staticmethod
+    def _fresh_variant(path, encoding):
+        variant = path + PRECOMPRESSED_SUFFIXES[encoding]
+        try:
+            return os.stat(variant).st_mtime_ns >= os.stat(path).st_mtime_ns
+        except OSError:
+            return False
+    
+    def compress_response(self, response):
+        """按协商的编码压缩响应"""
+        if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+            return response
+        response.vary.add('Accept-Encoding')
+        
+        if (response.status_code < 200 or response.status_code in (204, 206, 304)
+                or 'Content-Encoding' in response.headers
+                or 'no-transform' in response.headers.get('Cache-Control', '')):
+            return response
+        if response.content_length is not None and response.content_length < self.min_size:
+            return response
+        
+        encoding = negotiate_encoding()
+        if encoding is None:
+            return response
+        
+        if response.is_streamed or response.direct_passthrough:
+            self._compress_stream(response, encoding)
+        else:
+            data = response.get_data()
+            if len(data) < self.min_size:
+                return response
+            compressor = _StreamCompressor(encoding, self.gzip_level, self.brotli_quality)
+            response.set_data(compressor.compress(data) + compressor.finish())
+        
+        response.headers['Content-Encoding'] = encoding
+        # 压缩后的字节与原始内容不同，强 ETag 改为弱 ETag
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+    
+    def _compress_stream(self, response, encoding):
+        """
+        流式压缩：生成器响应每块都刷新（保证 SSE 事件及时送达），文件响应只在结束时刷新
+        """
+        flush = not response.direct_passthrough
+        source = response.response
+        chunks = response.iter_encoded()
+        compressor = _StreamCompressor(encoding, self.gzip_level, self.brotli_quality)
+        
+        def generate():
+            try:
+                for chunk in chunks:
+                    out = compressor.compress(chunk, flush=flush)
+                    if out:
+                        yield out
+                yield compressor.finish()
+            finally:
+                # 文件响应需要关闭原始的文件对象
+                if hasattr(source, 'close'):
+                    source.close()
+        
+        response.direct_passthrough = False
+        response.response = generate()
+        response.headers.pop('Content-Length', None)
+
+def precompress_static_files(folder, min_size=None, verbose=False):
+    """
+    为静态目录下可压缩的文件生成 .gz（以及安装了 brotli 时的 .br），使用最高压缩级别
+    
+    已是最新的压缩文件跳过；压缩后没有变小的文件不生成
+    
+    Returns:
+        dict: {'compressed': 生成的文件数, 'unchanged': 跳过数}
+    """
+    min_size = Config.COMPRESSION_MIN_SIZE if min_size is None else min_size
+    summary = {'compressed': 0, 'unchanged': 0}
+    for root, _, files in os.walk(folder):
+        for name in files:
+            if name.endswith(tuple(PRECOMPRESSED_SUFFIXES.values())):
+                continue
+            if mimetypes.guess_type(name)[0] not in COMPRESSIBLE_MIMETYPES:
+                continue
+            path = os.path.join(root, name)
+            with open(path, 'rb') as f:
+                data = f.read()
+            if len(data) < min_size:
+                continue
+            
+            for encoding in available_encodings():
+                if ResponseCompressor._fresh_variant(path, encoding):
+                    summary['unchanged'] += 1
+                    continue
+                if encoding == 'br':
+                    compressed = brotli.compress(data, quality=11)
+                else:
+                    compressor = zlib.compressobj(9, zlib.DEFLATED, 31)
+                    compressed = compressor.compress(data) + compressor.flush()
+                variant = path + PRECOMPRESSED_SUFFIXES[encoding]
+                if len(compressed) >= len(data):
+                    if os.path.exists(variant):
+                        os.remove(variant)
+                    continue
+                with open(variant, 'wb') as f:
+                    f.write(compressed)
+                summary['compressed'] += 1
+                if verbose:
+                    print(f"  {os.path.relpath(variant, folder)}: {len(data)} -> {len(compressed)} 字节")
+    return summary
+
+def main():
+    """
+    主函数
+    """
+    parser = argparse.ArgumentParser(description='为静态文件生成预压缩的 .gz / .br 文件')
+    parser.add_argument('--static-folder', default=str(project_root / 'static'),
+                        help='静态文件目录 (默认: static/)')
+    parser.add_argument('--verbose', action='store_true', help='显示每个文件的压缩结果')
+    args = parser.parse_args()
+    
+    if brotli is None:
+        print("未安装 brotli，只生成 .gz 文件")
+    summary = precompress_static_files(args.static_folder, verbose=args.verbose)
+    print(f"生成 {summary['compressed']} 个压缩文件，{summary['unchanged']} 个已是最新")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
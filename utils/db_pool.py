@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SQLite 连接池
+为长期存活的模型对象复用数据库连接，避免每次操作都重新建立连接
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+class ConnectionPool:
+    """
+    单个 SQLite 数据库文件的连接池
+    
+    连接在线程间复用（同一时刻只被一个线程持有），归还时回滚未提交的事务
+    """
+    
+    def __init__(self, db_path, max_size=8, row_factory=None):
+        """
+        初始化连接池
+        
+        Args:
+            db_path (str): 数据库文件路径
+            max_size (int): 池中最多保留的空闲连接数
+            row_factory: 可选的行工厂（如 sqlite3.Row）
+        """
+        self.db_path = db_path
+        self.row_factory = row_factory
+        self.pid = os.getpid()
+        self._idle = queue.LifoQueue(maxsize=max_size)
+    
+    def _create_connection(self):
+        """新建一个数据库连接"""
+        conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        if self.row_factory is not None:
+            conn.row_factory = self.row_factory
+        return conn
+    
+    @contextmanager
+    def connection(self):
+        """
+        借出一个连接，使用完毕后自动归还
+        
+        Yields:
+            sqlite3.Connection: 数据库连接
+        """
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._create_connection()
+        
+        try:
+            yield conn
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            try:
+                self._idle.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+    
+    def close_all(self):
+        """关闭池中所有空闲连接"""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_pool(db_path, **kwargs):
+    """
+    获取指定数据库文件的连接池（每个进程每个文件一个）
+    
+    Args:
+        db_path (str): 数据库文件路径
+        **kwargs: 首次创建时传给 ConnectionPool 的参数
+    
+    Returns:
+        ConnectionPool: 连接池
+    """
+    pid = os.getpid()
+    pool = _pools.get(db_path)
+    if pool is None or pool.pid != pid:
+        with _pools_lock:
+            pool = _pools.get(db_path)
+            if pool is None or pool.pid != pid:
+                pool = ConnectionPool(db_path, **kwargs)
+                _pools[db_path] = pool
+    return pool
+
+def reset_pools():
+    """
+    清空本模块登记的连接池（get_pool 创建的池）
+    
+    fork 之后在子进程中调用，只释放对继承来的池的引用，不关闭其中的连接
+    （关闭会释放父进程持有的文件锁）；get_pool 发现进程号不同时本来也会新建连接池。
+    其他模块自行持有的连接和进程内缓存（如用户测试设置缓存）不在此处理
+    """
+    with _pools_lock:
+        _pools.clear()
\ No newline at end of file
@@ -3,31 +3,69 @@
 """
 从标注数据中提取音频文件用于一致性测试
 根据优先级条件选择符合要求的音频文件
+
+源音频目录只遍历一次并建立文件名索引；选中的文件由线程池并行导出
+（优先硬链接，其次 reflink，最后普通复制）；导出进度记录在输出目录的清单文件中，
+重新运行时跳过已完成且源文件未变化的条目
 """
 
 import json
 import os
 import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import List, Dict, Tuple
+from typing import List, Dict, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+DEFAULT_BASE_DIR = Path("/mnt/shareEEx/liuyang/code/emotion_labeling_refactoring")
+
+# 输出目录中的导出清单：输出文件名 -> 源文件信息
+MANIFEST_FILENAME = ".extract_manifest.json"
+
+# Linux FICLONE ioctl（btrfs / xfs 等支持写时复制的文件系统）
+FICLONE = 0x40049409
+
+LINK_MODES = ('auto', 'hardlink', 'reflink', 'copy')
 
 class ConsistencyTestDataExtractor:
-    def __init__(self):
-        # 定义路径
-        self.base_dir = Path("/mnt/shareEEx/liuyang/code/emotion_labeling_refactoring")
-        self.json_dir = self.base_dir / "gzx"
-        self.source_audio_dir = self.base_dir / "data" / "emotion_annotation"
-        self.output_dir = self.base_dir / "data" / "consistency_test"
+    def __init__(self,
+                 base_dir: Path = DEFAULT_BASE_DIR,
+                 json_dir: Optional[Path] = None,
+                 source_audio_dir: Optional[Path] = None,
+                 output_dir: Optional[Path] = None,
+                 json_prefixes: Tuple[str, ...] = ("spk2", "spk11"),
+                 workers: int = 8,
+                 link_mode: str = 'auto'):
+        # 定义路径（未指定时使用 base_dir 下的默认位置）
+        self.base_dir = Path(base_dir)
+        self.json_dir = Path(json_dir) if json_dir else self.base_dir / "gzx"
+        self.source_audio_dir = Path(source_audio_dir) if source_audio_dir else self.base_dir / "data" / "emotion_annotation"
+        self.output_dir = Path(output_dir) if output_dir else self.base_dir / "data" / "consistency_test"
+        self.json_prefixes = tuple(json_prefixes)
+        self.workers = max(1, workers)
+        self.link_mode = link_mode
         
         # 创建输出目录
-        self.output_dir.mkdir(exist_ok=True)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        
+        # 文件名 -> 路径，由 build_audio_index() 建立
+        self.audio_index: Dict[str, Path] = {}
+        
+        self.manifest_path = self.output_dir / MANIFEST_FILENAME
+        self._manifest_lock = threading.Lock()
+        self.manifest: Dict[str, Dict] = {}
         
         # 优先级条件
         self.priority_conditions = [
             # 最高优先级：满足所有3个条件
             lambda data: (
-                data.get('v_value') != 0 and 
-                data.get('a_value') != 3 and 
+                data.get('v_value') != 0 and
+                data.get('a_value') != 3 and
                 data.get('emotion_type') == 'non-neutral'
             ),
             # 次优先级：满足2个条件
@@ -49,29 +87,28 @@ class ConsistencyTestDataExtractor:
                 data.get('emotion_type') == 'non-neutral'
             ]) == 0
         ]
-
+    
     def find_target_json_files(self) -> List[Path]:
-        """查找目标JSON文件（以spk2和spk11开头）"""
+        """查找目标JSON文件（默认以spk2和spk11开头）"""
         json_files = []
         
         if not self.json_dir.exists():
             print(f"错误：JSON目录不存在 - {self.json_dir}")
             return json_files
-            
-        for file_path in self.json_dir.glob("*.json"):
-            filename = file_path.name
-            if filename.startswith("spk2") or filename.startswith("spk11"):
+        
+        for file_path in sorted(self.json_dir.glob("*.json")):
+            if file_path.name.startswith(self.json_prefixes):
                 json_files.append(file_path)
-                
+        
         print(f"找到 {len(json_files)} 个目标JSON文件")
         return json_files
-
+    
     def load_json_data(self, json_file: Path) -> List[Dict]:
         """加载JSON文件数据"""
         try:
             with open(json_file, 'r', encoding='utf-8') as f:
                 data = json.load(f)
-                
+            
             # 处理不同的JSON结构
             if isinstance(data, list):
                 return data
@@ -85,14 +122,14 @@ class ConsistencyTestDataExtractor:
             else:
                 print(f"警告：未知的JSON结构 - {json_file}")
                 return []
-                
+        
         except json.JSONDecodeError as e:
             print(f"错误：无法解析JSON文件 {json_file} - {e}")
             return []
         except Exception as e:
             print(f"错误：读取文件失败 {json_file} - {e}")
             return []
-
+    
     def categorize_by_priority(self, annotations: List[Dict]) -> Dict[int, List[Dict]]:
         """根据优先级条件对标注数据进行分类"""
         categories = {0: [], 1: [], 2: [], 3: []}  # 0=最高优先级, 3=最低优先级
@@ -101,7 +138,7 @@ class ConsistencyTestDataExtractor:
             # 检查是否有audio_file字段
             if 'audio_file' not in annotation:
                 continue
-                
+            
             # 按优先级检查条件
             categorized = False
             for priority, condition in enumerate(self.priority_conditions):
@@ -119,60 +156,153 @@ class ConsistencyTestDataExtractor:
                 categories[3].append(annotation)
         
         return categories
-
-    def find_audio_file(self, audio_filename: str) -> Path:
-        """在源音频目录中查找音频文件"""
-        # 尝试不同的可能路径
-        possible_paths = [
-            self.source_audio_dir / audio_filename,
-            self.source_audio_dir / f"{audio_filename}.wav",
-            # 在子目录中查找
-        ]
+    
+    def build_audio_index(self) -> Dict[str, Path]:
+        """遍历一次源音频目录，建立 文件名 -> 路径 的索引（同名文件以先遍历到的为准）"""
+        index: Dict[str, Path] = {}
+        stack = [self.source_audio_dir]
+        while stack:
+            directory = stack.pop()
+            try:
+                with os.scandir(directory) as entries:
+                    subdirs = []
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.append(entry.path)
+                        elif entry.name not in index:
+                            index[entry.name] = Path(entry.path)
+            except OSError as e:
+                print(f"警告：无法读取目录 {directory} - {e}")
+                continue
+            # 按名称顺序深度优先遍历，结果与重复运行保持一致
+            stack.extend(sorted(subdirs, reverse=True))
+        
+        self.audio_index = index
+        print(f"源音频索引: {len(index)} 个文件")
+        return index
+    
+    def find_audio_file(self, audio_filename: str) -> Optional[Path]:
+        """在源音频索引中查找音频文件（也尝试添加 .wav 扩展名）"""
+        path = self.audio_index.get(audio_filename)
+        if path is None and not audio_filename.endswith('.wav'):
+            path = self.audio_index.get(f"{audio_filename}.wav")
+        return path
+    
+    def load_manifest(self) -> Dict[str, Dict]:
+        """读取导出清单，不存在或损坏时视为空"""
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                self.manifest = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            self.manifest = {}
+        return self.manifest
+    
+    def _save_manifest(self):
+        """原子写入导出清单（调用方持有 self._manifest_lock）"""
+        tmp_path = self.manifest_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+    
+    @staticmethod
+    def _source_signature(source_path: Path) -> Dict:
+        stat = source_path.stat()
+        return {'source': str(source_path), 'size': stat.st_size, 'mtime': stat.st_mtime}
+    
+    def _is_done(self, output_filename: str, signature: Dict) -> bool:
+        """清单中已有记录、源文件未变化且输出文件仍存在"""
+        entry = self.manifest.get(output_filename)
+        if not entry:
+            return False
+        if any(entry.get(key) != value for key, value in signature.items()):
+            return False
+        return (self.output_dir / output_filename).exists() and (self.output_dir / entry['info_file']).exists()
+    
+    def _materialize(self, source_path: Path, target_path: Path) -> str:
+        """
+        将源文件导出到目标路径（先写临时文件再原子替换）
         
-        # 递归查找
-        for root, dirs, files in os.walk(self.source_audio_dir):
-            if audio_filename in files:
-                return Path(root) / audio_filename
-            # 尝试添加.wav扩展名
-            wav_filename = f"{audio_filename}.wav" if not audio_filename.endswith('.wav') else audio_filename
-            if wav_filename in files:
-                return Path(root) / wav_filename
+        Returns:
+            str: 实际使用的方式 hardlink / reflink / copy
+        """
+        tmp_path = target_path.with_name(f".{target_path.name}.part")
+        if tmp_path.exists():
+            tmp_path.unlink()
         
-        return None
-
-    def copy_audio_files(self, categories: Dict[int, List[Dict]], total_target: int = 50) -> Dict[str, int]:
-        """复制音频文件到输出目录，总共复制50个文件"""
+        method = None
+        if self.link_mode in ('auto', 'hardlink'):
+            try:
+                os.link(source_path, tmp_path)
+                method = 'hardlink'
+            except OSError:
+                if self.link_mode == 'hardlink':
+                    raise
+        
+        if method is None and self.link_mode in ('auto', 'reflink') and fcntl is not None:
+            try:
+                with open(source_path, 'rb') as src, open(tmp_path, 'wb') as dst:
+                    fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+                shutil.copystat(source_path, tmp_path)
+                method = 'reflink'
+            except OSError:
+                if tmp_path.exists():
+                    tmp_path.unlink()
+                if self.link_mode == 'reflink':
+                    raise
+        
+        if method is None:
+            shutil.copy2(source_path, tmp_path)
+            method = 'copy'
+        
+        os.replace(tmp_path, target_path)
+        return method
+    
+    def _export_one(self, job: Dict) -> str:
+        """导出单个音频及其标注信息，成功后写入清单"""
+        output_path = self.output_dir / job['output_filename']
+        method = self._materialize(job['source_path'], output_path)
+        
+        # 同时保存对应的标注信息
+        info_file = output_path.with_suffix('.json')
+        with open(info_file, 'w', encoding='utf-8') as f:
+            json.dump(job['annotation'], f, ensure_ascii=False, indent=2)
+        
+        with self._manifest_lock:
+            self.manifest[job['output_filename']] = {**job['signature'], 'info_file': info_file.name}
+            self._save_manifest()
+        return method
+    
+    def plan_exports(self, categories: Dict[int, List[Dict]], total_target: int = 50) -> Tuple[List[Dict], Dict[str, int]]:
+        """
+        按优先级依次选出 total_target 个能在索引中找到的音频
+        
+        Returns:
+            tuple: (导出任务列表, 统计信息)
+        """
         stats = {
             'priority_0': 0,  # 满足3个条件
             'priority_1': 0,  # 满足2个条件
             'priority_2': 0,  # 满足1个条件
             'priority_3': 0,  # 满足0个条件
             'not_found': 0,   # 未找到的文件
-            'errors': 0       # 复制错误
+            'errors': 0,      # 复制错误
+            'skipped': 0      # 上次运行已完成
         }
         
-        priority_names = ['priority_0', 'priority_1', 'priority_2', 'priority_3']
-        total_copied = 0
-        
-        print(f"\n开始复制音频文件，目标总数: {total_target}")
-        
+        jobs = []
         for priority in range(4):
-            if total_copied >= total_target:
-                print(f"已达到目标数量 {total_target}，停止复制")
+            if len(jobs) >= total_target:
                 break
-                
-            annotations = categories[priority]
             
-            print(f"\n处理优先级 {priority} (满足 {3-priority} 个条件)，共 {len(annotations)} 个文件")
+            annotations = categories[priority]
+            print(f"处理优先级 {priority} (满足 {3-priority} 个条件)，共 {len(annotations)} 个文件")
             
             for annotation in annotations:
-                if total_copied >= total_target:
-                    print(f"已达到目标数量 {total_target}，停止复制")
+                if len(jobs) >= total_target:
                     break
                 
                 audio_filename = annotation['audio_file']
                 source_path = self.find_audio_file(audio_filename)
-                
                 if source_path is None:
                     print(f"未找到音频文件: {audio_filename}")
                     stats['not_found'] += 1
@@ -181,26 +311,59 @@ class ConsistencyTestDataExtractor:
                 # 生成输出文件名（添加优先级前缀和序号）
                 base_name = Path(audio_filename).stem
                 extension = Path(audio_filename).suffix or '.wav'
-                output_filename = f"p{priority}_{total_copied+1:03d}_{base_name}{extension}"
-                output_path = self.output_dir / output_filename
-                
+                jobs.append({
+                    'priority': priority,
+                    'audio_filename': audio_filename,
+                    'source_path': source_path,
+                    'output_filename': f"p{priority}_{len(jobs)+1:03d}_{base_name}{extension}",
+                    'annotation': annotation
+                })
+        
+        return jobs, stats
+    
+    def copy_audio_files(self, categories: Dict[int, List[Dict]], total_target: int = 50) -> Dict[str, int]:
+        """并行导出音频文件到输出目录，总共导出 total_target 个文件"""
+        print(f"\n开始复制音频文件，目标总数: {total_target}")
+        jobs, stats = self.plan_exports(categories, total_target)
+        priority_names = ['priority_0', 'priority_1', 'priority_2', 'priority_3']
+        
+        self.load_manifest()
+        pending = []
+        for job in jobs:
+            try:
+                job['signature'] = self._source_signature(job['source_path'])
+            except OSError as e:
+                print(f"✗ 读取源文件失败: {job['audio_filename']} - {e}")
+                stats['errors'] += 1
+                continue
+            if self._is_done(job['output_filename'], job['signature']):
+                stats[priority_names[job['priority']]] += 1
+                stats['skipped'] += 1
+            else:
+                pending.append(job)
+        
+        if stats['skipped']:
+            print(f"跳过上次已完成的 {stats['skipped']} 个文件")
+        
+        methods: Dict[str, int] = {}
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {executor.submit(self._export_one, job): job for job in pending}
+            for future in as_completed(futures):
+                job = futures[future]
                 try:
-                    shutil.copy2(source_path, output_path)
-                    stats[priority_names[priority]] += 1
-                    total_copied += 1
-                    print(f"✓ 复制 ({total_copied}/{total_target}): {audio_filename} -> {output_filename}")
-                    
-                    # 同时保存对应的标注信息
-                    info_file = output_path.with_suffix('.json')
-                    with open(info_file, 'w', encoding='utf-8') as f:
-                        json.dump(annotation, f, ensure_ascii=False, indent=2)
-                        
+                    method = future.result()
                 except Exception as e:
-                    print(f"✗ 复制失败: {audio_filename} - {e}")
+                    print(f"✗ 复制失败: {job['audio_filename']} - {e}")
                     stats['errors'] += 1
+                    continue
+                methods[method] = methods.get(method, 0) + 1
+                stats[priority_names[job['priority']]] += 1
+                print(f"✓ 复制 ({method}): {job['audio_filename']} -> {job['output_filename']}")
         
+        if methods:
+            print("导出方式: " + ", ".join(f"{method} {count} 个" for method, count in sorted(methods.items())))
         return stats
-
+    
     def run(self, total_files: int = 50):
         """运行提取流程"""
         print("开始提取一致性测试数据...")
@@ -233,17 +396,18 @@ class ConsistencyTestDataExtractor:
             condition_count = 3 - priority
             print(f"优先级 {priority} (满足 {condition_count} 个条件): {len(categories[priority])} 个文件")
         
-        # 4. 复制音频文件
+        # 4. 建立源音频索引并导出音频文件
+        self.build_audio_index()
         stats = self.copy_audio_files(categories, total_files)
         
         # 5. 输出统计信息
         total_copied = stats['priority_0'] + stats['priority_1'] + stats['priority_2'] + stats['priority_3']
         print(f"\n提取完成！统计信息:")
         print(f"优先级0 (满足3个条件): {stats['priority_0']} 个文件")
-        print(f"优先级1 (满足2个条件): {stats['priority_1']} 个文件") 
+        print(f"优先级1 (满足2个条件): {stats['priority_1']} 个文件")
         print(f"优先级2 (满足1个条件): {stats['priority_2']} 个文件")
         print(f"优先级3 (满足0个条件): {stats['priority_3']} 个文件")
-        print(f"总共复制: {total_copied} 个文件")
+        print(f"总共复制: {total_copied} 个文件（其中 {stats['skipped']} 个为上次已完成）")
         print(f"未找到的文件: {stats['not_found']} 个")
         print(f"复制错误: {stats['errors']} 个")
         print(f"输出目录: {self.output_dir}")
@@ -255,10 +419,32 @@ def main():
     parser = argparse.ArgumentParser(description='提取一致性测试数据')
     parser.add_argument('--total-files', type=int, default=50,
                        help='总共提取的文件数量 (默认: 50)')
+    parser.add_argument('--base-dir', type=Path, default=DEFAULT_BASE_DIR,
+                       help=f'项目根目录 (默认: {DEFAULT_BASE_DIR})')
+    parser.add_argument('--json-dir', type=Path,
+                       help='标注JSON目录 (默认: <base-dir>/gzx)')
+    parser.add_argument('--audio-dir', type=Path,
+                       help='源音频目录 (默认: <base-dir>/data/emotion_annotation)')
+    parser.add_argument('--output-dir', type=Path,
+                       help='输出目录 (默认: <base-dir>/data/consistency_test)')
+    parser.add_argument('--prefixes', nargs='+', default=['spk2', 'spk11'],
+                       help='只处理以这些前缀开头的JSON文件 (默认: spk2 spk11)')
+    parser.add_argument('--workers', type=int, default=8,
+                       help='并行导出线程数 (默认: 8)')
+    parser.add_argument('--link-mode', choices=LINK_MODES, default='auto',
+                       help='导出方式：auto 依次尝试硬链接、reflink、复制 (默认: auto)')
     
     args = parser.parse_args()
     
-    extractor = ConsistencyTestDataExtractor()
+    extractor = ConsistencyTestDataExtractor(
+        base_dir=args.base_dir,
+        json_dir=args.json_dir,
+        source_audio_dir=args.audio_dir,
+        output_dir=args.output_dir,
+        json_prefixes=tuple(args.prefixes),
+        workers=args.workers,
+        link_mode=args.link_mode
+    )
     extractor.run(total_files=args.total_files)
 
 if __name__ == "__main__":
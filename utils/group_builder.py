@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分组生成脚本
+根据 audio_inventory 表（utils/audio_inventory.py 生成）中各说话人的总时长和段数，
+将说话人划分为 K 个总时长和段数尽量均衡的分组，直接写入 group_assignments.db 的
+speaker_groups / group_status 表，取代手工维护的 data/分组.txt
+
+划分方法：LPT（按负载从大到小依次放入当前最轻的分组），再用局部搜索
+（单个说话人移动 / 两个说话人交换）继续降低各组偏离平均值的程度。
+增量模式下已分组的说话人保持不动，只把新出现的说话人放入当前最轻的分组
+"""
+
+import sys
+import sqlite3
+import argparse
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from utils.audio_inventory import connect_inventory_db, get_speaker_inventory, write_group_file
+from scripts.init_all_db import upsert_group_status
+from services.data_version import bump_version
+from group_assignment_manager import get_group_assignment_manager
+
+class GroupBalancer:
+    """按时长和段数均衡划分说话人"""
+    
+    def __init__(self, speakers, group_count):
+        """
+        Args:
+            speakers (list): 说话人列表，每项包含 speaker_id, total_duration, file_count
+            group_count (int): 分组数量
+        """
+        if group_count < 1:
+            raise ValueError("分组数量必须大于0")
+        self.speakers = speakers
+        self.group_count = group_count
+        
+        # 以平均每组的时长/段数为单位归一化，两个维度同等重要
+        total_duration = sum(speaker['total_duration'] for speaker in speakers)
+        total_segments = sum(speaker['file_count'] for speaker in speakers)
+        self.mean_duration = (total_duration / group_count) or 1.0
+        self.mean_segments = (total_segments / group_count) or 1.0
+    
+    def _size(self, speaker):
+        return (speaker['total_duration'] / self.mean_duration
+                + speaker['file_count'] / self.mean_segments)
+    
+    def _cost(self, duration, segments):
+        """单个分组偏离平均值的平方和"""
+        return ((duration / self.mean_duration - 1) ** 2
+                + (segments / self.mean_segments - 1) ** 2)
+    
+    def _place_greedy(self, groups, durations, segments, speakers):
+        """LPT：按负载从大到小依次放入当前最轻的分组"""
+        for speaker in sorted(speakers, key=self._size, reverse=True):
+            target = min(range(self.group_count), key=lambda g: (
+                durations[g] / self.mean_duration + segments[g] / self.mean_segments, g
+            ))
+            groups[target].append(speaker)
+            durations[target] += speaker['total_duration']
+            segments[target] += speaker['file_count']
+    
+    def _refine(self, groups, durations, segments, movable, max_rounds):
+        """
+        局部搜索：反复尝试把一个说话人移到另一组或交换两组的说话人，
+        只要总偏差下降就接受，直到没有改进或达到轮数上限
+        
+        Args:
+            movable (callable): 判断说话人是否允许移动
+        """
+        def delta(a, b, duration_shift, segment_shift):
+            # 从 a 组移出 (duration_shift, segment_shift) 到 b 组后总偏差的变化
+            before = self._cost(durations[a], segments[a]) + self._cost(durations[b], segments[b])
+            after = (self._cost(durations[a] - duration_shift, segments[a] - segment_shift)
+                     + self._cost(durations[b] + duration_shift, segments[b] + segment_shift))
+            return after - before
+        
+        for _ in range(max_rounds):
+            improved = False
+            for a in range(self.group_count):
+                for b in range(self.group_count):
+                    if a == b:
+                        continue
+                    for i, x in enumerate(groups[a]):
+                        if not movable(x):
+                            continue
+                        # 移动 x: a -> b
+                        if delta(a, b, x['total_duration'], x['file_count']) < -1e-12:
+                            groups[b].append(groups[a].pop(i))
+                            durations[a] -= x['total_duration']
+                            durations[b] += x['total_duration']
+                            segments[a] -= x['file_count']
+                            segments[b] += x['file_count']
+                            improved = True
+                            break
+                        # 交换 x (a) 与 y (b)
+                        for j, y in enumerate(groups[b]):
+                            if not movable(y):
+                                continue
+                            duration_shift = x['total_duration'] - y['total_duration']
+                            segment_shift = x['file_count'] - y['file_count']
+                            if delta(a, b, duration_shift, segment_shift) < -1e-12:
+                                groups[a][i], groups[b][j] = y, x
+                                durations[a] -= duration_shift
+                                durations[b] += duration_shift
+                                segments[a] -= segment_shift
+                                segments[b] += segment_shift
+                                improved = True
+                                break
+                        if improved:
+                            break
+                    if improved:
+                        break
+                if improved:
+                    break
+            if not improved:
+                break
+    
+    def build(self, max_rounds=1000):
+        """
+        从零开始划分
+        
+        Returns:
+            list: 分组列表，每个分组是说话人列表
+        """
+        groups = [[] for _ in range(self.group_count)]
+        durations = [0.0] * self.group_count
+        segments = [0] * self.group_count
+        self._place_greedy(groups, durations, segments, self.speakers)
+        self._refine(groups, durations, segments, lambda speaker: True, max_rounds)
+        return groups
+    
+    def extend(self, existing_groups, new_speakers, max_rounds=1000):
+        """
+        增量划分：已有分组中的说话人保持不动，只放置（并在彼此间调整）新说话人
+        
+        Args:
+            existing_groups (list): 已有分组（长度等于分组数量）
+            new_speakers (list): 新说话人
+        
+        Returns:
+            list: 分组列表
+        """
+        groups = [list(group) for group in existing_groups]
+        durations = [sum(speaker['total_duration'] for speaker in group) for group in groups]
+        segments = [sum(speaker['file_count'] for speaker in group) for group in groups]
+        new_ids = {speaker['speaker_id'] for speaker in new_speakers}
+        self._place_greedy(groups, durations, segments, new_speakers)
+        self._refine(groups, durations, segments, lambda speaker: speaker['speaker_id'] in new_ids, max_rounds)
+        return groups
+
+def describe_groups(groups):
+    """各分组的总时长和段数"""
+    return [{
+        'group_id': group_id,
+        'speakers': [speaker['speaker_id'] for speaker in group],
+        'total_duration': round(sum(speaker['total_duration'] for speaker in group), 2),
+        'total_segments': sum(speaker['file_count'] for speaker in group)
+    } for group_id, group in enumerate(groups, start=1)]
+
+def load_existing_groups(conn, group_count, inventory):
+    """
+    读取 speaker_groups 中已有的分组，时长和段数以最新清单为准
+    
+    Returns:
+        tuple: (分组列表, 未分组的新说话人列表)
+    """
+    by_id = {speaker['speaker_id']: speaker for speaker in inventory}
+    groups = [[] for _ in range(group_count)]
+    assigned = set()
+    rows = conn.execute('SELECT group_id, speaker_id, duration, segment_count FROM speaker_groups ORDER BY group_id, id')
+    for group_id, speaker_id, duration, segment_count in rows:
+        if not 1 <= group_id <= group_count:
+            raise ValueError(f"已有分组编号 {group_id} 超出分组数量 {group_count}")
+        assigned.add(speaker_id)
+        # 清单中已不存在的说话人保留原记录的时长和段数
+        groups[group_id - 1].append(by_id.get(speaker_id) or {
+            'speaker_id': speaker_id, 'total_duration': duration, 'file_count': segment_count
+        })
+    new_speakers = [speaker for speaker in inventory if speaker['speaker_id'] not in assigned]
+    return groups, new_speakers
+
+def save_groups(conn, groups):
+    """
+    在一个事务中写入 speaker_groups 和 group_status
+    
+    group_status 只更新时长和段数，保留分配人数、完成人数和状态；
+    已分配用户的 total_segments 同步为新的分组段数，完成数和状态按新的分组重新计算
+    """
+    summary = describe_groups(groups)
+    with conn:
+        conn.execute('DELETE FROM speaker_groups')
+        conn.executemany('''
+            INSERT INTO speaker_groups (group_id, speaker_id, duration, segment_count)
+            VALUES (?, ?, ?, ?)
+        ''', [
+            (group_id, speaker['speaker_id'], round(speaker['total_duration'], 2), speaker['file_count'])
+            for group_id, group in enumerate(groups, start=1)
+            for speaker in group
+        ])
+        upsert_group_status(conn, [
+            (group['group_id'], group['total_duration'], group['total_segments']) for group in summary
+        ])
+        conn.execute('DELETE FROM group_status WHERE group_id > ?', (len(groups),))
+        conn.execute('''
+            UPDATE group_assignments
+            SET total_segments = (
+                SELECT total_segments FROM group_status
+                WHERE group_status.group_id = group_assignments.group_id
+            )
+            WHERE group_id IN (SELECT group_id FROM group_status)
+        ''')
+    bump_version('group_layout')
+    
+    # 增量更新不会修正分组变化造成的完成数偏差
+    if conn.execute('SELECT 1 FROM group_assignments LIMIT 1').fetchone():
+        get_group_assignment_manager().recalculate_progress()
+    return summary
+
+def build_groups(group_count, incremental=False, force=False, dry_run=False, max_rounds=1000):
+    """
+    生成分组并写入数据库
+    
+    Args:
+        group_count (int): 分组数量
+        incremental (bool): 增量模式，只放置尚未分组的说话人
+        force (bool): 已有用户分配时仍然重新划分全部分组
+        dry_run (bool): 只计算不写入
+    
+    Returns:
+        tuple: (describe_groups() 的结果, 分组列表)
+    """
+    inventory = [speaker for speaker in get_speaker_inventory() if speaker['file_count'] > 0]
+    if not inventory:
+        raise ValueError("音频清单为空，请先运行 utils/audio_inventory.py")
+    
+    balancer = GroupBalancer(inventory, group_count)
+    conn = connect_inventory_db()
+    try:
+        if incremental:
+            existing_groups, new_speakers = load_existing_groups(conn, group_count, inventory)
+            print(f"增量模式：已分组 {sum(len(group) for group in existing_groups)} 个说话人，新说话人 {len(new_speakers)} 个")
+            groups = balancer.extend(existing_groups, new_speakers, max_rounds)
+        else:
+            assigned_users = conn.execute('SELECT COUNT(*) FROM group_assignments').fetchone()[0]
+            if assigned_users and not force:
+                raise ValueError(f"已有 {assigned_users} 条用户分组分配，重新划分会改变其说话人；"
+                                 f"请使用增量模式，或加 --force 强制重新划分")
+            groups = balancer.build(max_rounds)
+        
+        if dry_run:
+            return describe_groups(groups), groups
+        return save_groups(conn, groups), groups
+    finally:
+        conn.close()
+
+def main():
+    """
+    主函数
+    """
+    parser = argparse.ArgumentParser(description='按总时长和段数均衡生成说话人分组')
+    parser.add_argument('--groups', type=int, required=True, help='分组数量')
+    parser.add_argument('--incremental', action='store_true', help='只把新说话人放入已有分组')
+    parser.add_argument('--force', action='store_true', help='已有用户分配时仍然重新划分全部分组')
+    parser.add_argument('--dry-run', action='store_true', help='只显示结果，不写入数据库')
+    parser.add_argument('--export', metavar='PATH', help='同时按 data/分组.txt 的格式写出分组文件')
+    args = parser.parse_args()
+    
+    try:
+        result = build_groups(args.groups, incremental=args.incremental, force=args.force, dry_run=args.dry_run)
+    except ValueError as e:
+        print(f"错误: {e}")
+        sys.exit(1)
+    except sqlite3.Error as e:
+        print(f"数据库错误: {e}")
+        sys.exit(1)
+    
+    summary, groups = result
+    print(f"\n=== 分组结果（{'未写入' if args.dry_run else '已写入数据库'}） ===")
+    for group in summary:
+        print(f"第{group['group_id']}组: 总时长 {group['total_duration']:.2f}秒 段数 {group['total_segments']}  "
+              f"[{', '.join(group['speakers'])}]")
+    
+    durations = [group['total_duration'] for group in summary]
+    segments = [group['total_segments'] for group in summary]
+    print(f"\n时长范围: {min(durations):.2f} ~ {max(durations):.2f} 秒，段数范围: {min(segments)} ~ {max(segments)}")
+    
+    if args.export:
+        write_group_file(groups, args.export)
+        print(f"已写出: {args.export}")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -247,8 +247,10 @@ def log_api_call(func):
         params = {}
         if request.args:
             params.update(request.args.to_dict())
-        if request.json:
-            params.update(request.json)
+        # GET 等无 JSON 请求体时 request.json 会抛 415，这里静默读取
+        body = request.get_json(silent=True)
+        if isinstance(body, dict):
+            params.update(body)
         
         try:
             # 执行原函数
@@ -0,0 +1,451 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+服务端会话存储
+Cookie 中只保存签名后的会话ID，会话数据保存在服务端：
+进程内 LRU 缓存在前，SQLite 或文件存储在后（多进程部署时各工作进程共享）。
+每次写入或删除会话都会递增共享的 sessions 数据版本，缓存条目版本不一致时重新读取存储，
+因此退出登录、更换会话ID在所有工作进程中立即生效
+"""
+
+import os
+import json
+import time
+import uuid
+import random
+import hashlib
+import threading
+from collections import OrderedDict
+from flask import current_app, session
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from itsdangerous import Signer, BadSignature
+from werkzeug.datastructures import CallbackDict
+from services.data_version import get_data_versions, bump_version
+from utils.db_pool import get_pool
+from utils.logger import emotion_logger
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    """服务端会话对象，修改时自动标记 modified"""
+    
+    def __init__(self, initial=None, sid=None, new=False, expires_at=None):
+        def on_update(self):
+            self.modified = True
+        
+        CallbackDict.__init__(self, initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.expires_at = expires_at
+        self.modified = False
+
+class MemorySessionBackend:
+    """
+    进程内 LRU 会话存储
+    
+    单独使用时会话只在当前进程有效；作为缓存层使用时，条目带有写入时的数据版本，
+    读取时版本不一致或超过 max_age 秒都视为过期
+    """
+    
+    def __init__(self, max_entries=10000, max_age=None):
+        """
+        Args:
+            max_entries (int): 最多缓存的会话数
+            max_age (float): 缓存条目的最长有效时间（秒），为空时只受会话过期时间限制
+        """
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self._entries = OrderedDict()  # sid -> (username, payload, expires_at, cached_at, version)
+        self._lock = threading.Lock()
+    
+    def get(self, sid, version=None):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(sid)
+            if entry is None:
+                return None
+            username, payload, expires_at, cached_at, cached_version = entry
+            if (expires_at <= now or cached_version != version
+                    or (self.max_age is not None and cached_at + self.max_age <= now)):
+                del self._entries[sid]
+                return None
+            self._entries.move_to_end(sid)
+            return payload, expires_at
+    
+    def set(self, sid, username, payload, expires_at, version=None):
+        with self._lock:
+            self._entries[sid] = (username, payload, expires_at, time.time(), version)
+            self._entries.move_to_end(sid)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def delete(self, sid):
+        with self._lock:
+            self._entries.pop(sid, None)
+    
+    def find_by_username(self, username):
+        now = time.time()
+        with self._lock:
+            return [
+                (sid, entry[1], entry[2])
+                for sid, entry in self._entries.items()
+                if entry[0] == username and entry[2] > now
+            ]
+
+class SQLiteSessionBackend:
+    """基于 SQLite 的会话存储，所有工作进程共享"""
+    
+    def __init__(self, db_path):
+        self.db_path = db_path
+    
+    @property
+    def pool(self):
+        return get_pool(self.db_path)
+    
+    def init_database(self):
+        """创建会话表（应用启动时执行一次）"""
+        with self.pool.connection() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS sessions (
+                    sid TEXT PRIMARY KEY,
+                    username TEXT,
+                    data TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_sessions_username ON sessions(username)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions(expires_at)')
+            conn.commit()
+    
+    def get(self, sid):
+        with self.pool.connection() as conn:
+            row = conn.execute(
+                'SELECT data, expires_at FROM sessions WHERE sid = ? AND expires_at > ?',
+                (sid, time.time())
+            ).fetchone()
+        return (row[0], row[1]) if row else None
+    
+    def set(self, sid, username, payload, expires_at):
+        with self.pool.connection() as conn:
+            conn.execute('''
+                INSERT INTO sessions (sid, username, data, expires_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT(sid) DO UPDATE SET
+                    username = excluded.username,
+                    data = excluded.data,
+                    expires_at = excluded.expires_at
+            ''', (sid, username, payload, expires_at))
+            # 偶尔顺带清理过期会话，避免单独的清理任务
+            if random.random() < 0.01:
+                conn.execute('DELETE FROM sessions WHERE expires_at <= ?', (time.time(),))
+            conn.commit()
+    
+    def delete(self, sid):
+        with self.pool.connection() as conn:
+            conn.execute('DELETE FROM sessions WHERE sid = ?', (sid,))
+            conn.commit()
+    
+    def find_by_username(self, username):
+        with self.pool.connection() as conn:
+            rows = conn.execute(
+                'SELECT sid, data, expires_at FROM sessions WHERE username = ? AND expires_at > ?',
+                (username, time.time())
+            ).fetchall()
+        return [tuple(row) for row in rows]
+
+class FileSessionBackend:
+    """基于文件的会话存储，每个会话一个 JSON 文件"""
+    
+    def __init__(self, directory):
+        self.directory = directory
+    
+    def init_database(self):
+        os.makedirs(self.directory, exist_ok=True)
+    
+    def _path(self, sid):
+        return os.path.join(self.directory, f"{sid}.json")
+    
+    def _read(self, path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+    
+    def get(self, sid):
+        record = self._read(self._path(sid))
+        if record is None:
+            return None
+        if record['expires_at'] <= time.time():
+            self.delete(sid)
+            return None
+        return record['data'], record['expires_at']
+    
+    def set(self, sid, username, payload, expires_at):
+        path = self._path(sid)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'username': username, 'data': payload, 'expires_at': expires_at}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    
+    def delete(self, sid):
+        try:
+            os.remove(self._path(sid))
+        except FileNotFoundError:
+            pass
+    
+    def find_by_username(self, username):
+        results = []
+        now = time.time()
+        for filename in os.listdir(self.directory):
+            if not filename.endswith('.json'):
+                continue
+            record = self._read(os.path.join(self.directory, filename))
+            if record and record.get('username') == username and record['expires_at'] > now:
+                results.append((filename[:-len('.json')], record['data'], record['expires_at']))
+        return results
+
+class TieredSessionBackend:
+    """
+    内存缓存层 + 持久化存储层，读优先命中内存，写入持久层
+    
+    内存层只在当前进程有效，命中前先比较共享的 sessions 数据版本（按会话ID散列，只读内存映射）：
+    任一工作进程写入或删除会话后版本递增，其他进程的缓存条目随即失效，
+    不会在退出登录或更换会话ID后继续接受旧ID
+    """
+    
+    def __init__(self, memory, persistent):
+        self.memory = memory
+        self.persistent = persistent
+    
+    def init_database(self):
+        self.persistent.init_database()
+    
+    @staticmethod
+    def _version(sid):
+        """会话的共享数据版本，无法读取时返回None（不使用内存层）"""
+        try:
+            return get_data_versions().get('sessions', sid)
+        except OSError:
+            return None
+    
+    def get(self, sid):
+        # 先取版本再读取存储：读取期间发生的写入会使下一次读取重新访问存储
+        version = self._version(sid)
+        if version is not None:
+            result = self.memory.get(sid, version)
+            if result is not None:
+                return result
+        result = self.persistent.get(sid)
+        if result is not None and version is not None:
+            # 用户名只用于按用户查找会话，内存层的按用户查找由持久层负责
+            self.memory.set(sid, None, result[0], result[1], version)
+        return result
+    
+    def set(self, sid, username, payload, expires_at):
+        self.persistent.set(sid, username, payload, expires_at)
+        self.memory.delete(sid)
+        bump_version('sessions', sid)
+    
+    def delete(self, sid):
+        self.memory.delete(sid)
+        self.persistent.delete(sid)
+        bump_version('sessions', sid)
+    
+    def find_by_username(self, username):
+        return self.persistent.find_by_username(username)
+
+class ServerSideSessionInterface(SessionInterface):
+    """
+    Flask 会话接口：Cookie 中只保存签名后的会话ID
+    
+    会话只在被修改或剩余有效期不足一半时才写回存储，普通的已登录请求不产生写操作
+    """
+    
+    serializer = TaggedJSONSerializer()
+    salt = 'server-side-session'
+    
+    def __init__(self, backend):
+        self.backend = backend
+    
+    def _get_signer(self, app):
+        return Signer(app.secret_key, salt=self.salt, key_derivation='hmac',
+                      digest_method=hashlib.sha256)
+    
+    def _new_session(self):
+        return ServerSideSession(sid=uuid.uuid4().hex, new=True)
+    
+    def open_session(self, app, request):
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if not cookie:
+            return self._new_session()
+        
+        try:
+            sid = self._get_signer(app).unsign(cookie).decode('utf-8')
+        except BadSignature:
+            return self._new_session()
+        
+        try:
+            result = self.backend.get(sid)
+        except Exception as e:
+            emotion_logger.log_error(e, "读取会话失败")
+            result = None
+        
+        if result is None:
+            return self._new_session()
+        
+        payload, expires_at = result
+        try:
+            data = self.serializer.loads(payload)
+        except Exception:
+            return self._new_session()
+        return ServerSideSession(data, sid=sid, expires_at=expires_at)
+    
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        secure = self.get_cookie_secure(app)
+        samesite = self.get_cookie_samesite(app)
+        httponly = self.get_cookie_httponly(app)
+        
+        if session.accessed:
+            response.vary.add('Cookie')
+        
+        # 会话被清空：删除服务端数据和Cookie
+        if not session:
+            if session.modified:
+                self.backend.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path, secure=secure,
+                                       samesite=samesite, httponly=httponly)
+            return
+        
+        lifetime = app.permanent_session_lifetime.total_seconds()
+        now = time.time()
+        needs_refresh = (
+            session.permanent and session.expires_at is not None
+            and session.expires_at - now < lifetime / 2
+        )
+        if not session.modified and not needs_refresh:
+            return
+        
+        expires = self.get_expiration_time(app, session)
+        expires_at = expires.timestamp() if expires else now + lifetime
+        self.backend.set(session.sid, session.get('username'),
+                         self.serializer.dumps(dict(session)), expires_at)
+        session.expires_at = expires_at
+        
+        response.set_cookie(
+            name,
+            self._get_signer(app).sign(session.sid.encode('utf-8')).decode('utf-8'),
+            expires=expires,
+            httponly=httponly,
+            domain=domain,
+            path=path,
+            secure=secure,
+            samesite=samesite
+        )
+    
+    def regenerate(self, session):
+        """
+        更换会话ID并删除旧ID的服务端记录（登录时调用，防止会话固定攻击）
+        
+        会话数据保留，响应中写入新ID的Cookie
+        
+        Args:
+            session (ServerSideSession): 当前请求的会话
+        """
+        old_sid = session.sid
+        session.sid = uuid.uuid4().hex
+        session.new = True
+        session.modified = True
+        if old_sid:
+            try:
+                self.backend.delete(old_sid)
+            except Exception as e:
+                emotion_logger.log_error(e, "删除旧会话失败")
+    
+    def update_user_sessions(self, username, values):
+        """
+        更新指定用户所有会话中缓存的数据（如管理员修改了用户的测试设置）
+        
+        写入会递增会话的共享数据版本，所有工作进程的下一次请求都会读到新数据
+        
+        Args:
+            username (str): 用户名
+            values (dict): 要写入会话的键值
+        
+        Returns:
+            int: 更新的会话数
+        """
+        updated = 0
+        for sid, payload, expires_at in self.backend.find_by_username(username):
+            try:
+                data = self.serializer.loads(payload)
+            except Exception:
+                continue
+            data.update(values)
+            self.backend.set(sid, username, self.serializer.dumps(data), expires_at)
+            updated += 1
+        return updated
+
+def create_session_interface(config):
+    """
+    根据配置创建会话接口
+    
+    Args:
+        config: 应用配置类（使用 SESSION_TYPE / SESSION_MEMORY_CACHE_SIZE / SESSION_MEMORY_MAX_AGE）
+    
+    Returns:
+        ServerSideSessionInterface: 会话接口；SESSION_TYPE 为 cookie 时返回 None，使用 Flask 默认的Cookie会话
+    """
+    session_type = config.SESSION_TYPE
+    if session_type == 'cookie':
+        return None
+    
+    if session_type == 'memory':
+        backend = MemorySessionBackend(max_entries=config.SESSION_MEMORY_CACHE_SIZE)
+    else:
+        if session_type == 'sqlite':
+            persistent = SQLiteSessionBackend(os.path.join(config.DATABASE_FOLDER, 'sessions.db'))
+        elif session_type == 'filesystem':
+            persistent = FileSessionBackend(os.path.join(config.DATABASE_FOLDER, 'sessions'))
+        else:
+            raise ValueError(f"不支持的会话存储类型: {session_type}")
+        
+        memory = MemorySessionBackend(
+            max_entries=config.SESSION_MEMORY_CACHE_SIZE,
+            max_age=config.SESSION_MEMORY_MAX_AGE
+        )
+        backend = TieredSessionBackend(memory, persistent)
+    
+    return ServerSideSessionInterface(backend)
+
+def update_user_sessions(username, **values):
+    """
+    更新指定用户所有会话中缓存的数据（需在应用上下文中调用）
+    
+    Args:
+        username (str): 用户名
+        **values: 要写入会话的键值
+    
+    Returns:
+        int: 更新的会话数，未使用服务端会话时返回0
+    """
+    interface = current_app.session_interface
+    if isinstance(interface, ServerSideSessionInterface):
+        return interface.update_user_sessions(username, values)
+    return 0
+
+def regenerate_session():
+    """
+    登录成功时更换当前请求的会话ID（需在请求上下文中调用）
+    
+    登录前由他人设置到浏览器中的会话ID在登录后失效；使用 Flask 默认的Cookie会话时无需处理
+    
+    Returns:
+        bool: 是否更换了会话ID
+    """
+    interface = current_app.session_interface
+    if isinstance(interface, ServerSideSessionInterface):
+        interface.regenerate(session)
+        return True
+    return False
\ No newline at end of file
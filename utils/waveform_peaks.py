@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+波形峰值数据
+把每个音频按固定数量的像素区间做 min/max 归约（NumPy 向量化），结果以紧凑的二进制文件
+缓存在 WAVEFORM_CACHE_FOLDER 下，前端绘制波形只需请求这一个小文件，不必下载并解码音频。
+
+文件格式与 audiowaveform 的 .dat（版本1）相同：
+    int32 版本(1) | uint32 标志(1 = 8位) | int32 采样率 | int32 每像素采样数 | uint32 像素数
+之后是每个像素的 (min, max)，各一个 int8。
+
+可作为批处理脚本运行（多进程预生成 AUDIO_FOLDER 下全部音频），也会在请求时按需生成
+"""
+
+import os
+import sys
+import wave
+import math
+import struct
+import argparse
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from config import Config
+
+PEAKS_EXTENSION = '.dat'
+AUDIO_EXTENSIONS = ('.wav',)
+
+_HEADER = struct.Struct('<iIiiI')
+_FORMAT_VERSION = 1
+_FLAG_8BIT = 1
+
+def _read_pcm(file_path):
+    """
+    读取 PCM WAV 的全部采样
+    
+    Returns:
+        tuple: (形状为 (帧数, 声道数) 的整数数组, 满量程, 采样率)
+    """
+    with wave.open(file_path, 'rb') as f:
+        channels = f.getnchannels()
+        width = f.getsampwidth()
+        sample_rate = f.getframerate()
+        frames = f.readframes(f.getnframes())
+    
+    if width == 1:
+        # 8位 PCM 为无符号数
+        data = np.frombuffer(frames, dtype=np.uint8).astype(np.int16) - 128
+    elif width == 2:
+        data = np.frombuffer(frames, dtype='<i2')
+    elif width == 3:
+        raw = np.frombuffer(frames, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        data = raw[:, 0] | (raw[:, 1] << 8) | (raw[:, 2] << 16)
+        data = np.where(data >= 1 << 23, data - (1 << 24), data)
+    elif width == 4:
+        data = np.frombuffer(frames, dtype='<i4')
+    else:
+        raise wave.Error(f"不支持的采样位宽: {width * 8}")
+    
+    usable = len(data) - len(data) % channels
+    return data[:usable].reshape(-1, channels), float(1 << (width * 8 - 1)), sample_rate
+
+def _read_decoded(file_path):
+    """非 PCM 的音频交给 pydub 解码（较慢，只在 wave 模块无法读取时使用）"""
+    from pydub import AudioSegment
+    
+    audio = AudioSegment.from_file(file_path)
+    data = np.array(audio.get_array_of_samples())
+    usable = len(data) - len(data) % audio.channels
+    return data[:usable].reshape(-1, audio.channels), float(1 << (audio.sample_width * 8 - 1)), audio.frame_rate
+
+def compute_peaks(file_path, pixels=None):
+    """
+    计算音频的波形峰值数据
+    
+    Args:
+        file_path (str): 音频文件
+        pixels (int): 像素区间数（默认 Config.WAVEFORM_PIXELS）；音频采样数少于该值时每个采样一个区间
+    
+    Returns:
+        bytes: .dat 格式的峰值数据
+    """
+    pixels = pixels or Config.WAVEFORM_PIXELS
+    try:
+        samples, full_scale, sample_rate = _read_pcm(file_path)
+    except (wave.Error, EOFError):
+        samples, full_scale, sample_rate = _read_decoded(file_path)
+    
+    frame_count = len(samples)
+    samples_per_pixel = max(1, math.ceil(frame_count / pixels))
+    length = math.ceil(frame_count / samples_per_pixel)
+    
+    if length == 0:
+        peaks = np.zeros((0, 2), dtype=np.int8)
+    else:
+        # 末尾不足一个区间的部分用最后一帧补齐（不改变该区间的 min/max），
+        # 之后每行是一个像素区间内所有声道的采样
+        padding = length * samples_per_pixel - frame_count
+        if padding:
+            samples = np.concatenate([samples, np.repeat(samples[-1:], padding, axis=0)])
+        buckets = samples.reshape(length, -1)
+        scale = 127.0 / full_scale
+        lows = np.floor(buckets.min(axis=1) * scale)
+        highs = np.ceil(buckets.max(axis=1) * scale)
+        peaks = np.clip(np.column_stack((lows, highs)), -128, 127).astype(np.int8)
+    
+    header = _HEADER.pack(_FORMAT_VERSION, _FLAG_8BIT, sample_rate, samples_per_pixel, length)
+    return header + peaks.tobytes()
+
+def get_peaks_path(audio_path, audio_folder=None, cache_folder=None):
+    """音频对应的峰值缓存文件：缓存目录下与音频相同的相对路径，加 .dat 扩展名"""
+    audio_folder = audio_folder or Config.AUDIO_FOLDER
+    cache_folder = cache_folder or Config.WAVEFORM_CACHE_FOLDER
+    relative = os.path.relpath(audio_path, audio_folder)
+    return os.path.join(cache_folder, relative + PEAKS_EXTENSION)
+
+def _is_fresh(peaks_path, audio_path):
+    try:
+        return os.stat(peaks_path).st_mtime_ns >= os.stat(audio_path).st_mtime_ns
+    except OSError:
+        return False
+
+def ensure_peaks(audio_path, audio_folder=None, cache_folder=None, force=False):
+    """
+    确保音频的峰值缓存存在且不旧于音频文件，需要时生成
+    
+    写入临时文件后替换，并发生成同一文件的进程不会读到写了一半的内容
+    
+    Returns:
+        str: 峰值缓存文件路径
+    """
+    peaks_path = get_peaks_path(audio_path, audio_folder, cache_folder)
+    if not force and _is_fresh(peaks_path, audio_path):
+        return peaks_path
+    
+    data = compute_peaks(audio_path)
+    os.makedirs(os.path.dirname(peaks_path), exist_ok=True)
+    temp_path = f"{peaks_path}.{os.getpid()}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+    os.replace(temp_path, peaks_path)
+    return peaks_path
+
+def _generate_one(args):
+    """进程池任务：生成单个音频的峰值缓存"""
+    audio_path, audio_folder, cache_folder, force = args
+    if not force and _is_fresh(get_peaks_path(audio_path, audio_folder, cache_folder), audio_path):
+        return audio_path, 'unchanged', None
+    try:
+        ensure_peaks(audio_path, audio_folder, cache_folder, force=True)
+        return audio_path, 'generated', None
+    except Exception as e:
+        return audio_path, 'failed', str(e)
+
+def generate_all_peaks(audio_folder=None, cache_folder=None, workers=None, force=False, verbose=False):
+    """
+    为音频目录下的全部音频生成峰值缓存（多进程）
+    
+    Args:
+        workers (int): 进程数，默认 CPU 核数
+        force (bool): 重新生成已是最新的缓存（修改 WAVEFORM_PIXELS 后使用）
+    
+    Returns:
+        dict: {'generated': 生成数, 'unchanged': 跳过数, 'failed': 失败数}
+    """
+    audio_folder = audio_folder or Config.AUDIO_FOLDER
+    cache_folder = cache_folder or Config.WAVEFORM_CACHE_FOLDER
+    tasks = [
+        (os.path.join(root, name), audio_folder, cache_folder, force)
+        for root, _, files in os.walk(audio_folder)
+        for name in sorted(files) if name.lower().endswith(AUDIO_EXTENSIONS)
+    ]
+    
+    summary = {'generated': 0, 'unchanged': 0, 'failed': 0}
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1) as executor:
+        for audio_path, status, error in executor.map(_generate_one, tasks, chunksize=64):
+            summary[status] += 1
+            if status == 'failed':
+                print(f"  ⚠ {os.path.relpath(audio_path, audio_folder)}: {error}")
+            elif verbose and status == 'generated':
+                print(f"  {os.path.relpath(audio_path, audio_folder)}")
+    return summary
+
+def main():
+    """
+    主函数
+    """
+    parser = argparse.ArgumentParser(description='为音频生成波形峰值缓存')
+    parser.add_argument('--audio-folder', default=Config.AUDIO_FOLDER, help='音频目录 (默认: Config.AUDIO_FOLDER)')
+    parser.add_argument('--cache-folder', default=Config.WAVEFORM_CACHE_FOLDER,
+                        help='峰值缓存目录 (默认: Config.WAVEFORM_CACHE_FOLDER)')
+    parser.add_argument('--workers', type=int, default=None, help='进程数 (默认: CPU 核数)')
+    parser.add_argument('--force', action='store_true', help='重新生成全部缓存（修改 WAVEFORM_PIXELS 后使用）')
+    parser.add_argument('--verbose', action='store_true', help='显示每个生成的文件')
+    args = parser.parse_args()
+    
+    summary = generate_all_peaks(args.audio_folder, args.cache_folder, args.workers, args.force, args.verbose)
+    print(f"生成 {summary['generated']} 个，{summary['unchanged']} 个已是最新，{summary['failed']} 个失败")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file